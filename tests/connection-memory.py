@@ -0,0 +1,133 @@
+#!/usr/bin/python
+
+# See the LICENSE file for legal information regarding use of this file.
+
+"""
+Measure memory retained by idle TLS connections.
+
+Performs handshakes over socket pairs and reports how many bytes of Python
+objects are reachable from the client and server TLSConnection objects once
+the handshake has finished and the application data was exchanged.
+Objects shared between connections (certificates, keys, settings, modules,
+classes) are not counted.
+
+Exits with non-zero status if any connection is over the budget.
+"""
+
+from __future__ import print_function
+
+import sys
+import os
+import gc
+import socket
+import _socket
+import threading
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from tlslite import TLSConnection, HandshakeSettings, X509CertChain, \
+    SessionCache, parsePEMKey
+
+# Maximum number of bytes of Python objects an idle connection may keep
+# alive, see the "Memory use of idle connections" section of README.md
+CONNECTION_BUDGETS = {"aes128gcm": 13 * 1024,
+                      "chacha20-poly1305": 12 * 1024,
+                      "rc4": 20 * 1024,
+                      "aes128": 24 * 1024}
+
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType,
+                 types.BuiltinFunctionType, types.MethodType, socket.socket,
+                 _socket.socket)
+
+
+def retainedSize(root, shared):
+    """Return size of objects reachable from root and not from shared"""
+    seen = set(shared.keys())
+    todo = [root]
+    total = 0
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        todo.extend(gc.get_referents(obj))
+    return total
+
+
+def reachable(roots):
+    """Return all objects reachable from roots, keyed by their ids
+
+    The objects are kept alive by the returned dictionary, so their ids
+    can't be reused by objects created later.
+    """
+    seen = {}
+    todo = list(roots)
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen:
+            continue
+        seen[id(obj)] = obj
+        todo.extend(gc.get_referents(obj))
+    return seen
+
+
+def connect(certChain, privateKey, cipherNames, sessionCache):
+    """Return client and server connections after exchanging data"""
+    clientSock, serverSock = socket.socketpair()
+    settings = HandshakeSettings()
+    settings.cipherNames = cipherNames
+    server = TLSConnection(serverSock)
+
+    def serve():
+        server.handshakeServer(certChain=certChain, privateKey=privateKey,
+                               sessionCache=sessionCache, settings=settings)
+        server.write(server.read())
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    client = TLSConnection(clientSock)
+    client.handshakeClientCert(settings=settings)
+    client.write(bytearray(b"GET / HTTP/1.0\r\n\r\n"))
+    client.read()
+    thread.join()
+    return client, server
+
+
+def main():
+    testDir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(testDir, "serverX509Cert.pem")) as certFile:
+        certChain = X509CertChain()
+        certChain.parsePemList(certFile.read())
+    with open(os.path.join(testDir, "serverX509Key.pem")) as keyFile:
+        privateKey = parsePEMKey(keyFile.read(), private=True)
+    sessionCache = SessionCache()
+
+    shared = reachable([certChain, privateKey, sessionCache,
+                        HandshakeSettings(), sys.modules])
+
+    ok = True
+    print("{0:20} {1:>8} {2:>8} {3:>8}".format("cipher", "client", "server",
+                                               "budget"))
+    for cipher in ["aes128gcm", "chacha20-poly1305", "rc4", "aes128"]:
+        client, server = connect(certChain, privateKey, [cipher],
+                                 sessionCache)
+        # server sessions are kept by the session cache, not the connection
+        shared[id(server.session)] = server.session
+        sizes = [retainedSize(conn, shared) for conn in (client, server)]
+        budget = CONNECTION_BUDGETS[cipher]
+        print("{0:20} {1:8} {2:8} {3:8}".format(cipher, sizes[0], sizes[1],
+                                                budget))
+        ok = ok and max(sizes) <= budget
+        client.close()
+        server.close()
+
+    if not ok:
+        print("Connection over budget!")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
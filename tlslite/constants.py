@@ -11,6 +11,8 @@
 
 """Constants used in various places."""
 
+from collections import namedtuple
+
 class TLSEnum(object):
     """Base class for different enums of TLS IDs"""
 
@@ -89,6 +91,7 @@ class ExtensionType:    # RFC 6066 / 4366
     signature_algorithms = 13 # RFC 5246
     client_hello_padding = 21 # RFC 7685
     encrypt_then_mac = 22 # RFC 7366
+    record_size_limit = 28 # RFC 8449
     tack = 0xF300
     supports_npn = 13172
     renegotiation_info = 0xff01
@@ -149,6 +152,10 @@ class GroupName(TLSEnum):
     brainpoolP512r1 = 28
     allEC.append(list(range(26, 29)))
 
+    # RFC 7748 curves, as specified in draft-ietf-tls-rfc4492bis
+    x25519 = 29
+    allEC.append(x25519)
+
     # RFC-ietf-tls-negotiated-ff-dhe-10
     ffdhe2048 = 256
     ffdhe3072 = 257
@@ -282,6 +289,8 @@ class CipherSuite:
     @cvar anonSuites: ciphersuites which use anonymous Finite Field
     Diffie-Hellman key exchange
     @cvar ietfNames: dictionary with string names of the ciphersuites
+    @cvar descriptors: dictionary mapping implemented ciphersuites to their
+    L{CipherSuiteDescriptor}
     """
 
     ietfNames = {}
@@ -713,6 +722,9 @@ class CipherSuite:
         if "ecdh_anon" in keyExchangeNames:
             keyExchangeSuites += CipherSuite.ecdhAnonSuites
 
+        macSuites = set(macSuites)
+        cipherSuites = set(cipherSuites)
+        keyExchangeSuites = set(keyExchangeSuites)
         return [s for s in suites if s in macSuites and
                 s in cipherSuites and s in keyExchangeSuites]
 
@@ -883,6 +895,141 @@ class CipherSuite:
         else:
             return None
 
+    @staticmethod
+    def getDescriptor(ciphersuite):
+        """
+        Return the L{CipherSuiteDescriptor} of the provided ciphersuite
+
+        @rtype: L{CipherSuiteDescriptor}
+        @return: parameters of the ciphersuite or None for signalling
+        suites and ciphersuites not implemented by the library
+        """
+        return CipherSuite.descriptors.get(ciphersuite)
+
+    @staticmethod
+    def rankSuites(suites):
+        """
+        Return a rank table for the provided preference ordered ciphersuites
+
+        @type suites: list of int
+        @param suites: ciphersuites, most preferred first
+        @rtype: dict
+        @return: dictionary mapping ciphersuite to its position in
+        suites, the first occurrence of a duplicate wins
+        """
+        ranks = {}
+        for rank, suite in enumerate(suites):
+            ranks.setdefault(suite, rank)
+        return ranks
+
+    @staticmethod
+    def selectPreferred(ranks, offeredSuites):
+        """
+        Return the offered ciphersuite with the best rank
+
+        @type ranks: dict
+        @param ranks: rank table returned by L{rankSuites}
+        @type offeredSuites: list of int
+        @param offeredSuites: ciphersuites advertised by the peer
+        @rtype: int
+        @return: the selected ciphersuite or None if there is no ciphersuite
+        in common
+        """
+        selected = None
+        bestRank = None
+        for suite in offeredSuites:
+            rank = ranks.get(suite)
+            if rank is not None and (bestRank is None or rank < bestRank):
+                selected = suite
+                bestRank = rank
+        return selected
+
+
+class CipherSuiteDescriptor(namedtuple('CipherSuiteDescriptor',
+                                       ['cipherSuite', 'cipherName',
+                                        'keyLength', 'ivLength', 'macName',
+                                        'macLength', 'prfHash', 'keyExchange',
+                                        'aead'])):
+
+    """
+    Immutable description of the parameters of a ciphersuite
+
+    @type cipherSuite: int
+    @ivar cipherSuite: numeric ID of the ciphersuite
+    @type cipherName: str
+    @ivar cipherName: name of the symmetric cipher, as used in
+    L{HandshakeSettings.cipherNames}
+    @type keyLength: int
+    @ivar keyLength: size of the symmetric key in bytes
+    @type ivLength: int
+    @ivar ivLength: size of the IV (or fixed part of the nonce for AEAD
+    ciphers) in bytes
+    @type macName: str
+    @ivar macName: name of the MAC, as used in L{HandshakeSettings.macNames}
+    @type macLength: int
+    @ivar macLength: size of the MAC key and tag in bytes, 0 for AEAD ciphers
+    @type prfHash: str
+    @ivar prfHash: name of the hash used by the TLS 1.2 PRF
+    @type keyExchange: str
+    @ivar keyExchange: name of the key exchange, as used in
+    L{HandshakeSettings.keyExchangeNames}
+    @type aead: bool
+    @ivar aead: whether the cipher is an AEAD cipher
+    """
+
+    __slots__ = ()
+
+
+def _createCipherSuiteDescriptors():
+    """Create the dictionary describing all implemented ciphersuites"""
+    # first match wins, same as the order of checks in record layer
+    ciphers = ((CipherSuite.aes256GcmSuites, "aes256gcm", 32, 4),
+               (CipherSuite.aes128GcmSuites, "aes128gcm", 16, 4),
+               (CipherSuite.chacha20Suites, "chacha20-poly1305", 32, 4),
+               (CipherSuite.aes128Suites, "aes128", 16, 16),
+               (CipherSuite.aes256Suites, "aes256", 32, 16),
+               (CipherSuite.rc4Suites, "rc4", 16, 0),
+               (CipherSuite.tripleDESSuites, "3des", 24, 8),
+               (CipherSuite.nullSuites, "null", 0, 0),
+               (CipherSuite.speckSuites, "speck128", 16, 16),
+               (CipherSuite.speck128GcmSuites, "speck128gcm", 16, 4),
+               (CipherSuite.speck192GcmSuites, "speck192gcm", 24, 4))
+    macs = ((CipherSuite.aeadSuites, "aead", 0),
+            (CipherSuite.shaSuites, "sha", 20),
+            (CipherSuite.sha256Suites, "sha256", 32),
+            (CipherSuite.sha384Suites, "sha384", 48),
+            (CipherSuite.md5Suites, "md5", 16))
+    keyExchanges = ((CipherSuite.srpSuites, "srp_sha"),
+                    (CipherSuite.srpCertSuites, "srp_sha_rsa"),
+                    (CipherSuite.certSuites, "rsa"),
+                    (CipherSuite.dheCertSuites, "dhe_rsa"),
+                    (CipherSuite.ecdheCertSuites, "ecdhe_rsa"),
+                    (CipherSuite.anonSuites, "dh_anon"),
+                    (CipherSuite.ecdhAnonSuites, "ecdh_anon"))
+
+    def firstMatch(table, suite):
+        for entry in table:
+            if suite in entry[0]:
+                return entry[1:]
+        return (None, ) * (len(table[0]) - 1)
+
+    sha384Prf = set(CipherSuite.sha384PrfSuites)
+    descriptors = {}
+    for cipherSuites, _, _, _ in ciphers:
+        for suite in cipherSuites:
+            if suite in descriptors:
+                continue
+            cipherName, keyLength, ivLength = firstMatch(ciphers, suite)
+            macName, macLength = firstMatch(macs, suite)
+            keyExchange, = firstMatch(keyExchanges, suite)
+            descriptors[suite] = CipherSuiteDescriptor(
+                suite, cipherName, keyLength, ivLength, macName, macLength,
+                "sha384" if suite in sha384Prf else "sha256", keyExchange,
+                macName == "aead")
+    return descriptors
+
+CipherSuite.descriptors = _createCipherSuiteDescriptors()
+
 
 # The following faults are induced as part of testing.  The faultAlerts
 # dictionary describes the allowed alerts that may be triggered by these
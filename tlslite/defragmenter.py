@@ -6,7 +6,112 @@
 
 from __future__ import generators
 
-from .utils.codec import Parser
+from collections import deque
+import struct
+
+from .utils.codec import _structFormats
+from .utils.compat import compatMemoryView
+
+
+class _MessageBuffer(object):
+
+    """
+    Queue of received fragments of a single message type.
+
+    Fragments are kept as received and are copied only once, when a complete
+    message is extracted, so that messages spanning many records don't cause
+    the buffered data to be copied for every record.
+
+    @ivar chunks: received fragments, oldest first, None when the buffer is
+    empty so that idle connections don't keep the queues allocated
+    @ivar offset: number of already consumed bytes in the first fragment
+    @ivar length: number of not consumed bytes in all fragments
+    @ivar messageSize: size of the message at the head of the buffer, if
+    already known
+    """
+
+    __slots__ = ('chunks', 'offset', 'length', 'messageSize')
+
+    def __init__(self):
+        """Create empty buffer"""
+        self.chunks = None
+        self.offset = 0
+        self.length = 0
+        self.messageSize = None
+
+    def __len__(self):
+        """Return number of buffered bytes"""
+        return self.length
+
+    def append(self, data):
+        """Queue data, the object is referenced, not copied"""
+        if data:
+            if self.chunks is None:
+                self.chunks = deque()
+            self.chunks.append(data)
+            self.length += len(data)
+
+    def peek(self, start, size):
+        """Return size bytes starting at start, without consuming them"""
+        assert start + size <= self.length
+        start += self.offset
+        ret = bytearray()
+        for chunk in self.chunks:
+            if start >= len(chunk):
+                start -= len(chunk)
+                continue
+            ret += compatMemoryView(chunk)[start:start + size - len(ret)]
+            start = 0
+            if len(ret) == size:
+                break
+        return ret
+
+    def getValue(self):
+        """Return copy of all buffered data, without consuming it"""
+        if not self.length:
+            return bytearray(0)
+        return self.peek(0, self.length)
+
+    def take(self, size):
+        """Remove first size bytes from buffer and return them"""
+        assert size <= self.length
+        chunks = self.chunks
+        first = chunks[0]
+        end = self.offset + size
+        if end <= len(first):
+            # message contained in single fragment
+            ret = bytearray(compatMemoryView(first)[self.offset:end])
+            if end == len(first):
+                chunks.popleft()
+                end = 0
+            self.offset = end
+        else:
+            ret = bytearray(compatMemoryView(first)[self.offset:])
+            chunks.popleft()
+            while len(ret) < size:
+                chunk = chunks[0]
+                missing = size - len(ret)
+                if missing < len(chunk):
+                    ret += compatMemoryView(chunk)[:missing]
+                    self.offset = missing
+                    break
+                ret += chunk
+                chunks.popleft()
+            else:
+                self.offset = 0
+        self.length -= size
+        self.messageSize = None
+        if not chunks:
+            self.chunks = None
+        return ret
+
+    def clear(self):
+        """Remove all data from buffer"""
+        self.chunks = None
+        self.offset = 0
+        self.length = 0
+        self.messageSize = None
+
 
 class Defragmenter(object):
 
@@ -21,16 +126,27 @@ class Defragmenter(object):
 
     @ivar priorities: order in which messages from given types should be
     returned.
-    @ivar buffers: data buffers for message types
+    @ivar buffers: data buffers for message types (read-only), copies of the
+    buffered data as bytearrays
     @ivar decoders: functions which check buffers if a message of given type
-    is complete
+    is complete, they are called with a bytearray
     """
 
     def __init__(self):
         """Set up empty defregmenter"""
         self.priorities = []
-        self.buffers = {}
         self.decoders = {}
+        # received fragments of message types, see L{_MessageBuffer}
+        self._queues = {}
+        # decoders set up by addStaticSize() and addDynamicSize(), they can
+        # be called with the L{_MessageBuffer} directly
+        self._queueDecoders = {}
+
+    @property
+    def buffers(self):
+        """Return copies of data buffered for all message types"""
+        return dict((msgType, queue.getValue())
+                    for msgType, queue in self._queues.items())
 
     def addStaticSize(self, msgType, size):
         """Add a message type which all messages are of same length"""
@@ -41,7 +157,7 @@ class Defragmenter(object):
 
         self.priorities += [msgType]
 
-        self.buffers[msgType] = bytearray(0)
+        self._queues[msgType] = _MessageBuffer()
         def sizeHandler(data):
             """
             Size of message in parameter
@@ -54,6 +170,7 @@ class Defragmenter(object):
             else:
                 return size
         self.decoders[msgType] = sizeHandler
+        self._queueDecoders[msgType] = sizeHandler
 
     def addDynamicSize(self, msgType, sizeOffset, sizeOfSize):
         """Add a message type which has a dynamic size set in a header"""
@@ -65,52 +182,79 @@ class Defragmenter(object):
             raise ValueError("Offset can't be negative")
 
         self.priorities += [msgType]
-        self.buffers[msgType] = bytearray(0)
+        self._queues[msgType] = _MessageBuffer()
+        headerSize = sizeOffset + sizeOfSize
+        if sizeOfSize in _structFormats:
+            sizeFormat = struct.Struct('>' + _structFormats[sizeOfSize])
+        else:
+            sizeFormat = None
 
         def sizeHandler(data):
             """
             Size of message in parameter
 
             If complete message is present in parameter returns its size,
-            None otherwise.
+            None otherwise. The parameter is a bytearray or a
+            L{_MessageBuffer}.
             """
-            if len(data) < sizeOffset+sizeOfSize:
-                return None
-            else:
-                parser = Parser(data)
-                # skip the header
-                parser.getFixBytes(sizeOffset)
-
-                payloadLength = parser.get(sizeOfSize)
-                if parser.getRemainingLength() < payloadLength:
-                    # not enough bytes in buffer
+            isQueue = isinstance(data, _MessageBuffer)
+            # in a queue, the header is decoded only once per message, not
+            # every time a fragment of it is received
+            messageSize = data.messageSize if isQueue else None
+            if messageSize is None:
+                if len(data) < headerSize:
                     return None
-                return sizeOffset + sizeOfSize + payloadLength
+                if isQueue:
+                    header = data.peek(sizeOffset, sizeOfSize)
+                else:
+                    header = data[sizeOffset:headerSize]
+                if sizeFormat is not None:
+                    payloadLength = sizeFormat.unpack_from(header)[0]
+                else:
+                    payloadLength = 0
+                    for byte in header:
+                        payloadLength = (payloadLength << 8) | byte
+                messageSize = headerSize + payloadLength
+                if isQueue:
+                    data.messageSize = messageSize
+            if len(data) < messageSize:
+                # not enough bytes in buffer
+                return None
+            return messageSize
 
         self.decoders[msgType] = sizeHandler
+        self._queueDecoders[msgType] = sizeHandler
 
     def addData(self, msgType, data):
-        """Adds data to buffers"""
+        """
+        Adds data to buffers
+
+        The data is queued without copying, so it must not be modified
+        after being added.
+        """
         if msgType not in self.priorities:
             raise ValueError("Message type not defined")
 
-        self.buffers[msgType] += data
+        self._queues[msgType].append(data)
 
     def getMessage(self):
         """Extract the highest priority complete message from buffer"""
         for msgType in self.priorities:
-            length = self.decoders[msgType](self.buffers[msgType])
+            queue = self._queues[msgType]
+            decoder = self.decoders[msgType]
+            if decoder is self._queueDecoders[msgType]:
+                length = decoder(queue)
+            else:
+                # decoder replaced by user, it expects a bytearray
+                length = decoder(queue.getValue())
             if length is None:
                 continue
 
-            # extract message
-            data = self.buffers[msgType][:length]
-            # remove it from buffer
-            self.buffers[msgType] = self.buffers[msgType][length:]
-            return (msgType, data)
+            # extract message and remove it from buffer
+            return (msgType, queue.take(length))
         return None
 
     def clearBuffers(self):
         """Remove all data from buffers"""
-        for key in self.buffers.keys():
-            self.buffers[key] = bytearray(0)
+        for queue in self._queues.values():
+            queue.clear()
@@ -190,6 +190,13 @@ class TLSInternalError(TLSError):
     """
     pass
 
+class TLSSequenceNumberOverflow(TLSError):
+    """The record sequence number would wrap around.
+
+    The connection has to be closed and established again.
+    """
+    pass
+
 class TLSProtocolException(BaseTLSException):
 
     """Exceptions used internally for handling errors in received messages"""
@@ -202,6 +209,12 @@ class TLSIllegalParameterException(TLSProtocolException):
 
     pass
 
+class TLSDecodeError(TLSProtocolException, SyntaxError):
+
+    """Part of a received message that was decoded on demand is malformed"""
+
+    pass
+
 class TLSRecordOverflow(TLSProtocolException):
 
     """The received record size was too big"""
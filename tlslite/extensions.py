@@ -1108,6 +1108,66 @@ class PaddingExtension(TLSExtension):
         self.paddingData = p.getFixBytes(p.getRemainingLength())
         return self
 
+class RecordSizeLimitExtension(TLSExtension):
+    """
+    Maximum size of protected records the sender of extension is willing
+    to receive.
+
+    See RFC8449.
+
+    @type recordSizeLimit: int
+    @ivar recordSizeLimit: maximum size of plaintext in a single protected
+    record
+    """
+
+    def __init__(self):
+        """Create instance of class."""
+        super(RecordSizeLimitExtension, self).__init__(
+            extType=ExtensionType.record_size_limit)
+        self.recordSizeLimit = None
+
+    @property
+    def extData(self):
+        """
+        Return raw encoding of the extension.
+
+        @rtype: bytearray
+        """
+        if self.recordSizeLimit is None:
+            return bytearray(0)
+
+        writer = Writer()
+        writer.add(self.recordSizeLimit, 2)
+        return writer.bytes
+
+    def create(self, recordSizeLimit):
+        """
+        Set the record size limit.
+
+        @type recordSizeLimit: int
+        @param recordSizeLimit: maximum size of plaintext in a record
+        """
+        self.recordSizeLimit = recordSizeLimit
+        return self
+
+    def parse(self, parser):
+        """
+        Deserialise extension from on the wire data.
+
+        @type parser: L{tlslite.util.codec.Parser}
+        @param parser: data to be parsed
+
+        @raise SyntaxError: when the extension doesn't contain exactly a
+        two byte value
+
+        @rtype: L{RecordSizeLimitExtension}
+        """
+        if parser.getRemainingLength() != 2:
+            raise SyntaxError()
+
+        self.recordSizeLimit = parser.get(2)
+        return self
+
 TLSExtension._universalExtensions = \
     {
         ExtensionType.server_name: SNIExtension,
@@ -1117,7 +1177,8 @@ TLSExtension._universalExtensions = \
         ExtensionType.srp: SRPExtension,
         ExtensionType.signature_algorithms: SignatureAlgorithmsExtension,
         ExtensionType.supports_npn: NPNExtension,
-        ExtensionType.client_hello_padding: PaddingExtension}
+        ExtensionType.client_hello_padding: PaddingExtension,
+        ExtensionType.record_size_limit: RecordSizeLimitExtension}
 
 TLSExtension._serverExtensions = \
     {
@@ -3,6 +3,7 @@
 # See the LICENSE file for legal information regarding use of this file.
 """Handling cryptographic hashes for handshake protocol"""
 
+import sys
 from .utils.compat import compat26Str, compatHMAC
 from .utils.cryptomath import MD5, SHA1
 from .utils import tlshashlib as hashlib
@@ -14,16 +15,22 @@ class HandshakeHashes(object):
 
     Calculates message digests of messages exchanged in handshake protocol
     of SSLv3 and TLS.
+
+    The digests are created only when first needed, until then the messages
+    are buffered and replayed into the new digest. Once the negotiated
+    version and cipher suite are known, L{selectDigests} can be used to
+    drop the buffer and limit the hashing to the digests that the rest of
+    the handshake will use.
     """
 
+    _digestNames = ('md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512')
+
     def __init__(self):
         """Create instance"""
-        self._handshakeMD5 = hashlib.md5()
-        self._handshakeSHA = hashlib.sha1()
-        self._handshakeSHA224 = hashlib.sha224()
-        self._handshakeSHA256 = hashlib.sha256()
-        self._handshakeSHA384 = hashlib.sha384()
-        self._handshakeSHA512 = hashlib.sha512()
+        # messages seen so far, None after selectDigests()
+        self._buffer = []
+        # running hashes, by name
+        self._hashes = {}
 
     def update(self, data):
         """
@@ -33,12 +40,41 @@ class HandshakeHashes(object):
         @param data: serialized TLS handshake message
         """
         text = compat26Str(data)
-        self._handshakeMD5.update(text)
-        self._handshakeSHA.update(text)
-        self._handshakeSHA224.update(text)
-        self._handshakeSHA256.update(text)
-        self._handshakeSHA384.update(text)
-        self._handshakeSHA512.update(text)
+        if self._buffer is not None:
+            self._buffer.append(bytes(text))
+        for hashObj in self._hashes.values():
+            hashObj.update(text)
+
+    def _getHash(self, name):
+        """Return running hash of given name, creating it if necessary"""
+        hashObj = self._hashes.get(name)
+        if hashObj is None:
+            if name not in self._digestNames:
+                raise ValueError("Unknown digest name")
+            if self._buffer is None:
+                raise ValueError("Digest {0} was not selected".format(name))
+            hashObj = hashlib.new(name)
+            for text in self._buffer:
+                hashObj.update(text)
+            self._hashes[name] = hashObj
+        return hashObj
+
+    def selectDigests(self, names):
+        """
+        Calculate only the specified digests from now on.
+
+        Drops the buffered messages, digests not listed won't be available
+        after this call.
+
+        @type names: iterable of str
+        @param names: names of digests to keep, 'md5' and 'sha1' are needed
+        for SSLv3, TLS 1.0 and TLS 1.1
+        """
+        hashes = {}
+        for name in names:
+            hashes[name] = self._getHash(name)
+        self._hashes = hashes
+        self._buffer = None
 
     def digest(self, digest=None):
         """
@@ -50,21 +86,9 @@ class HandshakeHashes(object):
         @param digest: name of digest to return
         """
         if digest is None:
-            return self._handshakeMD5.digest() + self._handshakeSHA.digest()
-        elif digest == 'md5':
-            return self._handshakeMD5.digest()
-        elif digest == 'sha1':
-            return self._handshakeSHA.digest()
-        elif digest == 'sha224':
-            return self._handshakeSHA224.digest()
-        elif digest == 'sha256':
-            return self._handshakeSHA256.digest()
-        elif digest == 'sha384':
-            return self._handshakeSHA384.digest()
-        elif digest == 'sha512':
-            return self._handshakeSHA512.digest()
-        else:
-            raise ValueError("Unknown digest name")
+            return self._getHash('md5').digest() + \
+                    self._getHash('sha1').digest()
+        return self._getHash(digest).digest()
 
     def digestSSL(self, masterSecret, label):
         """
@@ -78,8 +102,8 @@ class HandshakeHashes(object):
         @param label: label to include in the calculation
         """
         #pylint: disable=maybe-no-member
-        imacMD5 = self._handshakeMD5.copy()
-        imacSHA = self._handshakeSHA.copy()
+        imacMD5 = self._getHash('md5').copy()
+        imacSHA = self._getHash('sha1').copy()
         #pylint: enable=maybe-no-member
 
         # the below difference in input for MD5 and SHA-1 is why we can't reuse
@@ -105,10 +129,20 @@ class HandshakeHashes(object):
         @rtype: HandshakeHashes
         """
         other = HandshakeHashes()
-        other._handshakeMD5 = self._handshakeMD5.copy()
-        other._handshakeSHA = self._handshakeSHA.copy()
-        other._handshakeSHA224 = self._handshakeSHA224.copy()
-        other._handshakeSHA256 = self._handshakeSHA256.copy()
-        other._handshakeSHA384 = self._handshakeSHA384.copy()
-        other._handshakeSHA512 = self._handshakeSHA512.copy()
+        if self._buffer is not None:
+            other._buffer = list(self._buffer)
+        else:
+            other._buffer = None
+        other._hashes = dict((name, hashObj.copy())
+                             for name, hashObj in self._hashes.items())
         return other
+
+    def __sizeof__(self):
+        """Return memory used by the object, including buffer and hashes"""
+        size = object.__sizeof__(self) + sys.getsizeof(self._hashes)
+        size += sum(sys.getsizeof(hashObj)
+                    for hashObj in self._hashes.values())
+        if self._buffer is not None:
+            size += sys.getsizeof(self._buffer)
+            size += sum(sys.getsizeof(text) for text in self._buffer)
+        return size
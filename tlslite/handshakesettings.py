@@ -8,7 +8,8 @@
 
 """Class for setting handshake parameters."""
 
-from .constants import CertificateType
+from .constants import CertificateType, CipherSuite, GroupName, \
+        HashAlgorithm, SignatureAlgorithm
 from .utils import cryptomath
 from .utils import cipherfactory
 from .utils.compat import ecdsaAllCurves
@@ -27,8 +28,8 @@ CERTIFICATE_TYPES = ["x509"]
 RSA_SIGNATURE_HASHES = ["sha512", "sha384", "sha256", "sha224", "sha1"]
 ALL_RSA_SIGNATURE_HASHES = RSA_SIGNATURE_HASHES + ["md5"]
 # while secp521r1 is the most secure, it's also much slower than the others
-# so place it as the last one
-CURVE_NAMES = ["secp384r1", "secp256r1", "secp521r1"]
+# so place it as the last one, x25519 is the fastest so place it first
+CURVE_NAMES = ["x25519", "secp384r1", "secp256r1", "secp521r1"]
 ALL_CURVE_NAMES = CURVE_NAMES + ["secp256k1"]
 if ecdsaAllCurves:
     ALL_CURVE_NAMES += ["secp224r1", "secp192r1"]
@@ -125,6 +126,38 @@ class HandshakeSettings(object):
 
     @type eccCurves: list
     @ivar eccCurves: List of named curves that are to be supported
+
+    The allowed values are "x25519", "secp256r1", "secp384r1", "secp521r1"
+    and "secp256k1" (and "secp224r1" and "secp192r1" when the installed
+    python-ecdsa supports them).
+
+    @type tcpNoDelay: bool
+    @ivar tcpNoDelay: Whether to disable Nagle's algorithm (set TCP_NODELAY)
+    on the socket once the handshake is finished.
+
+    Application data records are then sent as soon as they are written,
+    instead of waiting for the ACK of previously sent data. The default
+    is False, leaving the socket options as set by the caller.
+
+    @type tcpCork: bool
+    @ivar tcpCork: Whether to cork the socket (set TCP_CORK) while a write
+    split into multiple records is sent.
+
+    The records are then sent in as few TCP segments as possible, this also
+    applies to the 1/n-1 record splitting done for CBC ciphers in TLS 1.0
+    and earlier. Only supported on Linux, ignored elsewhere. The default
+    is False.
+
+    @type recordSizeLimit: int
+    @ivar recordSizeLimit: Maximum size of plaintext in protected records
+    we are willing to receive, advertised using the record_size_limit
+    extension (RFC 8449).
+
+    Lowering it reduces the size of buffers needed for receiving records,
+    peers that support the extension will also limit the size of records
+    they send. Must be between 64 and 2**14 inclusive. The default is None,
+    in which case the client doesn't send the extension and the server
+    replies to it with the protocol maximum.
     """
     def __init__(self):
         self.minKeySize = 1023
@@ -142,6 +175,9 @@ class HandshakeSettings(object):
         self.rsaSigHashes = list(RSA_SIGNATURE_HASHES)
         self.eccCurves = list(CURVE_NAMES)
         self.usePaddingExtension = True
+        self.tcpNoDelay = False
+        self.tcpCork = False
+        self.recordSizeLimit = None
 
     @staticmethod
     def _sanityCheckKeySizes(other):
@@ -216,6 +252,23 @@ class HandshakeSettings(object):
         if other.usePaddingExtension not in (True, False):
             raise ValueError("usePaddingExtension must be True or False")
 
+        if other.recordSizeLimit is not None and \
+                (other.recordSizeLimit is True or
+                 other.recordSizeLimit is False or
+                 not isinstance(other.recordSizeLimit, int) or
+                 not 64 <= other.recordSizeLimit <= 2**14):
+            raise ValueError("recordSizeLimit must be None or an integer "
+                             "between 64 and 2**14")
+
+    @staticmethod
+    def _sanityCheckSocketOptions(other):
+        """Check if set socket tuning options are sane"""
+        if other.tcpNoDelay not in (True, False):
+            raise ValueError("tcpNoDelay must be True or False")
+
+        if other.tcpCork not in (True, False):
+            raise ValueError("tcpCork must be True or False")
+
     def validate(self):
         """
         Validate the settings, filter out unsupported ciphersuites and return
@@ -238,6 +291,9 @@ class HandshakeSettings(object):
         other.sendFallbackSCSV = self.sendFallbackSCSV
         other.useEncryptThenMAC = self.useEncryptThenMAC
         other.usePaddingExtension = self.usePaddingExtension
+        other.tcpNoDelay = self.tcpNoDelay
+        other.tcpCork = self.tcpCork
+        other.recordSizeLimit = self.recordSizeLimit
         other.rsaSigHashes = self.rsaSigHashes
         other.eccCurves = self.eccCurves
 
@@ -265,6 +321,8 @@ class HandshakeSettings(object):
 
         self._sanityCheckExtensions(other)
 
+        self._sanityCheckSocketOptions(other)
+
         if other.maxVersion < (3,3):
             # No sha-2 and AEAD pre TLS 1.2
             other.macNames = [e for e in self.macNames if \
@@ -284,3 +342,121 @@ class HandshakeSettings(object):
             else:
                 raise AssertionError()
         return ret
+
+    def getCipherSuites(self, keyExchange, version):
+        """
+        Get cipher suites matching settings for given key exchange
+
+        @type keyExchange: str
+        @param keyExchange: name of key exchange, as used in
+            L{keyExchangeNames}
+        @type version: tuple
+        @param version: protocol version the suites must be usable with
+        @rtype: list
+        @return: cipher suite IDs, in order of preference
+        """
+        suites = _SUITE_GETTERS[keyExchange](self, version)
+        return CipherSuite.filterForVersion(suites, version, version)
+
+    def getEccCurveIDs(self):
+        """Get list of acceptable curves as IDs"""
+        return [getattr(GroupName, val) for val in self.eccCurves]
+
+    def getRsaSigAlgs(self):
+        """Get list of valid RSA signature algorithms as ID tuples"""
+        return [(getattr(HashAlgorithm, hashName), SignatureAlgorithm.rsa)
+                for hashName in self.rsaSigHashes]
+
+    def compile(self):
+        """
+        Validate the settings and return a read-only snapshot of them
+
+        The snapshot has all values derived from settings precomputed, so
+        passing it to many handshakes avoids redoing that work for every
+        connection.
+
+        @rtype: L{CompiledHandshakeSettings}
+        @raise ValueError: when settings are invalid, insecure or unsupported.
+        """
+        return CompiledHandshakeSettings(self)
+
+
+# functions returning cipher suites of given key exchange, keyed by
+# the key exchange name
+_SUITE_GETTERS = {"rsa": CipherSuite.getCertSuites,
+                  "dhe_rsa": CipherSuite.getDheCertSuites,
+                  "ecdhe_rsa": CipherSuite.getEcdheCertSuites,
+                  "srp_sha": CipherSuite.getSrpSuites,
+                  "srp_sha_rsa": CipherSuite.getSrpCertSuites,
+                  "ecdh_anon": CipherSuite.getEcdhAnonSuites,
+                  "dh_anon": CipherSuite.getAnonSuites}
+
+
+class CompiledHandshakeSettings(HandshakeSettings):
+    """
+    Validated and read-only copy of L{HandshakeSettings}
+
+    Cipher suites for every key exchange and protocol version, curve and
+    signature algorithm IDs are calculated when the object is created.
+    Handshakes using the object don't validate and filter them again.
+
+    The lists of names are stored as tuples, setting any attribute raises
+    AttributeError. Use L{HandshakeSettings.compile} to create it.
+    """
+
+    def __init__(self, settings):
+        """
+        Create a snapshot of settings
+
+        @type settings: L{HandshakeSettings}
+        @raise ValueError: when settings are invalid, insecure or unsupported.
+        """
+        other = settings.validate()
+        for name, value in vars(other).items():
+            if isinstance(value, list):
+                value = tuple(value)
+            object.__setattr__(self, name, value)
+        # not copied by validate(), but checked before it is called
+        object.__setattr__(self, 'useExperimentalTackExtension',
+                           settings.useExperimentalTackExtension)
+
+        cipherSuites = {}
+        for minor in range(other.minVersion[1], other.maxVersion[1] + 1):
+            version = (other.minVersion[0], minor)
+            cipherSuites[version] = dict(
+                (keyExchange, tuple(HandshakeSettings.getCipherSuites(
+                    other, keyExchange, version)))
+                for keyExchange in _SUITE_GETTERS)
+        object.__setattr__(self, '_cipherSuites', cipherSuites)
+        object.__setattr__(self, '_eccCurveIDs',
+                           tuple(HandshakeSettings.getEccCurveIDs(other)))
+        object.__setattr__(self, '_rsaSigAlgs',
+                           tuple(HandshakeSettings.getRsaSigAlgs(other)))
+
+    def __setattr__(self, name, value):
+        """Reject modification of settings"""
+        raise AttributeError("Compiled settings are read-only")
+
+    def validate(self):
+        """Return self, the settings were validated when compiled"""
+        return self
+
+    def compile(self):
+        """Return self, the settings are already compiled"""
+        return self
+
+    def getCipherSuites(self, keyExchange, version):
+        """Get precomputed cipher suites for key exchange and version"""
+        suites = self._cipherSuites.get(version)
+        if suites is None:
+            return HandshakeSettings.getCipherSuites(self, keyExchange,
+                                                     version)
+        return list(suites[keyExchange])
+
+    def getEccCurveIDs(self):
+        """Get precomputed list of acceptable curve IDs"""
+        return list(self._eccCurveIDs)
+
+    def getRsaSigAlgs(self):
+        """Get precomputed list of valid RSA signature algorithms"""
+        return list(self._rsaSigAlgs)
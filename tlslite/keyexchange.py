@@ -4,7 +4,8 @@
 # See the LICENSE file for legal information regarding use of this file.
 """Handling of cryptographic operations for key exchange"""
 
-from .mathtls import goodGroupParameters, makeK, makeU, makeX, calcMasterSecret
+from .mathtls import goodGroupParameters, makeK, makeU, makeX, \
+        calcMasterSecret, powModGenerator
 from .errors import TLSInsufficientSecurity, TLSUnknownPSKIdentity, \
         TLSIllegalParameterException, TLSDecryptionFailed, TLSInternalError, \
         TLSLocalAlert
@@ -12,10 +13,11 @@ from .messages import ServerKeyExchange, ClientKeyExchange, CertificateVerify
 from .constants import SignatureAlgorithm, HashAlgorithm, CipherSuite, \
         ExtensionType, GroupName, ECCurveType, AlertDescription
 from .utils.ecc import decodeX962Point, encodeX962Point, getCurveByName, \
-        getPointByteSize
+        getPointByteSize, multiplyGenerator, multiplyPoint
 from .utils.rsakey import RSAKey
+from .utils.x25519 import x25519, X25519_G, X25519_ORDER_SIZE
 from .utils.cryptomath import bytesToNumber, getRandomBytes, powMod, \
-        numBits, numberToByteArray
+        numBits, numberToByteArray, zeroizeBytes
 import ecdsa
 
 class KeyExchange(object):
@@ -250,7 +252,7 @@ class DHE_RSAKeyExchange(KeyExchange):
         # Per RFC 3526, Section 1, the exponent should have double the entropy
         # of the strength of the curve.
         self.dh_Xs = bytesToNumber(getRandomBytes(self.strength * 2 // 8))
-        dh_Ys = powMod(self.dh_g, self.dh_Xs, self.dh_p)
+        dh_Ys = powModGenerator(self.dh_g, self.dh_Xs, self.dh_p)
 
         version = self.serverHello.server_version
         serverKeyExchange = ServerKeyExchange(self.cipherSuite, version)
@@ -281,7 +283,7 @@ class DHE_RSAKeyExchange(KeyExchange):
         dh_g = serverKeyExchange.dh_g
         dh_Xc = bytesToNumber(getRandomBytes(32))
         dh_Ys = serverKeyExchange.dh_Ys
-        self.dh_Yc = powMod(dh_g, dh_Xc, dh_p)
+        self.dh_Yc = powModGenerator(dh_g, dh_Xc, dh_p)
 
         S = powMod(dh_Ys, dh_Xc, dh_p)
         return numberToByteArray(S)
@@ -324,10 +326,13 @@ class ECDHE_RSAKeyExchange(KeyExchange):
                              None)
         if self.group_id is None:
             raise TLSInsufficientSecurity("No mutual groups")
-        generator = getCurveByName(GroupName.toRepr(self.group_id)).generator
-        self.ecdhXs = ecdsa.util.randrange(generator.order())
-
-        ecdhYs = encodeX962Point(generator * self.ecdhXs)
+        if self.group_id == GroupName.x25519:
+            self.ecdhXs = getRandomBytes(X25519_ORDER_SIZE)
+            ecdhYs = x25519(self.ecdhXs, X25519_G)
+        else:
+            curve = getCurveByName(GroupName.toRepr(self.group_id))
+            self.ecdhXs = ecdsa.util.randrange(curve.generator.order())
+            ecdhYs = encodeX962Point(multiplyGenerator(curve, self.ecdhXs))
 
         version = self.serverHello.server_version
         serverKeyExchange = ServerKeyExchange(self.cipherSuite, version)
@@ -339,11 +344,15 @@ class ECDHE_RSAKeyExchange(KeyExchange):
 
     def processClientKeyExchange(self, clientKeyExchange):
         """Calculate premaster secret from previously generated SKE and CKE"""
+        if self.group_id == GroupName.x25519:
+            return self._calcX25519SharedSecret(self.ecdhXs,
+                                                clientKeyExchange.ecdh_Yc)
+
         curveName = GroupName.toRepr(self.group_id)
         ecdhYc = decodeX962Point(clientKeyExchange.ecdh_Yc,
                                  getCurveByName(curveName))
 
-        sharedSecret = ecdhYc * self.ecdhXs
+        sharedSecret = multiplyPoint(ecdhYc, self.ecdhXs)
 
         return numberToByteArray(sharedSecret.x(), getPointByteSize(ecdhYc))
 
@@ -356,16 +365,41 @@ class ECDHE_RSAKeyExchange(KeyExchange):
             raise TLSIllegalParameterException("Server picked curve we "
                                                "didn't advertise")
 
+        if serverKeyExchange.named_curve == GroupName.x25519:
+            ecdhXc = getRandomBytes(X25519_ORDER_SIZE)
+            self.ecdhYc = x25519(ecdhXc, X25519_G)
+            return self._calcX25519SharedSecret(ecdhXc,
+                                                serverKeyExchange.ecdh_Ys)
+
         curveName = GroupName.toStr(serverKeyExchange.named_curve)
         curve = getCurveByName(curveName)
-        generator = curve.generator
 
-        ecdhXc = ecdsa.util.randrange(generator.order())
+        ecdhXc = ecdsa.util.randrange(curve.generator.order())
         ecdhYs = decodeX962Point(serverKeyExchange.ecdh_Ys, curve)
-        self.ecdhYc = encodeX962Point(generator * ecdhXc)
-        S = ecdhYs * ecdhXc
+        self.ecdhYc = encodeX962Point(multiplyGenerator(curve, ecdhXc))
+        S = multiplyPoint(ecdhYs, ecdhXc)
         return numberToByteArray(S.x(), getPointByteSize(S))
 
+    @staticmethod
+    def _calcX25519SharedSecret(privateKey, peerShare):
+        """
+        Calculate the X25519 shared secret, check the peer key share
+
+        The ephemeral private key is overwritten, it must not be used again.
+        """
+        try:
+            if len(peerShare) != X25519_ORDER_SIZE:
+                raise TLSIllegalParameterException("Invalid size of X25519 "
+                                                   "key share")
+            sharedSecret = x25519(privateKey, peerShare)
+        finally:
+            zeroizeBytes(privateKey)
+        # RFC 7748 Section 6.1: check for the all-zero value, which is the
+        # result of using a small order point as the key share
+        if sharedSecret == bytearray(X25519_ORDER_SIZE):
+            raise TLSIllegalParameterException("Invalid X25519 key share")
+        return sharedSecret
+
     def makeClientKeyExchange(self):
         """Make client key exchange for ECDHE"""
         cke = super(ECDHE_RSAKeyExchange, self).makeClientKeyExchange()
@@ -403,7 +437,7 @@ class SRPKeyExchange(KeyExchange):
         #Calculate server's ephemeral DH values (b, B)
         self.b = bytesToNumber(getRandomBytes(32))
         k = makeK(self.N, g)
-        self.B = (powMod(g, self.b, self.N) + (k * self.v)) % self.N
+        self.B = (powModGenerator(g, self.b, self.N) + (k * self.v)) % self.N
 
         #Create ServerKeyExchange, signing it if necessary
         serverKeyExchange = ServerKeyExchange(self.cipherSuite,
@@ -447,12 +481,12 @@ class SRPKeyExchange(KeyExchange):
 
         #Client ephemeral value
         a = bytesToNumber(getRandomBytes(32))
-        self.A = powMod(g, a, N)
+        self.A = powModGenerator(g, a, N)
 
         #Calculate client's static DH values (x, v)
         x = makeX(s, bytearray(self.srpUsername, "utf-8"),
                   bytearray(self.password, "utf-8"))
-        v = powMod(g, x, N)
+        v = powModGenerator(g, x, N)
 
         #Calculate u
         u = makeU(N, self.A, B)
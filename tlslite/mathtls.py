@@ -25,6 +25,13 @@ goodGroupParameters = [(2,0xEEAF0AB9ADB38DD69C33F80AFA8FC5E86072618775FF3C0B9EA2
                        (5,0xFFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7EDEE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3BE39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF6955817183995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E208E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D788719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA993B4EA988D8FDDC186FFB7DC90A6C08F4DF435C93402849236C3FAB4D27C7026C1D4DCB2602646DEC9751E763DBA37BDF8FF9406AD9E530EE5DB382F413001AEB06A53ED9027D831179727B0865A8918DA3EDBEBCF9B14ED44CE6CBACED4BB1BDB7F1447E6CC254B332051512BD7AF426FB8F401378CD2BF5983CA01C64B92ECF032EA15D1721D03F482D7CE6E74FEF6D55E702F46980C82B5A84031900B1C9E59E7C97FBEC7E8F323A97A7E36CC88BE0F1D45B7FF585AC54BD407B22B4154AACC8F6D7EBF48E1D814CC5ED20F8037E0A79715EEF29BE32806A1D58BB7C5DA76F550AA3D8A1FBFF0EB19CCB1A313D55CDA56C9EC2EF29632387FE8D76E3C0468043E8F663F4860EE12BF2D5B0B7474D6E694F91E6DBE115974A3926F12FEE5E438777CB6A932DF8CD8BEC4D073B931BA3BC832B68D9DD300741FA7BF8AFC47ED2576F6936BA424663AAB639C5AE4F5683423B4742BF1C978238F16CBE39D652DE3FDB8BEFC848AD922222E04A4037C0713EB57A81A23F0C73473FC646CEA306B4BCBC8862F8385DDFA9D4B7FA2C087E879683303ED5BDD3A062B3CF5B3A278A66D2A13F83F44F82DDF310EE074AB6A364597E899A0255DC164F31CC50846851DF9AB48195DED7EA1B1D510BD7EE74D73FAF36BC31ECFA268359046F4EB879F924009438B481C6CD7889A002ED5EE382BC9190DA6FC026E479558E4475677E9AA9E3050E2765694DFC81F56E880B96E7160C980DD98EDD3DFFFFFFFFFFFFFFFFF)]
 
 def P_hash(macFunc, secret, seed, length):
+    """
+    Calculate the P_hash function from TLS using a HMAC function
+
+    Kept for compatibility, L{P_hashDigest} is faster.
+
+    @param macFunc: HMAC function to use, e.g. L{HMAC_SHA256}
+    """
     bytes = bytearray(length)
     A = seed
     index = 0
@@ -38,28 +45,70 @@ def P_hash(macFunc, secret, seed, length):
             index += 1
     return bytes
 
-def PRF(secret, label, seed, length):
+def P_hashDigest(digestmod, secret, seed, length, keyCache=None):
+    """
+    Calculate the P_hash function from TLS using a hash constructor
+
+    The HMAC is keyed only once, every block is calculated using copies
+    of the keyed state.
+
+    @param digestmod: hash constructor to use in HMAC
+    @type keyCache: dict
+    @param keyCache: storage for HMACs keyed with the secret, for reuse in
+    later calls; the HMACs are indexed by hash only (not by the secret, so
+    that no copy of it is kept) so a cache must be used with just one secret,
+    like the master secret of a session
+    """
+    ret = bytearray(length)
+    secret = compatHMAC(secret)
+    seed = compatHMAC(seed)
+    keyedMAC = None
+    if keyCache is not None:
+        keyedMAC = keyCache.get(digestmod)
+    if keyedMAC is None:
+        keyedMAC = hmac.new(secret, digestmod=digestmod)
+        if keyCache is not None:
+            keyCache[digestmod] = keyedMAC
+    A = seed
+    index = 0
+    while index < length:
+        mac = keyedMAC.copy()
+        mac.update(A)
+        A = mac.digest()
+        mac = keyedMAC.copy()
+        mac.update(A)
+        mac.update(seed)
+        output = mac.digest()
+        ret[index:index+len(output)] = output[:length-index]
+        index += len(output)
+    return ret
+
+def PRF(secret, label, seed, length, keyCache=None):
     #Split the secret into left and right halves
     # which may share a byte if len is odd
     S1 = secret[ : int(math.ceil(len(secret)/2.0))]
     S2 = secret[ int(math.floor(len(secret)/2.0)) : ]
 
     #Run the left half through P_MD5 and the right half through P_SHA1
-    p_md5 = P_hash(HMAC_MD5, S1, label + seed, length)
-    p_sha1 = P_hash(HMAC_SHA1, S2, label + seed, length)
+    p_md5 = P_hashDigest(hashlib.md5, S1, label + seed, length,
+                         keyCache)
+    p_sha1 = P_hashDigest(hashlib.sha1, S2, label + seed, length,
+                          keyCache)
 
     #XOR the output values and return the result
     for x in range(length):
         p_md5[x] ^= p_sha1[x]
     return p_md5
 
-def PRF_1_2(secret, label, seed, length):
+def PRF_1_2(secret, label, seed, length, keyCache=None):
     """Pseudo Random Function for TLS1.2 ciphers that use SHA256"""
-    return P_hash(HMAC_SHA256, secret, label + seed, length)
+    return P_hashDigest(hashlib.sha256, secret, label + seed, length,
+                        keyCache)
 
-def PRF_1_2_SHA384(secret, label, seed, length):
+def PRF_1_2_SHA384(secret, label, seed, length, keyCache=None):
     """Pseudo Random Function for TLS1.2 ciphers that use SHA384"""
-    return P_hash(HMAC_SHA384, secret, label + seed, length)
+    return P_hashDigest(hashlib.sha384, secret, label + seed, length,
+                        keyCache)
 
 def PRF_SSL(secret, seed, length):
     bytes = bytearray(length)
@@ -100,7 +149,7 @@ def calcMasterSecret(version, cipherSuite, premasterSecret, clientRandom,
     return masterSecret
 
 def calcFinished(version, masterSecret, cipherSuite, handshakeHashes,
-                 isClient):
+                 isClient, keyCache=None):
     """Calculate the Handshake protocol Finished value
 
     @param version: TLS protocol version tuple
@@ -109,6 +158,8 @@ def calcFinished(version, masterSecret, cipherSuite, handshakeHashes,
     @param handshakeHashes: running hash of the handshake messages
     @param isClient: whether the calculation should be performed for message
     sent by client (True) or by server (False) side of connection
+    @param keyCache: cache of HMACs keyed with the master secret, see
+    L{P_hashDigest}
     """
     assert version in ((3, 0), (3, 1), (3, 2), (3, 3))
     if version == (3,0):
@@ -126,15 +177,17 @@ def calcFinished(version, masterSecret, cipherSuite, handshakeHashes,
 
         if version in ((3,1), (3,2)):
             handshakeHash = handshakeHashes.digest()
-            verifyData = PRF(masterSecret, label, handshakeHash, 12)
+            verifyData = PRF(masterSecret, label, handshakeHash, 12,
+                             keyCache)
         else: # version == (3,3):
             if cipherSuite in CipherSuite.sha384PrfSuites:
                 handshakeHash = handshakeHashes.digest('sha384')
                 verifyData = PRF_1_2_SHA384(masterSecret, label,
-                                            handshakeHash, 12)
+                                            handshakeHash, 12, keyCache)
             else:
                 handshakeHash = handshakeHashes.digest('sha256')
-                verifyData = PRF_1_2(masterSecret, label, handshakeHash, 12)
+                verifyData = PRF_1_2(masterSecret, label, handshakeHash, 12,
+                                     keyCache)
 
     return verifyData
 
@@ -147,13 +200,24 @@ def makeX(salt, username, password):
     outerHashResult = SHA1(salt + innerHashResult)
     return bytesToNumber(outerHashResult)
 
+def powModGenerator(g, power, N):
+    """
+    Calculate g**power % N
+
+    For the groups from L{goodGroupParameters} the powers of the generator
+    are precomputed, for other groups a regular exponentiation is used.
+    """
+    if (g, N) in goodGroupParameters:
+        return powModFixedBase(g, power, N)
+    return powMod(g, power, N)
+
 #This function is used by VerifierDB.makeVerifier
 def makeVerifier(username, password, bits):
     bitsIndex = {1024:0, 1536:1, 2048:2, 3072:3, 4096:4, 6144:5, 8192:6}[bits]
     g,N = goodGroupParameters[bitsIndex]
     salt = getRandomBytes(16)
     x = makeX(salt, username, password)
-    verifier = powMod(g, x, N)
+    verifier = powModGenerator(g, x, N)
     return N, g, salt, verifier
 
 def PAD(n, x):
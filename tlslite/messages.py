@@ -10,6 +10,7 @@
 
 """Classes representing TLS messages."""
 
+import weakref
 from .utils.compat import *
 from .utils.cryptomath import *
 from .errors import *
@@ -24,6 +25,8 @@ class RecordHeader(object):
 
     """Generic interface to SSLv2 and SSLv3 (and later) record headers"""
 
+    __slots__ = ('type', 'version', 'length', 'ssl2')
+
     def __init__(self, ssl2):
         """define instance variables"""
         self.type = 0
@@ -35,6 +38,8 @@ class RecordHeader3(RecordHeader):
 
     """SSLv3 (and later) TLS record header"""
 
+    __slots__ = ()
+
     def __init__(self):
         """Define a SSLv3 style class"""
         super(RecordHeader3, self).__init__(ssl2=False)
@@ -85,6 +90,8 @@ class RecordHeader2(RecordHeader):
 
     """SSLv2 record header (just reading)"""
 
+    __slots__ = ()
+
     def __init__(self):
         """Define a SSLv2 style class"""
         super(RecordHeader2, self).__init__(ssl2=True)
@@ -103,6 +110,8 @@ class Message(object):
 
     """Generic TLS message"""
 
+    __slots__ = ('contentType', 'data')
+
     def __init__(self, contentType, data):
         """
         Initialize object with specified contentType and data
@@ -203,7 +212,8 @@ class ClientHello(HandshakeMsg):
 
     @type extensions: list of L{TLSExtension}
     @ivar extensions: list of TLS extensions parsed from wire or to send, see
-        L{TLSExtension} and child classes for exact examples
+        L{TLSExtension} and child classes for exact examples. When the message
+        was parsed lazily, accessing it decodes all extensions.
     """
     def __init__(self, ssl2=False):
         HandshakeMsg.__init__(self, HandshakeType.client_hello)
@@ -215,6 +225,47 @@ class ClientHello(HandshakeMsg):
         self.compression_methods = []   # a list of 8-bit values
         self.extensions = None
 
+    @property
+    def extensions(self):
+        """Return list of extensions, decoding all not decoded yet"""
+        if self._extensionIndex is not None:
+            self._extensions = [self._decodeExtension(i) for i in
+                                range(len(self._extensionIndex))]
+            self._extensionIndex = None
+            self._extensionBytes = None
+            self._decodedExtensions = None
+        return self._extensions
+
+    @extensions.setter
+    def extensions(self, val):
+        """Set list of extensions, dropping any not decoded yet"""
+        self._extensions = val
+        # list of (extension type, offset of the extension in
+        # _extensionBytes) of extensions received but not decoded yet
+        self._extensionIndex = None
+        self._extensionBytes = None
+        # extensions from _extensionIndex already decoded, keyed by position
+        self._decodedExtensions = None
+
+    def _decodeExtension(self, position):
+        """
+        Decode a lazily parsed extension at given position in the list
+
+        @raise TLSDecodeError: when the extension is malformed
+        """
+        ext = self._decodedExtensions.get(position)
+        if ext is None:
+            parser = Parser(self._extensionBytes)
+            parser.index = self._extensionIndex[position][1]
+            try:
+                ext = TLSExtension().parse(parser)
+            except SyntaxError as e:
+                raise TLSDecodeError("Malformed extension of type {0}: {1}"
+                                     .format(self._extensionIndex[position][0],
+                                             e))
+            self._decodedExtensions[position] = ext
+        return ext
+
     def __str__(self):
         """
         Return human readable representation of Client Hello
@@ -257,7 +308,20 @@ class ClientHello(HandshakeMsg):
         @rtype: L{tlslite.extensions.TLSExtension}
         @raise TLSInternalError: when there are multiple extensions of the
             same type
-        """
+        @raise TLSDecodeError: when the message was parsed lazily and the
+            extension is malformed
+        """
+        if self._extensionIndex is not None:
+            positions = [i for i, (ext, _) in enumerate(self._extensionIndex)
+                         if ext == extType]
+            if len(positions) > 1:
+                raise TLSInternalError(
+                        "Multiple extensions of the same type present")
+            elif len(positions) == 1:
+                return self._decodeExtension(positions[0])
+            else:
+                return None
+
         if self.extensions is None:
             return None
 
@@ -519,7 +583,18 @@ class ClientHello(HandshakeMsg):
             self.server_name = bytearray(serverName, "utf-8")
         return self
 
-    def parse(self, p):
+    def parse(self, p, lazy=False):
+        """
+        Deserialise the message from on-the-wire data
+
+        @type p: L{Parser}
+        @param p: parser with the message payload
+        @type lazy: boolean
+        @param lazy: only check the framing of extensions and decode each of
+            them when it is looked up with L{getExtension} or when the
+            L{extensions} list is accessed
+        @rtype: L{ClientHello}
+        """
         if self.ssl2:
             self.client_version = (p.get(1), p.get(1))
             cipherSpecsLength = p.get(2)
@@ -544,12 +619,31 @@ class ClientHello(HandshakeMsg):
             if not p.atLengthCheck():
                 self.extensions = []
                 totalExtLength = p.get(2)
-                while not p.atLengthCheck():
-                    ext = TLSExtension().parse(p)
-                    self.extensions += [ext]
+                if lazy:
+                    self._indexExtensions(p)
+                else:
+                    while not p.atLengthCheck():
+                        ext = TLSExtension().parse(p)
+                        self.extensions += [ext]
             p.stopLengthCheck()
         return self
 
+    def _indexExtensions(self, p):
+        """Record type and position of all extensions left in parser"""
+        index = []
+        start = p.index
+        while not p.atLengthCheck():
+            offset = p.index - start
+            extType = p.get(2)
+            extLength = p.get(2)
+            if extLength > p.getRemainingLength():
+                raise SyntaxError()
+            p.index += extLength
+            index.append((extType, offset))
+        self._extensionIndex = index
+        self._extensionBytes = p.bytes[start:p.index]
+        self._decodedExtensions = {}
+
     def write(self):
         w = Writer()
         w.add(self.client_version[0], 1)
@@ -559,7 +653,12 @@ class ClientHello(HandshakeMsg):
         w.addVarSeq(self.cipher_suites, 2, 2)
         w.addVarSeq(self.compression_methods, 1, 1)
 
-        if not self.extensions is None:
+        if self._extensionIndex is not None and not self._decodedExtensions:
+            # none of the extensions were decoded so none could be modified,
+            # they can be copied as received
+            w.add(len(self._extensionBytes), 2)
+            w.bytes += self._extensionBytes
+        elif not self.extensions is None:
             w2 = Writer()
             for ext in self.extensions:
                 w2.bytes += ext.write()
@@ -826,6 +925,10 @@ class ServerHello(HandshakeMsg):
         return self.postWrite(w)
 
 class Certificate(HandshakeMsg):
+    # encoded certificate_list of chains written before, servers send the
+    # same chain in every full handshake
+    _encodedChains = weakref.WeakKeyDictionary()
+
     def __init__(self, certificateType):
         HandshakeMsg.__init__(self, HandshakeType.certificate)
         self.certificateType = certificateType
@@ -855,23 +958,34 @@ class Certificate(HandshakeMsg):
         p.stopLengthCheck()
         return self
 
+    def _writeCertificateList(self):
+        """
+        Return encoded certificate_list of the chain.
+
+        Reuses the encoding from previous call with the same chain as long
+        as it holds the same certificates.
+        """
+        if not self.certChain:
+            return bytearray(3)
+        certificate_list = [cert.writeBytes()
+                            for cert in self.certChain.x509List]
+        cached = self._encodedChains.get(self.certChain)
+        if cached is not None and len(cached[0]) == len(certificate_list) \
+                and all(old is new for old, new in
+                        zip(cached[0], certificate_list)):
+            return cached[1]
+
+        w = Writer()
+        w.add(sum(len(bytes) + 3 for bytes in certificate_list), 3)
+        for bytes in certificate_list:
+            w.addVarSeq(bytes, 1, 3)
+        self._encodedChains[self.certChain] = (certificate_list, w.bytes)
+        return w.bytes
+
     def write(self):
         w = Writer()
         if self.certificateType == CertificateType.x509:
-            chainLength = 0
-            if self.certChain:
-                certificate_list = self.certChain.x509List
-            else:
-                certificate_list = []
-            #determine length
-            for cert in certificate_list:
-                bytes = cert.writeBytes()
-                chainLength += len(bytes)+3
-            #add bytes
-            w.add(chainLength, 3)
-            for cert in certificate_list:
-                bytes = cert.writeBytes()
-                w.addVarSeq(bytes, 1, 3)
+            w.bytes += self._writeCertificateList()
         else:
             raise AssertionError()
         return self.postWrite(w)
@@ -1396,6 +1510,8 @@ class Finished(HandshakeMsg):
         return self.postWrite(w)
 
 class ApplicationData(object):
+    __slots__ = ('contentType', 'bytes')
+
     def __init__(self):
         self.contentType = ContentType.application_data
         self.bytes = bytearray(0)
@@ -10,6 +10,7 @@ from .recordlayer import RecordLayer
 from .constants import ContentType
 from .messages import RecordHeader3, Message
 from .utils.codec import Parser
+from .utils.compat import compatMemoryView
 
 class MessageSocket(RecordLayer):
 
@@ -55,7 +56,12 @@ class MessageSocket(RecordLayer):
         self.unfragmentedDataTypes = tuple((ContentType.application_data, ))
         self._lastRecordVersion = (0, 0)
 
-        self._sendBuffer = bytearray(0)
+        # queued messages are kept as written, records are gathered from
+        # them on flush, the cursor points to the first not sent byte
+        self._sendQueue = []
+        self._sendQueueIndex = 0
+        self._sendQueueOffset = 0
+        self._sendQueueLength = 0
         self._sendBufferType = None
 
         self.recordSize = 2**14
@@ -103,6 +109,34 @@ class MessageSocket(RecordLayer):
             else:
                 return res
 
+    def _takeQueued(self, size):
+        """Remove up to size bytes from the send queue and return them"""
+        size = min(size, self._sendQueueLength)
+        queue = self._sendQueue
+        buf = queue[self._sendQueueIndex]
+        start = self._sendQueueOffset
+        if len(buf) - start >= size:
+            # whole record lies in a single message
+            payload = buf[start:start + size]
+            start += size
+        else:
+            payload = bytearray(compatMemoryView(buf)[start:])
+            while len(payload) < size:
+                self._sendQueueIndex += 1
+                buf = queue[self._sendQueueIndex]
+                start = min(len(buf), size - len(payload))
+                payload += compatMemoryView(buf)[:start]
+        if start == len(buf):
+            self._sendQueueIndex += 1
+            start = 0
+        self._sendQueueOffset = start
+        self._sendQueueLength -= size
+        if self._sendQueueLength == 0:
+            self._sendQueue = []
+            self._sendQueueIndex = 0
+            self._sendQueueOffset = 0
+        return payload
+
     def flush(self):
         """
         Empty the queue of messages to write
@@ -112,14 +146,13 @@ class MessageSocket(RecordLayer):
 
         @rtype: generator
         """
-        while len(self._sendBuffer) > 0:
-            recordPayload = self._sendBuffer[:self.recordSize]
-            self._sendBuffer = self._sendBuffer[self.recordSize:]
+        while self._sendQueueLength > 0:
+            recordPayload = self._takeQueued(self.recordSize)
             msg = Message(self._sendBufferType, recordPayload)
             for res in self.sendRecord(msg):
                 yield res
 
-        assert len(self._sendBuffer) == 0
+        assert self._sendQueueLength == 0
         self._sendBufferType = None
 
     def flushBlocking(self):
@@ -143,7 +176,7 @@ class MessageSocket(RecordLayer):
             self._sendBufferType = msg.contentType
 
         if msg.contentType == self._sendBufferType:
-            self._sendBuffer += msg.write()
+            self._queueData(msg.write())
             return
 
         for res in self.flush():
@@ -151,7 +184,13 @@ class MessageSocket(RecordLayer):
 
         assert self._sendBufferType is None
         self._sendBufferType = msg.contentType
-        self._sendBuffer += msg.write()
+        self._queueData(msg.write())
+
+    def _queueData(self, data):
+        """Add encoded message to the send queue"""
+        if data:
+            self._sendQueue.append(data)
+            self._sendQueueLength += len(data)
 
     def queueMessageBlocking(self, msg):
         """Blocking variant of L{queueMessage}"""
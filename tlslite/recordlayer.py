@@ -7,17 +7,20 @@
 
 import socket
 import errno
+import struct
+import time
 import hashlib
 from .constants import ContentType, CipherSuite
 from .messages import RecordHeader3, RecordHeader2, Message
 from .utils.cipherfactory import createAESGCM, createAES, createRC4, \
         createTripleDES, createCHACHA20,createSPECK, createSPECK128GCM, createSPECK192GCM
-from .utils.codec import Parser, Writer
-from .utils.compat import compatHMAC
-from .utils.cryptomath import getRandomBytes
+from .utils.codec import Parser
+from .utils.compat import compatHMAC, compatMemoryView
+from .utils.cryptomath import getRandomBytes, zeroizeBytes
 from .utils.constanttime import ct_compare_digest, ct_check_cbc_mac_and_pad
 from .errors import TLSRecordOverflow, TLSIllegalParameterException,\
-        TLSAbruptCloseError, TLSDecryptionFailed, TLSBadRecordMAC
+        TLSAbruptCloseError, TLSDecryptionFailed, TLSBadRecordMAC, \
+        TLSSequenceNumberOverflow
 from .mathtls import createMAC_SSL, createHMAC, PRF_SSL, PRF, PRF_1_2, \
         PRF_1_2_SHA384
 
@@ -25,6 +28,9 @@ class RecordSocket(object):
 
     """Socket wrapper for reading and writing TLS Records"""
 
+    __slots__ = ('sock', 'version', 'ioTime', 'timeIO', 'bufferWrites',
+                 '_writeBuffer', 'recordSizeLimit')
+
     def __init__(self, sock):
         """
         Assign socket to wrapper
@@ -33,6 +39,15 @@ class RecordSocket(object):
         """
         self.sock = sock
         self.version = (0, 0)
+        # seconds spent in send() and recv() calls of the socket while
+        # timeIO was set
+        self.ioTime = 0.0
+        self.timeIO = False
+        # when set, records are collected in _writeBuffer until flush()
+        self.bufferWrites = False
+        self._writeBuffer = bytearray(0)
+        # maximum size of plaintext in received records
+        self.recordSizeLimit = 2**14
 
     def _sockSendAll(self, data):
         """
@@ -43,13 +58,20 @@ class RecordSocket(object):
         @raise socket.error: when write to socket failed
         """
         while 1:
+            timeIO = self.timeIO
+            if timeIO:
+                start = time.time()
             try:
                 bytesSent = self.sock.send(data)
             except socket.error as why:
+                if timeIO:
+                    self.ioTime += time.time() - start
                 if why.args[0] in (errno.EWOULDBLOCK, errno.EAGAIN):
                     yield 1
                     continue
                 raise
+            if timeIO:
+                self.ioTime += time.time() - start
 
             if bytesSent == len(data):
                 return
@@ -72,6 +94,44 @@ class RecordSocket(object):
 
         data = header.write() + data
 
+        for result in self.sendFramed(data):
+            yield result
+
+    def sendFramed(self, data):
+        """
+        Send a record that already starts with the record layer header.
+
+        If L{bufferWrites} is set, the record is only queued until
+        L{flush} is called. Otherwise records still queued are sent
+        together with this one.
+
+        @type data: bytearray
+        @param data: complete TLS record, header included
+        @raise socket.error: when write to socket failed
+        """
+        if self.bufferWrites:
+            self._writeBuffer += data
+            return
+
+        if self._writeBuffer:
+            # queued records have to go out first
+            data = self._writeBuffer + data
+            self._writeBuffer = bytearray(0)
+
+        for result in self._sockSendAll(data):
+            yield result
+
+    def flush(self):
+        """
+        Send all queued records through socket in a single write.
+
+        @raise socket.error: when write to socket failed
+        """
+        if not self._writeBuffer:
+            return
+
+        data = self._writeBuffer
+        self._writeBuffer = bytearray(0)
         for result in self._sockSendAll(data):
             yield result
 
@@ -90,14 +150,21 @@ class RecordSocket(object):
             yield buf
 
         while True:
+            timeIO = self.timeIO
+            if timeIO:
+                start = time.time()
             try:
                 socketBytes = self.sock.recv(length - len(buf))
             except socket.error as why:
+                if timeIO:
+                    self.ioTime += time.time() - start
                 if why.args[0] in (errno.EWOULDBLOCK, errno.EAGAIN):
                     yield 0
                     continue
                 else:
                     raise
+            if timeIO:
+                self.ioTime += time.time() - start
 
             #if the connection closed, raise socket error
             if len(socketBytes) == 0:
@@ -181,9 +248,9 @@ class RecordSocket(object):
         assert record is not None
 
         #Check the record header fields
-        # 18432 = 2**14 (basic record size limit) + 1024 (maximum compression
-        # overhead) + 1024 (maximum encryption overhead)
-        if record.length > 18432:
+        # 2048 = 1024 (maximum compression overhead) + 1024 (maximum
+        # encryption overhead) over the plaintext limit (2**14 by default)
+        if record.length > self.recordSizeLimit + 2048:
             raise TLSRecordOverflow()
 
         #Read the record contents
@@ -204,19 +271,61 @@ class ConnectionState(object):
 
     """Preserve the connection state for reading and writing data to records"""
 
+    __slots__ = ('macContext', 'encContext', 'fixedNonce', 'seqnum',
+                 '_aeadBuffer')
+
+    # sequence numbers are 64 bit and must not wrap (RFC 5246 Section 6.1)
+    SEQNUM_LIMIT = 2**64
+
     def __init__(self):
         """Create an instance with empty encryption and MACing contexts"""
         self.macContext = None
         self.encContext = None
         self.fixedNonce = None
         self.seqnum = 0
+        self._aeadBuffer = None
+
+    def _nextSeqNum(self):
+        """Return current sequence number and increment it."""
+        seqnum = self.seqnum
+        if seqnum >= self.SEQNUM_LIMIT:
+            raise TLSSequenceNumberOverflow()
+        self.seqnum = seqnum + 1
+        return seqnum
 
     def getSeqNumBytes(self):
         """Return encoded sequence number and increment it."""
-        writer = Writer()
-        writer.add(self.seqnum, 8)
-        self.seqnum += 1
-        return writer.bytes
+        return bytearray(struct.pack('>Q', self._nextSeqNum()))
+
+    def getAEADParameters(self, contentType, version, length):
+        """
+        Return inputs for sealing or opening next AEAD record.
+
+        Increments the sequence number.
+
+        @type contentType: int
+        @param contentType: type of the record
+        @type version: tuple
+        @param version: protocol version of the record
+        @type length: int
+        @param length: length of plaintext in the record
+        @rtype: tuple
+        @return: encoded sequence number, nonce made of the fixed nonce and
+            sequence number and the additional authenticated data
+        """
+        nonceLength = len(self.fixedNonce)
+        # the nonce (fixed part and sequence number) and authenticated data
+        # (sequence number and record fields) overlap in the sequence number
+        # so they can be packed together
+        if self._aeadBuffer is None:
+            self._aeadBuffer = bytearray(nonceLength + 13)
+            self._aeadBuffer[:nonceLength] = self.fixedNonce
+        buf = self._aeadBuffer
+        struct.pack_into('>QBBBH', buf, nonceLength, self._nextSeqNum(),
+                         contentType, version[0], version[1], length)
+        return (buf[nonceLength:nonceLength + 8],
+                buf[:nonceLength + 8],
+                buf[nonceLength:])
 
 class RecordLayer(object):
 
@@ -230,6 +339,11 @@ class RecordLayer(object):
     integrity
     """
 
+    # instance dictionary is created only when other attributes are set
+    __slots__ = ('sock', '_recordSocket', '_version', 'client', '_writeState',
+                 '_readState', '_pendingWriteState', '_pendingReadState',
+                 'fixedIVBlock', 'encryptThenMAC', '__dict__')
+
     def __init__(self, sock):
         self.sock = sock
         self._recordSocket = RecordSocket(sock)
@@ -261,6 +375,50 @@ class RecordLayer(object):
         self._version = val
         self._recordSocket.version = val
 
+    @property
+    def ioTime(self):
+        """Return the time spent in socket send and receive calls (R/O)"""
+        return self._recordSocket.ioTime
+
+    @property
+    def timeIO(self):
+        """Return whether time spent in socket calls is measured"""
+        return self._recordSocket.timeIO
+
+    @timeIO.setter
+    def timeIO(self, val):
+        """Set whether time spent in socket calls is measured"""
+        self._recordSocket.timeIO = val
+
+    @property
+    def recvRecordLimit(self):
+        """Return the maximum size of plaintext in received records"""
+        return self._recordSocket.recordSizeLimit
+
+    @recvRecordLimit.setter
+    def recvRecordLimit(self, val):
+        """Set the maximum size of plaintext in received records"""
+        self._recordSocket.recordSizeLimit = val
+
+    @property
+    def bufferWrites(self):
+        """Return whether sent records are queued until L{flush}"""
+        return self._recordSocket.bufferWrites
+
+    @bufferWrites.setter
+    def bufferWrites(self, val):
+        """Set whether sent records are queued until L{flush}"""
+        self._recordSocket.bufferWrites = val
+
+    def flush(self):
+        """
+        Send records queued while L{bufferWrites} was set.
+
+        @rtype: generator
+        """
+        for result in self._recordSocket.flush():
+            yield result
+
     def getCipherName(self):
         """
         Return the name of the bulk cipher used by this connection
@@ -291,6 +449,7 @@ class RecordLayer(object):
         self._readState = ConnectionState()
         self._pendingWriteState = ConnectionState()
         self._pendingReadState = ConnectionState()
+        self.bufferWrites = False
 
     def isCBCMode(self):
         """Returns true if cipher uses CBC mode"""
@@ -313,17 +472,25 @@ class RecordLayer(object):
         data += paddingBytes
         return data
 
+    def _macHeader(self, seqnumBytes, contentType, length):
+        """
+        Return the fields authenticated by the MAC before record payload
+
+        That is the sequence number, content type, protocol version (except
+        in SSLv3) and payload length, encoded as a single string.
+        """
+        assert self.version in ((3, 0), (3, 1), (3, 2), (3, 3))
+        if self.version == (3, 0):
+            header = struct.pack('>BH', contentType, length)
+        else:
+            header = struct.pack('>BBBH', contentType, self.version[0],
+                                 self.version[1], length)
+        return compatHMAC(seqnumBytes) + header
+
     def calculateMAC(self, mac, seqnumBytes, contentType, data):
         """Calculate the SSL/TLS version of a MAC"""
-        mac.update(compatHMAC(seqnumBytes))
-        mac.update(compatHMAC(bytearray([contentType])))
-        assert self.version in ((3, 0), (3, 1), (3, 2), (3, 3))
-        if self.version != (3, 0):
-            mac.update(compatHMAC(bytearray([self.version[0]])))
-            mac.update(compatHMAC(bytearray([self.version[1]])))
-        mac.update(compatHMAC(bytearray([len(data)//256])))
-        mac.update(compatHMAC(bytearray([len(data)%256])))
-        mac.update(compatHMAC(data))
+        mac.update(self._macHeader(seqnumBytes, contentType, len(data)))
+        mac.update(compatMemoryView(data))
         return bytearray(mac.digest())
 
     def _macThenEncrypt(self, data, contentType):
@@ -366,34 +533,44 @@ class RecordLayer(object):
             seqnumBytes = self._writeState.getSeqNumBytes()
             mac = self._writeState.macContext.copy()
 
-            # append MAC
-            macBytes = self.calculateMAC(mac, seqnumBytes, contentType, buf)
-            buf += macBytes
+            # append MAC, extending the ciphertext buffer in place
+            buf += self.calculateMAC(mac, seqnumBytes, contentType, buf)
 
         return buf
 
     def _encryptThenSeal(self, buf, contentType):
-        """Encrypt with AEAD cipher"""
-        #Assemble the authenticated data.
-        seqNumBytes = self._writeState.getSeqNumBytes()
-        authData = seqNumBytes + bytearray([contentType,
-                                            self.version[0],
-                                            self.version[1],
-                                            len(buf)//256,
-                                            len(buf)%256])
+        """
+        Encrypt with AEAD cipher
 
+        Returns the complete record, with the record layer header and
+        explicit nonce written in front of the sealed data.
+        """
+        #Assemble the authenticated data.
         #The nonce is always the fixed nonce and the sequence number.
-        nonce = self._writeState.fixedNonce + seqNumBytes
+        seqNumBytes, nonce, authData = self._writeState.getAEADParameters(
+            contentType, self.version, len(buf))
 
         assert len(nonce) == self._writeState.encContext.nonceLength
 
         buf = self._writeState.encContext.seal(nonce, buf, authData)
 
         #AES-GCM, has an explicit variable nonce.
-        if "aes" or "speck" in self._writeState.encContext.name:
-            buf = seqNumBytes + buf
+        name = self._writeState.encContext.name
+        if "aes" in name or "speck" in name:
+            explicitNonce = seqNumBytes
+        else:
+            explicitNonce = bytearray(0)
 
-        return buf
+        # lay out header, explicit nonce and ciphertext with tag in a single
+        # buffer so that it can be passed to the socket as-is
+        offset = 5 + len(explicitNonce)
+        record = bytearray(offset + len(buf))
+        struct.pack_into('>BBBH', record, 0, contentType, self.version[0],
+                         self.version[1], offset - 5 + len(buf))
+        record[5:offset] = explicitNonce
+        record[offset:] = buf
+
+        return record
 
     def sendRecord(self, msg):
         """
@@ -411,7 +588,10 @@ class RecordLayer(object):
         if self._writeState and \
             self._writeState.encContext and \
             self._writeState.encContext.isAEAD:
-            data = self._encryptThenSeal(data, contentType)
+            record = self._encryptThenSeal(data, contentType)
+            for result in self._recordSocket.sendFramed(record):
+                yield result
+            return
         elif self.encryptThenMAC:
             data = self._encryptThenMAC(data, contentType)
         else:
@@ -514,8 +694,9 @@ class RecordLayer(object):
             if len(buf) < macLength:
                 raise TLSBadRecordMAC("Truncated data")
 
+            # truncate the buffer in place instead of copying the payload
             checkBytes = buf[-macLength:]
-            buf = buf[:-macLength]
+            del buf[-macLength:]
 
             seqnumBytes = self._readState.getSeqNumBytes()
             mac = self._readState.macContext.copy()
@@ -535,7 +716,7 @@ class RecordLayer(object):
 
             # remove explicit IV
             if self.version >= (3, 2):
-                buf = buf[blockLength:]
+                del buf[:blockLength]
 
             if len(buf) == 0:
                 raise TLSBadRecordMAC("No data left after IV removal")
@@ -557,35 +738,41 @@ class RecordLayer(object):
                 raise TLSBadRecordMAC("Invalid padding byte values")
 
             # remove padding
-            buf = buf[:-totalPaddingLength]
+            del buf[-totalPaddingLength:]
 
         return buf
 
     def _decryptAndUnseal(self, recordType, buf):
         """Decrypt AEAD encrypted data"""
-        seqnumBytes = self._readState.getSeqNumBytes()
         #AES-GCM, has an explicit variable nonce.
-        if "aes" or "speck" in self._readState.encContext.name:
+        name = self._readState.encContext.name
+        if "aes" in name or "speck" in name:
             explicitNonceLength = 8
             if explicitNonceLength > len(buf):
                 #Publicly invalid.
                 raise TLSBadRecordMAC("Truncated nonce")
-            nonce = self._readState.fixedNonce + buf[:explicitNonceLength]
-            buf = buf[8:]
         else:
-            nonce = self._readState.fixedNonce + seqnumBytes
+            explicitNonceLength = 0
 
-        if self._readState.encContext.tagLength > len(buf):
+        if self._readState.encContext.tagLength + explicitNonceLength > \
+                len(buf):
             #Publicly invalid.
             raise TLSBadRecordMAC("Truncated tag")
 
-        plaintextLen = len(buf) - self._readState.encContext.tagLength
-        authData = seqnumBytes + bytearray([recordType, self.version[0],
-                                            self.version[1],
-                                            plaintextLen//256,
-                                            plaintextLen%256])
+        plaintextLen = len(buf) - explicitNonceLength - \
+                self._readState.encContext.tagLength
+        _, nonce, authData = self._readState.getAEADParameters(recordType,
+                                                               self.version,
+                                                               plaintextLen)
+        if explicitNonceLength:
+            nonce = self._readState.fixedNonce + buf[:explicitNonceLength]
+            # slice rather than delete the nonce so that the buffer of the
+            # caller is left intact
+            ciphertext = buf[explicitNonceLength:]
+        else:
+            ciphertext = buf
 
-        buf = self._readState.encContext.open(nonce, buf, authData)
+        buf = self._readState.encContext.open(nonce, ciphertext, authData)
         if buf is None:
             raise TLSBadRecordMAC("Invalid tag, decryption failure")
         return buf
@@ -598,6 +785,8 @@ class RecordLayer(object):
         @return: message header and decrypted message payload
         @raise TLSDecryptionFailed: when decryption of data failed
         @raise TLSBadRecordMAC: when record has bad MAC or padding
+        @raise TLSRecordOverflow: when the decrypted record is larger than
+        L{recvRecordLimit}
         @raise socket.error: when reading from socket was unsuccessful
         """
         result = None
@@ -622,6 +811,10 @@ class RecordLayer(object):
         else:
             data = self._decryptStreamThenMAC(header.type, data)
 
+        # SSLv2 records are never protected, and so never limited
+        if len(data) > self.recvRecordLimit and not header.ssl2:
+            raise TLSRecordOverflow()
+
         yield (header, Parser(data))
 
     #
@@ -648,77 +841,42 @@ class RecordLayer(object):
         self._readState = self._pendingReadState
         self._pendingReadState = ConnectionState()
 
+    _cipherFactories = {"aes256gcm": createAESGCM,
+                        "aes128gcm": createAESGCM,
+                        "chacha20-poly1305": createCHACHA20,
+                        "aes128": createAES,
+                        "aes256": createAES,
+                        "rc4": createRC4,
+                        "3des": createTripleDES,
+                        "null": None,
+                        "speck128": createSPECK,
+                        "speck128gcm": createSPECK128GCM,
+                        "speck192gcm": createSPECK192GCM}
+
+    _macSettings = {"aead": (0, None),
+                    "sha": (20, hashlib.sha1),
+                    "sha256": (32, hashlib.sha256),
+                    "md5": (16, hashlib.md5)}
+
     @staticmethod
     def _getCipherSettings(cipherSuite):
         """Get the settings for cipher suite used"""
-        if cipherSuite in CipherSuite.aes256GcmSuites:
-            keyLength = 32
-            ivLength = 4
-            createCipherFunc = createAESGCM
-        elif cipherSuite in CipherSuite.aes128GcmSuites:
-            keyLength = 16
-            ivLength = 4
-            createCipherFunc = createAESGCM
-        elif cipherSuite in CipherSuite.chacha20Suites:
-            keyLength = 32
-            ivLength = 4
-            createCipherFunc = createCHACHA20
-        elif cipherSuite in CipherSuite.aes128Suites:
-            keyLength = 16
-            ivLength = 16
-            createCipherFunc = createAES
-        elif cipherSuite in CipherSuite.aes256Suites:
-            keyLength = 32
-            ivLength = 16
-            createCipherFunc = createAES
-        elif cipherSuite in CipherSuite.rc4Suites:
-            keyLength = 16
-            ivLength = 0
-            createCipherFunc = createRC4
-        elif cipherSuite in CipherSuite.tripleDESSuites:
-            keyLength = 24
-            ivLength = 8
-            createCipherFunc = createTripleDES
-        elif cipherSuite in CipherSuite.nullSuites:
-            keyLength = 0
-            ivLength = 0
-            createCipherFunc = None
-        elif cipherSuite in CipherSuite.speckSuites:
-            keyLength = 16
-            ivLength = 16
-            createCipherFunc = createSPECK
-        elif cipherSuite in CipherSuite.speck128GcmSuites:
-            keyLength = 16
-            ivLength = 4
-            createCipherFunc = createSPECK128GCM     
-        elif cipherSuite in CipherSuite.speck192GcmSuites:
-            keyLength = 24
-            ivLength = 4
-            createCipherFunc = createSPECK192GCM                 
-        else:
+        descriptor = CipherSuite.descriptors.get(cipherSuite)
+        if descriptor is None:
             raise AssertionError()
 
-        return (keyLength, ivLength, createCipherFunc)
+        return (descriptor.keyLength, descriptor.ivLength,
+                RecordLayer._cipherFactories[descriptor.cipherName])
 
     @staticmethod
     def _getMacSettings(cipherSuite):
         """Get settings for HMAC used"""
-        if cipherSuite in CipherSuite.aeadSuites:
-            macLength = 0
-            digestmod = None
-        elif cipherSuite in CipherSuite.shaSuites:
-            macLength = 20
-            digestmod = hashlib.sha1
-        elif cipherSuite in CipherSuite.sha256Suites:
-            macLength = 32
-            digestmod = hashlib.sha256
-        elif cipherSuite in CipherSuite.md5Suites:
-            macLength = 16
-            digestmod = hashlib.md5
-        else:
+        descriptor = CipherSuite.descriptors.get(cipherSuite)
+        if descriptor is None or \
+                descriptor.macName not in RecordLayer._macSettings:
             raise AssertionError()
 
-        return macLength, digestmod
+        return RecordLayer._macSettings[descriptor.macName]
 
     @staticmethod
     def _getHMACMethod(version):
@@ -732,7 +890,7 @@ class RecordLayer(object):
         return createMACFunc
 
     def _calcKeyBlock(self, cipherSuite, masterSecret, clientRandom,
-                      serverRandom, outputLength):
+                      serverRandom, outputLength, keyCache=None):
         """Calculate the overall key to slice up"""
         if self.version == (3, 0):
             keyBlock = PRF_SSL(masterSecret,
@@ -742,26 +900,36 @@ class RecordLayer(object):
             keyBlock = PRF(masterSecret,
                            b"key expansion",
                            serverRandom + clientRandom,
-                           outputLength)
+                           outputLength,
+                           keyCache)
         elif self.version == (3, 3):
-            if cipherSuite in CipherSuite.sha384PrfSuites:
+            descriptor = CipherSuite.descriptors.get(cipherSuite)
+            if descriptor is not None and descriptor.prfHash == "sha384":
                 keyBlock = PRF_1_2_SHA384(masterSecret,
                                           b"key expansion",
                                           serverRandom + clientRandom,
-                                          outputLength)
+                                          outputLength,
+                                          keyCache)
             else:
                 keyBlock = PRF_1_2(masterSecret,
                                    b"key expansion",
                                    serverRandom + clientRandom,
-                                   outputLength)
+                                   outputLength,
+                                   keyCache)
         else:
             raise AssertionError()
 
         return keyBlock
 
     def calcPendingStates(self, cipherSuite, masterSecret, clientRandom,
-                          serverRandom, implementations):
-        """Create pending states for encryption and decryption."""
+                          serverRandom, implementations, keyCache=None):
+        """
+        Create pending states for encryption and decryption.
+
+        @type keyCache: dict
+        @param keyCache: cache of HMACs keyed with the master secret, see
+        L{tlslite.mathtls.P_hashDigest}
+        """
         keyLength, ivLength, createCipherFunc = \
                 self._getCipherSettings(cipherSuite)
 
@@ -776,7 +944,7 @@ class RecordLayer(object):
 
         #Calculate Keying Material from Master Secret
         keyBlock = self._calcKeyBlock(cipherSuite, masterSecret, clientRandom,
-                                      serverRandom, outputLength)
+                                      serverRandom, outputLength, keyCache)
 
         #Slice up Keying Material
         clientPendingState = ConnectionState()
@@ -788,6 +956,8 @@ class RecordLayer(object):
         serverKeyBlock = parser.getFixBytes(keyLength)
         clientIVBlock = parser.getFixBytes(ivLength)
         serverIVBlock = parser.getFixBytes(ivLength)
+        # keys were copied out by the slicing above
+        zeroizeBytes(keyBlock)
 
         if digestmod:
             # Legacy cipher
@@ -48,6 +48,11 @@ class Session(object):
     encrypt-then-MAC mode
     """
 
+    __slots__ = ('masterSecret', 'sessionID', 'cipherSuite', 'srpUsername',
+                 'clientCertChain', 'serverCertChain', 'tackExt',
+                 'tackInHelloExt', 'serverName', 'resumable', 'encryptThenMAC',
+                 '_prfKeyCache', '__dict__', '__weakref__')
+
     def __init__(self):
         self.masterSecret = bytearray(0)
         self.sessionID = bytearray(0)
@@ -60,11 +65,21 @@ class Session(object):
         self.serverName = ""
         self.resumable = False
         self.encryptThenMAC = False
+        # HMACs keyed with the master secret, reused by resumed connections
+        self._prfKeyCache = {}
 
     def create(self, masterSecret, sessionID, cipherSuite,
                srpUsername, clientCertChain, serverCertChain,
                tackExt, tackInHelloExt, serverName, resumable=True,
-               encryptThenMAC=False):
+               encryptThenMAC=False, prfKeyCache=None):
+        """
+        Initialise the session
+
+        @type prfKeyCache: dict
+        @param prfKeyCache: HMACs already keyed with the master secret by the
+        connection that created the session, see
+        L{tlslite.mathtls.P_hashDigest}
+        """
         self.masterSecret = masterSecret
         self.sessionID = sessionID
         self.cipherSuite = cipherSuite
@@ -76,6 +91,9 @@ class Session(object):
         self.serverName = serverName
         self.resumable = resumable
         self.encryptThenMAC = encryptThenMAC
+        if prfKeyCache is None:
+            prfKeyCache = {}
+        self._prfKeyCache = prfKeyCache
 
     def _clone(self):
         other = Session()
@@ -90,6 +108,7 @@ class Session(object):
         other.serverName = self.serverName
         other.resumable = self.resumable
         other.encryptThenMAC = self.encryptThenMAC
+        other._prfKeyCache = self._prfKeyCache
         return other
 
     def valid(self):
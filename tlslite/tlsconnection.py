@@ -17,6 +17,7 @@ MAIN CLASS FOR TLS LITE (START HERE!).
 
 from __future__ import division
 import socket
+import time
 from .utils.compat import formatExceptionTrace
 from .tlsrecordlayer import TLSRecordLayer
 from .session import Session
@@ -54,6 +55,13 @@ class TLSConnection(TLSRecordLayer):
     L{tlslite.integration.tlsasyncdispatchermixin.TLSAsyncDispatcherMixIn}).
     """
 
+    __slots__ = ('serverSigAlg', 'ecdhCurve', 'dhGroupSize', 'next_proto')
+
+    # cipher suites and static extensions advertised in ClientHello, keyed
+    # by the settings they were derived from, shared by all connections
+    _clientHelloCache = {}
+    _clientHelloCacheSize = 32
+
     def __init__(self, sock):
         """Create a new TLSConnection instance.
 
@@ -381,6 +389,8 @@ class TLSConnection(TLSRecordLayer):
         if not settings:
             settings = HandshakeSettings()
         settings = settings.validate()
+        self._tcpNoDelay = settings.tcpNoDelay
+        self._tcpCork = settings.tcpCork
 
         if clientCertChain:
             if not isinstance(clientCertChain, X509CertChain):
@@ -429,6 +439,8 @@ class TLSConnection(TLSRecordLayer):
             else: break
         serverHello = result
         cipherSuite = serverHello.cipher_suite
+        self._selectHandshakeHashes(cipherSuite, settings,
+                                    privateKey is not None)
         
         # Choose a matching Next Protocol from server list against ours
         # (string or None)
@@ -438,6 +450,13 @@ class TLSConnection(TLSRecordLayer):
         if serverHello.getExtension(ExtensionType.encrypt_then_mac):
             self._recordLayer.encryptThenMAC = True
 
+        # Check if server accepted the record size limit
+        recordSizeLimit = serverHello.getExtension(
+            ExtensionType.record_size_limit)
+        if recordSizeLimit:
+            self._recordSizeLimit = settings.recordSizeLimit
+            self._peerRecordSizeLimit = recordSizeLimit.recordSizeLimit
+
         #If the server elected to resume the session, it is handled here.
         for result in self._clientResume(session, serverHello, 
                         clientHello.random, 
@@ -494,6 +513,7 @@ class TLSConnection(TLSRecordLayer):
             else: break
         (premasterSecret, serverCertChain, clientCertChain,
          tackExt) = result
+        self._addHandshakeSecret(premasterSecret)
 
         #After having previously sent a ClientKeyExchange, the client now
         #initiates an exchange of Finished messages.
@@ -512,60 +532,21 @@ class TLSConnection(TLSRecordLayer):
                             srpUsername, clientCertChain, serverCertChain,
                             tackExt, (serverHello.tackExt is not None),
                             serverName,
-                            encryptThenMAC=self._recordLayer.encryptThenMAC)
+                            encryptThenMAC=self._recordLayer.encryptThenMAC,
+                            prfKeyCache=self._prfKeyCache)
         self._handshakeDone(resumed=False)
 
 
     def _clientSendClientHello(self, settings, session, srpUsername,
                                 srpParams, certParams, anonParams, 
                                 serverName, nextProtos, reqTack):
-        #Initialize acceptable ciphersuites
-        cipherSuites = [CipherSuite.TLS_EMPTY_RENEGOTIATION_INFO_SCSV]
-        if srpParams:
-            cipherSuites += CipherSuite.getSrpAllSuites(settings)
-        elif certParams:
-            cipherSuites += CipherSuite.getEcdheCertSuites(settings)
-            cipherSuites += CipherSuite.getDheCertSuites(settings)
-            cipherSuites += CipherSuite.getCertSuites(settings)
-        elif anonParams:
-            cipherSuites += CipherSuite.getEcdhAnonSuites(settings)
-            cipherSuites += CipherSuite.getAnonSuites(settings)
-        else:
-            assert False
-
-        #Add any SCSVs. These are not real cipher suites, but signaling
-        #values which reuse the cipher suite field in the ClientHello.
-        wireCipherSuites = list(cipherSuites)
-        if settings.sendFallbackSCSV:
-            wireCipherSuites.append(CipherSuite.TLS_FALLBACK_SCSV)
+        cipherSuites, wireCipherSuites, extensions = \
+                self._clientHelloParameters(settings, srpParams, certParams,
+                                            anonParams)
 
         #Initialize acceptable certificate types
         certificateTypes = settings.getCertificateTypes()
 
-        extensions = []
-
-        #Initialize TLS extensions
-        if settings.useEncryptThenMAC:
-            extensions.append(TLSExtension().\
-                              create(ExtensionType.encrypt_then_mac,
-                                     bytearray(0)))
-        #Send the ECC extensions only if we advertise ECC ciphers
-        if next((cipher for cipher in cipherSuites \
-                if cipher in CipherSuite.ecdhAllSuites), None) is not None:
-            extensions.append(SupportedGroupsExtension().\
-                              create(self._curveNamesToList(settings)))
-            extensions.append(ECPointFormatsExtension().\
-                              create([ECPointFormat.uncompressed]))
-        # In TLS1.2 advertise support for additional signature types
-        if settings.maxVersion >= (3, 3):
-            sigList = self._sigHashesToList(settings)
-            assert len(sigList) > 0
-            extensions.append(SignatureAlgorithmsExtension().\
-                              create(sigList))
-        #don't send empty list of extensions
-        if not extensions:
-            extensions = None
-
         #Either send ClientHello (with a resumable session)...
         if session and session.sessionID:
             #If it's resumable, then its
@@ -604,6 +585,95 @@ class TLSConnection(TLSRecordLayer):
         yield clientHello
 
 
+    @classmethod
+    def _clientHelloParameters(cls, settings, srpParams, certParams,
+                               anonParams):
+        """
+        Return cipher suites and extensions to advertise in ClientHello.
+
+        They depend only on the settings, so they are calculated once for
+        given settings and reused in later handshakes.
+
+        @rtype: tuple
+        @return: acceptable cipher suites, cipher suites to send (including
+            signalling values) and list of extensions (or None)
+        """
+        if srpParams:
+            kind = "srp"
+        elif certParams:
+            kind = "cert"
+        elif anonParams:
+            kind = "anon"
+        else:
+            assert False
+        key = (kind, tuple(settings.cipherNames), tuple(settings.macNames),
+               tuple(settings.keyExchangeNames), settings.maxVersion,
+               settings.sendFallbackSCSV, settings.useEncryptThenMAC,
+               tuple(settings.eccCurves), tuple(settings.rsaSigHashes),
+               settings.recordSizeLimit)
+        cached = cls._clientHelloCache.get(key)
+        if cached is None:
+            cached = cls._calcClientHelloParameters(settings, kind)
+            if len(cls._clientHelloCache) >= cls._clientHelloCacheSize:
+                cls._clientHelloCache.clear()
+            cls._clientHelloCache[key] = cached
+
+        # the lists are modified by ClientHello, the extensions aren't
+        cipherSuites, wireCipherSuites, extensions = cached
+        if extensions is not None:
+            extensions = list(extensions)
+        return list(cipherSuites), list(wireCipherSuites), extensions
+
+    @classmethod
+    def _calcClientHelloParameters(cls, settings, kind):
+        """Calculate values returned by L{_clientHelloParameters}"""
+        #Initialize acceptable ciphersuites
+        cipherSuites = [CipherSuite.TLS_EMPTY_RENEGOTIATION_INFO_SCSV]
+        if kind == "srp":
+            cipherSuites += CipherSuite.getSrpAllSuites(settings)
+        elif kind == "cert":
+            cipherSuites += CipherSuite.getEcdheCertSuites(settings)
+            cipherSuites += CipherSuite.getDheCertSuites(settings)
+            cipherSuites += CipherSuite.getCertSuites(settings)
+        else:
+            cipherSuites += CipherSuite.getEcdhAnonSuites(settings)
+            cipherSuites += CipherSuite.getAnonSuites(settings)
+
+        #Add any SCSVs. These are not real cipher suites, but signaling
+        #values which reuse the cipher suite field in the ClientHello.
+        wireCipherSuites = list(cipherSuites)
+        if settings.sendFallbackSCSV:
+            wireCipherSuites.append(CipherSuite.TLS_FALLBACK_SCSV)
+
+        extensions = []
+
+        #Initialize TLS extensions
+        if settings.useEncryptThenMAC:
+            extensions.append(TLSExtension().\
+                              create(ExtensionType.encrypt_then_mac,
+                                     bytearray(0)))
+        #Send the ECC extensions only if we advertise ECC ciphers
+        if next((cipher for cipher in cipherSuites \
+                if cipher in CipherSuite.ecdhAllSuites), None) is not None:
+            extensions.append(SupportedGroupsExtension().\
+                              create(cls._curveNamesToList(settings)))
+            extensions.append(ECPointFormatsExtension().\
+                              create([ECPointFormat.uncompressed]))
+        # In TLS1.2 advertise support for additional signature types
+        if settings.maxVersion >= (3, 3):
+            sigList = cls._sigHashesToList(settings)
+            assert len(sigList) > 0
+            extensions.append(SignatureAlgorithmsExtension().\
+                              create(sigList))
+        if settings.recordSizeLimit is not None:
+            extensions.append(RecordSizeLimitExtension().\
+                              create(settings.recordSizeLimit))
+        #don't send empty list of extensions
+        if not extensions:
+            extensions = None
+
+        return cipherSuites, wireCipherSuites, extensions
+
     def _clientGetServerHello(self, settings, clientHello):
         for result in self._getMsg(ContentType.handshake,
                                   HandshakeType.server_hello):
@@ -661,6 +731,20 @@ class TLSConnection(TLSRecordLayer):
                 AlertDescription.illegal_parameter,
                 "Server responded with unrequested NPN Extension"):
                 yield result
+        recordSizeLimit = serverHello.getExtension(
+            ExtensionType.record_size_limit)
+        if recordSizeLimit:
+            if not clientHello.getExtension(ExtensionType.record_size_limit):
+                for result in self._sendError(\
+                    AlertDescription.illegal_parameter,
+                    "Server responded with unrequested record_size_limit "
+                    "extension"):
+                    yield result
+            if recordSizeLimit.recordSizeLimit < 64:
+                for result in self._sendError(\
+                    AlertDescription.illegal_parameter,
+                    "Server sent record_size_limit below 64"):
+                    yield result
         yield serverHello
 
     def _clientSelectNextProto(self, nextProtos, serverHello):
@@ -695,6 +779,7 @@ class TLSConnection(TLSRecordLayer):
                     yield result
 
             #Calculate pending connection states
+            self._prfKeyCache = session._prfKeyCache
             self._calcPendingStates(session.cipherSuite, 
                                     session.masterSecret, 
                                     clientRandom, serverHello.random, 
@@ -888,11 +973,13 @@ class TLSConnection(TLSRecordLayer):
     def _clientFinished(self, premasterSecret, clientRandom, serverRandom,
                         cipherSuite, cipherImplementations, nextProto):
 
+        start = time.time()
         masterSecret = calcMasterSecret(self.version,
                                         cipherSuite,
                                         premasterSecret,
                                         clientRandom,
                                         serverRandom)
+        self.handshakeKeyDerivationTime += time.time() - start
         self._calcPendingStates(cipherSuite, masterSecret, 
                                 clientRandom, serverRandom, 
                                 cipherImplementations)
@@ -1007,6 +1094,9 @@ class TLSConnection(TLSRecordLayer):
         @type settings: L{tlslite.handshakesettings.HandshakeSettings}
         @param settings: Various settings which can be used to control
         the ciphersuites and SSL/TLS version chosen by the server.
+        Servers handling many connections should pass a snapshot created
+        with C{HandshakeSettings.compile()} so that the settings are not
+        validated and processed again for every connection.
 
         @type checker: L{tlslite.checker.Checker}
         @param checker: A Checker instance.  This instance will be
@@ -1096,6 +1186,8 @@ class TLSConnection(TLSRecordLayer):
         if not settings:
             settings = HandshakeSettings()
         settings = settings.validate()
+        self._tcpNoDelay = settings.tcpNoDelay
+        self._tcpCork = settings.tcpCork
         
         # OK Start exchanging messages
         # ******************************
@@ -1143,10 +1235,15 @@ class TLSConnection(TLSRecordLayer):
         else:
             extensions = None
 
+        recordSizeLimit = self._serverRecordSizeLimit(settings, clientHello)
+        if recordSizeLimit:
+            extensions = (extensions or []) + [recordSizeLimit]
+
         serverHello = ServerHello()
         serverHello.create(self.version, getRandomBytes(32), sessionID, \
                            cipherSuite, CertificateType.x509, tackExt,
                            nextProtos, extensions=extensions)
+        self._selectHandshakeHashes(cipherSuite, settings, reqCert)
 
         # Perform the SRP key exchange
         clientCertChain = None
@@ -1201,7 +1298,8 @@ class TLSConnection(TLSRecordLayer):
         
         else:
             assert(False)
-                        
+        self._addHandshakeSecret(premasterSecret)
+
         # Exchange Finished messages      
         for result in self._serverFinished(premasterSecret, 
                                 clientHello.random, serverHello.random,
@@ -1227,7 +1325,8 @@ class TLSConnection(TLSRecordLayer):
                             srpUsername, clientCertChain, serverCertChain,
                             tackExt, (serverHello.tackExt is not None),
                             serverName,
-                            encryptThenMAC=self._recordLayer.encryptThenMAC)
+                            encryptThenMAC=self._recordLayer.encryptThenMAC,
+                            prfKeyCache=self._prfKeyCache)
             
         #Add the session object to the session cache
         if sessionCache and sessionID:
@@ -1273,6 +1372,15 @@ class TLSConnection(TLSRecordLayer):
                   AlertDescription.inappropriate_fallback):
                 yield result
 
+        #Values below 64 make the connection impractically slow
+        recordSizeLimit = clientHello.getExtension(
+            ExtensionType.record_size_limit)
+        if recordSizeLimit and recordSizeLimit.recordSizeLimit < 64:
+            for result in self._sendError(\
+                    AlertDescription.illegal_parameter,
+                    "Client sent record_size_limit below 64"):
+                yield result
+
         #Check if there's intersection between supported curves by client and
         #server
         client_groups = clientHello.getExtension(ExtensionType.supported_groups)
@@ -1289,22 +1397,19 @@ class TLSConnection(TLSRecordLayer):
         cipherSuites = []
         if verifierDB:
             if certChain:
-                cipherSuites += \
-                    CipherSuite.getSrpCertSuites(settings, self.version)
-            cipherSuites += CipherSuite.getSrpSuites(settings, self.version)
+                cipherSuites += settings.getCipherSuites("srp_sha_rsa",
+                                                         self.version)
+            cipherSuites += settings.getCipherSuites("srp_sha", self.version)
         elif certChain:
             if group_intersect:
-                cipherSuites += CipherSuite.getEcdheCertSuites(settings,
-                                                               self.version)
-            cipherSuites += CipherSuite.getDheCertSuites(settings, self.version)
-            cipherSuites += CipherSuite.getCertSuites(settings, self.version)
+                cipherSuites += settings.getCipherSuites("ecdhe_rsa",
+                                                         self.version)
+            cipherSuites += settings.getCipherSuites("dhe_rsa", self.version)
+            cipherSuites += settings.getCipherSuites("rsa", self.version)
         elif anon:
-            cipherSuites += CipherSuite.getAnonSuites(settings, self.version)
+            cipherSuites += settings.getCipherSuites("dh_anon", self.version)
         else:
             assert(False)
-        cipherSuites = CipherSuite.filterForVersion(cipherSuites,
-                                                    minVersion=self.version,
-                                                    maxVersion=self.version)
 
         #If resumption was requested and we have a session cache...
         if clientHello.session_id and sessionCache:
@@ -1356,15 +1461,22 @@ class TLSConnection(TLSRecordLayer):
                     extensions = [mte]
                 else:
                     extensions = None
+                recordSizeLimit = self._serverRecordSizeLimit(settings,
+                                                              clientHello)
+                if recordSizeLimit:
+                    extensions = (extensions or []) + [recordSizeLimit]
                 serverHello = ServerHello()
                 serverHello.create(self.version, getRandomBytes(32),
                                    session.sessionID, session.cipherSuite,
                                    CertificateType.x509, None, None,
                                    extensions=extensions)
+                self._selectHandshakeHashes(session.cipherSuite, settings,
+                                            False)
                 for result in self._sendMsg(serverHello):
                     yield result
 
                 #Calculate pending connection states
+                self._prfKeyCache = session._prfKeyCache
                 self._calcPendingStates(session.cipherSuite, 
                                         session.masterSecret,
                                         clientHello.random, 
@@ -1392,10 +1504,9 @@ class TLSConnection(TLSRecordLayer):
         #
         #Given the current ciphersuite ordering, this means we prefer SRP
         #over non-SRP.
-        for cipherSuite in cipherSuites:
-            if cipherSuite in clientHello.cipher_suites:
-                break
-        else:
+        cipherSuite = CipherSuite.selectPreferred(
+            CipherSuite.rankSuites(cipherSuites), clientHello.cipher_suites)
+        if cipherSuite is None:
             for result in self._sendError(\
                     AlertDescription.handshake_failure,
                     "No mutual ciphersuite"):
@@ -1420,6 +1531,24 @@ class TLSConnection(TLSRecordLayer):
         # the client's session_id was not found in cache:
         yield (clientHello, cipherSuite)
 
+    def _serverRecordSizeLimit(self, settings, clientHello):
+        """
+        Negotiate the size of protected records with client
+
+        @rtype: L{RecordSizeLimitExtension}
+        @return: extension to send in ServerHello or None if client didn't
+        advertise support for it
+        """
+        clientExt = clientHello.getExtension(ExtensionType.record_size_limit)
+        if not clientExt:
+            return None
+        limit = settings.recordSizeLimit
+        if limit is None:
+            limit = 2**14
+        self._recordSizeLimit = limit
+        self._peerRecordSizeLimit = clientExt.recordSizeLimit
+        return RecordSizeLimitExtension().create(limit)
+
     def _serverSRPKeyExchange(self, clientHello, serverHello, verifierDB,
                               cipherSuite, privateKey, serverCertChain,
                               settings):
@@ -1551,6 +1680,10 @@ class TLSConnection(TLSRecordLayer):
         except TLSLocalAlert as alert:
             for result in self._sendError(alert.description, alert.message):
                 yield result
+        except TLSIllegalParameterException as e:
+            for result in self._sendError(AlertDescription.illegal_parameter,
+                                          str(e)):
+                yield result
 
         #Get and check CertificateVerify, if relevant
         if clientCertChain:
@@ -1604,7 +1737,7 @@ class TLSConnection(TLSRecordLayer):
         # TODO make configurable
         dh_g, dh_p = goodGroupParameters[2]
         dh_Xs = bytesToNumber(getRandomBytes(32))
-        dh_Ys = powMod(dh_g, dh_Xs, dh_p)
+        dh_Ys = powModGenerator(dh_g, dh_Xs, dh_p)
 
         #Create ServerKeyExchange
         serverKeyExchange = ServerKeyExchange(cipherSuite, self.version)
@@ -1645,11 +1778,13 @@ class TLSConnection(TLSRecordLayer):
 
     def _serverFinished(self,  premasterSecret, clientRandom, serverRandom,
                         cipherSuite, cipherImplementations, nextProtos):
+        start = time.time()
         masterSecret = calcMasterSecret(self.version,
                                         cipherSuite,
                                         premasterSecret,
                                         clientRandom,
                                         serverRandom)
+        self.handshakeKeyDerivationTime += time.time() - start
         
         #Calculate pending connection states
         self._calcPendingStates(cipherSuite, masterSecret, 
@@ -1687,11 +1822,14 @@ class TLSConnection(TLSRecordLayer):
                 yield result
 
         #Calculate verification data
+        start = time.time()
         verifyData = calcFinished(self.version,
                                   masterSecret,
                                   cipherSuite,
                                   self._handshake_hash,
-                                  self._client)
+                                  self._client,
+                                  self._prfKeyCache)
+        self.handshakeKeyDerivationTime += time.time() - start
         if self.fault == Fault.badFinished:
             verifyData[0] = (verifyData[0]+1)%256
 
@@ -1735,11 +1873,14 @@ class TLSConnection(TLSRecordLayer):
             self.next_proto = nextProto
 
         #Calculate verification data
+        start = time.time()
         verifyData = calcFinished(self.version,
                                   masterSecret,
                                   cipherSuite,
                                   self._handshake_hash,
-                                  not self._client)
+                                  not self._client,
+                                  self._prfKeyCache)
+        self.handshakeKeyDerivationTime += time.time() - start
 
         #Get and check Finished message under new state
         for result in self._getMsg(ContentType.handshake,
@@ -1754,8 +1895,19 @@ class TLSConnection(TLSRecordLayer):
 
     def _handshakeWrapperAsync(self, handshaker, checker):
         try:
-            for result in handshaker:
-                yield result
+            # every flight of the handshake is sent in a single write, just
+            # before waiting for the reply of the peer
+            self._recordLayer.bufferWrites = True
+            try:
+                for result in handshaker:
+                    yield result
+                # send the last flight of the handshake
+                for result in self._flushFlight():
+                    yield result
+            finally:
+                # records sent later, also after a failed handshake, are
+                # written to socket directly
+                self._recordLayer.bufferWrites = False
             if checker:
                 try:
                     checker(self)
@@ -1767,6 +1919,11 @@ class TLSConnection(TLSRecordLayer):
                     raise
         except GeneratorExit:
             raise
+        except TLSDecodeError as e:
+            # extensions of ClientHello are decoded only when looked up
+            for result in self._sendError(AlertDescription.decode_error,
+                                          formatExceptionTrace(e)):
+                yield result
         except TLSAlert as alert:
             if not self.fault:
                 raise
@@ -1799,16 +1956,29 @@ class TLSConnection(TLSRecordLayer):
         # if none match, default to sha1
         return "sha1"
 
+    def _selectHandshakeHashes(self, cipherSuite, settings, certVerify):
+        """
+        Limit the handshake transcript hashing to the needed digests
+
+        @param certVerify: whether a Certificate Verify message can be
+        created or checked later in the handshake
+        """
+        if self.version < (3, 3):
+            names = ['md5', 'sha1']
+        elif cipherSuite in CipherSuite.sha384PrfSuites:
+            names = ['sha384']
+        else:
+            names = ['sha256']
+        if certVerify and self.version == (3, 3):
+            names += settings.rsaSigHashes
+        self._handshake_hash.selectDigests(names)
+
     @staticmethod
     def _sigHashesToList(settings):
         """Convert list of valid signature hashes to array of tuples"""
-        sigAlgs = []
-        for hashName in settings.rsaSigHashes:
-            sigAlgs.append((getattr(HashAlgorithm, hashName),
-                            SignatureAlgorithm.rsa))
-        return sigAlgs
+        return settings.getRsaSigAlgs()
 
     @staticmethod
     def _curveNamesToList(settings):
         """Convert list of acceptable curves to array identifiers"""
-        return [getattr(GroupName, val) for val in settings.eccCurves]
+        return settings.getEccCurveIDs()
@@ -23,6 +23,7 @@ from .defragmenter import Defragmenter
 from .handshakehashes import HandshakeHashes
 
 import socket
+import time
 import traceback
 
 class TLSRecordLayer(object):
@@ -99,11 +100,75 @@ class TLSRecordLayer(object):
     connection to reduce latency and set to protocol max (2**14) to maximise
     throughput after sending few kiB of data. Setting to values greater than
     2**14 will cause the connection to be dropped by RFC compliant peers.
+    If the peer advertised a lower limit with the record_size_limit
+    extension, protected records are not bigger than that limit.
+
+    @type dynamicRecordSizing: bool
+    @ivar dynamicRecordSizing: Whether to automatically size application data
+    records (writable), defaults to False.
+
+    When enabled, application data is sent in records of at most
+    L{smallRecordSize} bytes, so that each fits in a single TCP segment and
+    the peer can decrypt the first bytes of a response as soon as they
+    arrive. After L{dynamicRecordThreshold} bytes were sent, records of
+    up to L{recordSize} bytes are used to minimise the overhead. Small
+    records are used again after the connection didn't send any
+    application data for L{dynamicRecordIdleTime} seconds.
+
+    @type smallRecordSize: int
+    @ivar smallRecordSize: size of application data records used at the
+    beginning of the connection and after idle periods when
+    L{dynamicRecordSizing} is enabled (writable). Defaults to 1369 bytes,
+    so that the record fits in a single 1460 byte TCP segment with the
+    record layer header, TCP timestamps and encryption overhead of the
+    CBC ciphers.
+
+    @type dynamicRecordThreshold: int
+    @ivar dynamicRecordThreshold: number of application data bytes sent in
+    small records before switching to L{recordSize} big ones (writable).
+
+    @type dynamicRecordIdleTime: float
+    @ivar dynamicRecordIdleTime: time in seconds without sending application
+    data after which small records are used again (writable).
+
+    @type handshakeTime: float
+    @ivar handshakeTime: Duration of the last successful handshake, in
+    seconds.
+
+    @type handshakeKeyDerivationTime: float
+    @ivar handshakeKeyDerivationTime: Time spent in the last handshake on
+    derivation of the master secret, connection keys and Finished values.
+
+    @type handshakeIOTime: float
+    @ivar handshakeIOTime: Time spent in the last handshake in send and
+    receive calls of the socket.
+
+    @type handshakeReclaimedSize: int
+    @ivar handshakeReclaimedSize: Number of bytes of handshake-only state
+    (transcript hashes, premaster secret and the like) released after the
+    last handshake. The secrets are overwritten before being released.
 
     @sort: __init__, read, readAsync, write, writeAsync, close, closeAsync,
     getCipherImplementation, getCipherName
     """
 
+    # tens of thousands of idle connections may be kept open, so don't
+    # allocate the instance dictionary unless application sets its own
+    # attributes on the connection
+    __slots__ = ('sock', '_recordLayer', 'session', '_defragmenter',
+                 '_readBuffer', '_send_writer', '_handshake_hash', 'closed',
+                 '_refCount', 'resumed', '_prfKeyCache', '_flightBuffer',
+                 '_tcpNoDelay', '_tcpCork', 'handshakeTime',
+                 'handshakeKeyDerivationTime', 'handshakeIOTime',
+                 'handshakeReclaimedSize', '_handshakeSecrets',
+                 '_handshakeStartTime', '_handshakeStartIOTime',
+                 'allegedSrpUsername', 'closeSocket', 'ignoreAbruptClose',
+                 'fault', 'recordSize', 'dynamicRecordSizing',
+                 'smallRecordSize', 'dynamicRecordThreshold',
+                 'dynamicRecordIdleTime', '_dynamicBytesSent',
+                 '_lastWriteTime', '_recordSizeLimit', '_peerRecordSizeLimit',
+                 '_sendRecordLimit', '__dict__', '__weakref__')
+
     def __init__(self, sock):
         self.sock = sock
         self._recordLayer = RecordLayer(sock)
@@ -129,6 +194,27 @@ class TLSRecordLayer(object):
         #Is this a resumed session?
         self.resumed = False #read-only
 
+        #HMACs keyed with the master secret, shared with the session
+        self._prfKeyCache = {}
+
+        #Handshake messages of the current flight not yet put in records
+        self._flightBuffer = bytearray(0)
+
+        #Socket tuning, see HandshakeSettings.tcpNoDelay and tcpCork
+        self._tcpNoDelay = False
+        self._tcpCork = False
+
+        #How long the handshake took and where the time went (read-only)
+        self.handshakeTime = 0.0
+        self.handshakeKeyDerivationTime = 0.0
+        self.handshakeIOTime = 0.0
+        self._handshakeStartTime = 0.0
+        self._handshakeStartIOTime = 0.0
+
+        #Secrets to overwrite and memory released after handshake (read-only)
+        self._handshakeSecrets = []
+        self.handshakeReclaimedSize = 0
+
         #What username did the client claim in his handshake?
         self.allegedSrpUsername = None
 
@@ -145,6 +231,20 @@ class TLSRecordLayer(object):
         #Limit the size of outgoing records to following size
         self.recordSize = 16384 # 2**14
 
+        #Start with small records, switch to big ones after some data
+        self.dynamicRecordSizing = False
+        self.smallRecordSize = 1369
+        self.dynamicRecordThreshold = 2**18
+        self.dynamicRecordIdleTime = 1.0
+        self._dynamicBytesSent = 0
+        self._lastWriteTime = 0.0
+
+        #Sizes of protected records negotiated with record_size_limit
+        #extension, applied when the respective connection state changes
+        self._recordSizeLimit = None
+        self._peerRecordSizeLimit = None
+        self._sendRecordLimit = 2**14
+
     @property
     def _client(self):
         """Boolean stating if the endpoint acts as a client"""
@@ -516,6 +616,9 @@ class TLSRecordLayer(object):
      #*********************************************************
 
     def _shutdown(self, resumable):
+        #Don't leave secrets of an aborted handshake in memory
+        self._handshakeCleanup()
+        self._recordLayer.timeIO = False
         self._recordLayer.shutdown()
         self.version = (0,0)
         self.closed = True
@@ -531,6 +634,8 @@ class TLSRecordLayer(object):
         alert = Alert().create(alertDescription, AlertLevel.fatal)
         for result in self._sendMsg(alert):
             yield result
+        for result in self._flushFlight():
+            yield result
         self._shutdown(False)
         raise TLSLocalAlert(alert, errorStr)
 
@@ -541,15 +646,37 @@ class TLSRecordLayer(object):
                 yield result
             randomizeFirstBlock = True
 
-    def _sendMsg(self, msg, randomizeFirstBlock = True):
+    def _sendMsg(self, msg, randomizeFirstBlock = True, cork=True):
         """Fragment and send message through socket"""
         #Whenever we're connected and asked to send an app data message,
         #we first send the first byte of the message.  This prevents
         #an attacker from launching a chosen-plaintext attack based on
         #knowing the next IV (a la BEAST).
-        if randomizeFirstBlock and self.version <= (3, 1) \
+        splitFirstByte = randomizeFirstBlock and self.version <= (3, 1) \
                 and self._recordLayer.isCBCMode() \
-                and msg.contentType == ContentType.application_data:
+                and msg.contentType == ContentType.application_data
+
+        if self.dynamicRecordSizing and \
+                msg.contentType == ContentType.application_data:
+            now = time.time()
+            if now - self._lastWriteTime > self.dynamicRecordIdleTime:
+                self._dynamicBytesSent = 0
+            self._lastWriteTime = now
+
+        #Let the records of a multi-record write share TCP segments
+        if cork and self._tcpCork and not self._recordLayer.bufferWrites and \
+                (splitFirstByte or
+                 len(msg.write()) > self._fragmentSize(msg.contentType)):
+            if self._setTcpOption("TCP_CORK", 1):
+                try:
+                    for result in self._sendMsg(msg, randomizeFirstBlock,
+                                                cork=False):
+                        yield result
+                finally:
+                    self._setTcpOption("TCP_CORK", 0)
+                return
+
+        if splitFirstByte:
             msgFirstByte = msg.splitFirstByte()
             for result in self._sendMsgThroughSocket(msgFirstByte):
                 yield result
@@ -558,28 +685,85 @@ class TLSRecordLayer(object):
 
         buf = msg.write()
         contentType = msg.contentType
-        #Update handshake hashes
+        #Update handshake hashes, they are released once the handshake is done
         if contentType == ContentType.handshake:
-            self._handshake_hash.update(buf)
+            if self._handshake_hash is not None:
+                self._handshake_hash.update(buf)
+            #While a flight is being buffered, handshake messages share
+            #records, they are fragmented when the flight is flushed
+            if self._recordLayer.bufferWrites:
+                self._flightBuffer += buf
+                return
 
-        #Fragment big messages
-        while len(buf) > self.recordSize:
-            newB = buf[:self.recordSize]
-            buf = buf[self.recordSize:]
+        #Records must stay in order, so put queued handshake messages in
+        #records before anything else
+        for result in self._queueFlightRecords():
+            yield result
+
+        #Fragment big messages, slice from an advancing offset so that the
+        #remainder of the message isn't copied for every record
+        start = 0
+        size = self._fragmentSize(contentType)
+        while len(buf) - start > size:
+            newB = buf[start:start + size]
+            start += size
 
             msgFragment = Message(contentType, newB)
             for result in self._sendMsgThroughSocket(msgFragment):
                 yield result
+            size = self._fragmentSize(contentType)
 
+        if start:
+            buf = buf[start:]
         msgFragment = Message(contentType, buf)
         for result in self._sendMsgThroughSocket(msgFragment):
             yield result
 
+    def _fragmentSize(self, contentType):
+        """Return the size of the next record of given type"""
+        if not self.dynamicRecordSizing or \
+                contentType != ContentType.application_data or \
+                self._dynamicBytesSent >= self.dynamicRecordThreshold:
+            return min(self.recordSize, self._sendRecordLimit)
+        return min(self.smallRecordSize, self.recordSize,
+                   self._sendRecordLimit)
+
+    def _queueFlightRecords(self):
+        """Put the buffered handshake messages in as few records as possible"""
+        buf = self._flightBuffer
+        if not buf:
+            return
+        self._flightBuffer = bytearray(0)
+
+        size = self._fragmentSize(ContentType.handshake)
+        for start in range(0, len(buf), size):
+            msgFragment = Message(ContentType.handshake,
+                                  buf[start:start + size])
+            for result in self._sendMsgThroughSocket(msgFragment):
+                yield result
+
+    def _flushFlight(self):
+        """Send all buffered records of the flight in a single write"""
+        for result in self._queueFlightRecords():
+            yield result
+
+        for result in self._sendThroughSocket(self._recordLayer.flush(),
+                                              ContentType.handshake):
+            yield result
+
     def _sendMsgThroughSocket(self, msg):
         """Send message, handle errors"""
+        if self.dynamicRecordSizing and \
+                msg.contentType == ContentType.application_data:
+            self._dynamicBytesSent += len(msg.write())
+        for result in self._sendThroughSocket(
+                self._recordLayer.sendRecord(msg), msg.contentType):
+            yield result
 
+    def _sendThroughSocket(self, sender, contentType):
+        """Run the socket writing generator, handle errors"""
         try:
-            for result in self._recordLayer.sendRecord(msg):
+            for result in sender:
                 if result in (0, 1):
                     yield result
         except socket.error:
@@ -593,7 +777,7 @@ class TLSRecordLayer(object):
             # However, if we get here DURING handshaking, we take
             # it upon ourselves to see if the next message is an
             # Alert.
-            if msg.contentType == ContentType.handshake:
+            if contentType == ContentType.handshake:
 
                 # See if there's an alert record
                 # Could raise socket.error or TLSAbruptCloseError
@@ -742,11 +926,12 @@ class TLSRecordLayer(object):
                             yield result
 
                 #Update handshake hashes
-                self._handshake_hash.update(p.bytes)
+                if self._handshake_hash is not None:
+                    self._handshake_hash.update(p.bytes)
 
                 #Parse based on handshake type
                 if subType == HandshakeType.client_hello:
-                    yield ClientHello(recordHeader.ssl2).parse(p)
+                    yield ClientHello(recordHeader.ssl2).parse(p, lazy=True)
                 elif subType == HandshakeType.server_hello:
                     yield ServerHello().parse(p)
                 elif subType == HandshakeType.certificate:
@@ -821,6 +1006,11 @@ class TLSRecordLayer(object):
     def _getNextRecordFromSocket(self):
         """Read a record, handle errors"""
 
+        # the peer won't answer before it receives the whole flight
+        if self._recordLayer.bufferWrites:
+            for result in self._flushFlight():
+                yield result
+
         try:
             # otherwise... read the next record
             for result in self._recordLayer.recvRecord():
@@ -873,19 +1063,93 @@ class TLSRecordLayer(object):
         self._defragmenter.clearBuffers()
         self.allegedSrpUsername = None
         self._refCount = 1
+        self._prfKeyCache = {}
+        self.handshakeKeyDerivationTime = 0.0
+        self._handshakeStartTime = time.time()
+        # socket calls are timed only during the handshake
+        self._recordLayer.timeIO = True
+        self._handshakeStartIOTime = self._recordLayer.ioTime
+        self._flightBuffer = bytearray(0)
+        self._handshakeSecrets = []
+        self.handshakeReclaimedSize = 0
+        self._recordSizeLimit = None
+        self._peerRecordSizeLimit = None
+        self._sendRecordLimit = 2**14
+
+    def _setTcpOption(self, name, value):
+        """
+        Set a TCP level option on the socket
+
+        @type name: str
+        @param name: name of the option in the socket module, e.g. TCP_NODELAY
+        @rtype: bool
+        @return: True if the option was set, False if it's not supported by
+        the platform or the socket
+        """
+        option = getattr(socket, name, None)
+        if option is None:
+            return False
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, option, value)
+        except (socket.error, AttributeError):
+            # not a TCP socket
+            return False
+        return True
 
     def _handshakeDone(self, resumed):
         self.resumed = resumed
         self.closed = False
+        self._handshakeCleanup()
+        if self._tcpNoDelay:
+            self._setTcpOption("TCP_NODELAY", 1)
+        self.handshakeTime = time.time() - self._handshakeStartTime
+        self.handshakeIOTime = self._recordLayer.ioTime - \
+                self._handshakeStartIOTime
+        self._recordLayer.timeIO = False
+
+    def _addHandshakeSecret(self, secret):
+        """
+        Register a secret to be overwritten once the handshake is over
+
+        @type secret: bytearray
+        """
+        self._handshakeSecrets.append(secret)
+
+    def _handshakeCleanup(self):
+        """
+        Release the state needed only during the handshake
+
+        Drops the transcript hashes (they are needed only for Finished and
+        CertificateVerify) and overwrites secrets registered with
+        L{_addHandshakeSecret}. Size of released objects is added to
+        L{handshakeReclaimedSize}.
+        """
+        size = 0
+        if self._handshake_hash is not None:
+            size += sys.getsizeof(self._handshake_hash)
+            self._handshake_hash = None
+        for secret in self._handshakeSecrets:
+            size += sys.getsizeof(secret)
+            zeroizeBytes(secret)
+        self._handshakeSecrets = []
+        self.handshakeReclaimedSize += size
 
     def _calcPendingStates(self, cipherSuite, masterSecret,
                            clientRandom, serverRandom, implementations):
+        start = time.time()
         self._recordLayer.calcPendingStates(cipherSuite, masterSecret,
                                             clientRandom, serverRandom,
-                                            implementations)
+                                            implementations,
+                                            self._prfKeyCache)
+        self.handshakeKeyDerivationTime += time.time() - start
 
     def _changeWriteState(self):
         self._recordLayer.changeWriteState()
+        #record_size_limit applies only to protected records
+        if self._peerRecordSizeLimit is not None:
+            self._sendRecordLimit = min(self._peerRecordSizeLimit, 2**14)
 
     def _changeReadState(self):
         self._recordLayer.changeReadState()
+        if self._recordSizeLimit is not None:
+            self._recordLayer.recvRecordLimit = self._recordSizeLimit
@@ -3,30 +3,71 @@
 
 """Classes for reading/writing binary data (such as TLS records)."""
 
+import sys
+import struct
 from .compat import *
 
+# struct formats of big-endian unsigned integers of given byte size
+_structFormats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+# struct.pack() in Python 2.6 only warns about values that don't fit in the
+# field and truncates them, so the range needs to be checked separately
+_packChecksRange = sys.version_info >= (2, 7)
+
 class Writer(object):
+    __slots__ = ('bytes',)
+
     def __init__(self):
         self.bytes = bytearray(0)
 
     def add(self, x, length):
-        self.bytes += bytearray(length)
-        newIndex = len(self.bytes) - 1
-        for count in range(length):
-            self.bytes[newIndex] = x & 0xFF
-            x >>= 8
-            newIndex -= 1
-        if x != 0:
-            raise ValueError("Can't represent value in specified length")
+        fmt = _structFormats.get(length)
+        if fmt is not None:
+            if not _packChecksRange and not 0 <= x < 1 << (8 * length):
+                raise ValueError("Can't represent value in specified length")
+            try:
+                self.bytes += struct.pack('>' + fmt, x)
+            except struct.error:
+                raise ValueError("Can't represent value in specified length")
+        elif length == 3:
+            if not 0 <= x <= 0xffffff:
+                raise ValueError("Can't represent value in specified length")
+            self.bytes += struct.pack('>BH', x >> 16, x & 0xffff)
+        else:
+            self.bytes += bytearray(length)
+            newIndex = len(self.bytes) - 1
+            for count in range(length):
+                self.bytes[newIndex] = x & 0xFF
+                x >>= 8
+                newIndex -= 1
+            if x != 0:
+                raise ValueError("Can't represent value in specified length")
 
     def addFixSeq(self, seq, length):
-        for e in seq:
-            self.add(e, length)
+        fmt = _structFormats.get(length)
+        if length == 1 and isinstance(seq, (list, tuple, bytearray)):
+            # raises ValueError for values outside of byte range, other
+            # types are not copied directly as bytearray(int) would create
+            # a zero filled array
+            self.bytes += bytearray(seq)
+        elif fmt is not None:
+            # seq may be an iterator, struct needs the number of elements
+            seq = list(seq)
+            if not _packChecksRange and seq and \
+                    (min(seq) < 0 or max(seq) >= 1 << (8 * length)):
+                raise ValueError("Can't represent value in specified length")
+            try:
+                self.bytes += struct.pack('>{0}{1}'.format(len(seq), fmt),
+                                          *seq)
+            except struct.error:
+                raise ValueError("Can't represent value in specified length")
+        else:
+            for e in seq:
+                self.add(e, length)
 
     def addVarSeq(self, seq, length, lengthLength):
         self.add(len(seq)*length, lengthLength)
-        for e in seq:
-            self.add(e, length)
+        self.addFixSeq(seq, length)
 
     def addVarTupleSeq(self, seq, length, lengthLength):
         """
@@ -58,6 +99,8 @@ class Writer(object):
                     self.add(elem, length)
 
 class Parser(object):
+    __slots__ = ('bytes', 'index', 'indexCheck', 'lengthCheck')
+
     def __init__(self, bytes):
         self.bytes = bytes
         self.index = 0
@@ -65,11 +108,20 @@ class Parser(object):
     def get(self, length):
         if self.index + length > len(self.bytes):
             raise SyntaxError()
-        x = 0
-        for count in range(length):
-            x <<= 8
-            x |= self.bytes[self.index]
-            self.index += 1
+        fmt = _structFormats.get(length)
+        if fmt is not None:
+            x, = struct.unpack_from('>' + fmt, self.bytes, self.index)
+            self.index += length
+        elif length == 3:
+            high, low = struct.unpack_from('>BH', self.bytes, self.index)
+            x = high << 16 | low
+            self.index += 3
+        else:
+            x = 0
+            for count in range(length):
+                x <<= 8
+                x |= self.bytes[self.index]
+                self.index += 1
         return x
 
     def getFixBytes(self, lengthBytes):
@@ -84,6 +136,14 @@ class Parser(object):
         return self.getFixBytes(lengthBytes)
 
     def getFixList(self, length, lengthList):
+        fmt = _structFormats.get(length)
+        if fmt is not None:
+            if self.index + length * lengthList > len(self.bytes):
+                raise SyntaxError()
+            l = list(struct.unpack_from('>{0}{1}'.format(lengthList, fmt),
+                                        self.bytes, self.index))
+            self.index += length * lengthList
+            return l
         l = [0] * lengthList
         for x in range(lengthList):
             l[x] = self.get(length)
@@ -93,11 +153,7 @@ class Parser(object):
         lengthList = self.get(lengthLength)
         if lengthList % length != 0:
             raise SyntaxError()
-        lengthList = lengthList // length
-        l = [0] * lengthList
-        for x in range(lengthList):
-            l[x] = self.get(length)
-        return l
+        return self.getFixList(length, lengthList // length)
 
     def getVarTupleList(self, elemLength, elemNum, lengthLength):
         """Read a variable length list of same sized tuples
@@ -87,6 +87,13 @@ else:
     def compatLong(num):
         return long(num)
         
+if sys.version_info >= (2,7):
+    def compatMemoryView(x): return memoryview(x)
+else:
+    # Python 2.6 doesn't have memoryview, use a read-only copy of the data,
+    # it can be sliced, hashed and appended to a bytearray the same way
+    def compatMemoryView(x): return str(x)
+
 import traceback
 def formatExceptionTrace(e):
     newStr = "".join(traceback.format_exception(sys.exc_type, sys.exc_value, sys.exc_traceback))
@@ -141,8 +141,8 @@ def ct_check_cbc_mac_and_pad(data, mac, seqnumBytes, contentType, version):
     else:
         start_pos = max(0, data_len - 256)
         for i in range(start_pos, data_len):
-            # if pad_start < i: mask = 0xff; else: mask = 0x00
-            mask = ct_lsb_prop_u8(ct_le_u32(pad_start, i))
+            # if pad_start <= i: mask = -1; else: mask = 0
+            mask = ~((i - pad_start) >> 31)
             # if data[i] != pad_length and "inside_pad": result = False
             result |= (data[i] ^ pad_length) & mask
 
@@ -172,16 +172,18 @@ def ct_check_cbc_mac_and_pad(data, mac, seqnumBytes, contentType, version):
     # don't check past the array end (already checked to be >= zero)
     end_pos = data_len - 1 - mac.digest_size
 
-    # calculate all possible
-    for i in range(start_pos, end_pos): # constant for given overall length
-        cur_mac = data_mac.copy()
-        cur_mac.update(compatHMAC(data[start_pos:i]))
-        mac_compare = bytearray(cur_mac.digest())
+    # calculate all possible, the running HMAC is extended by one byte in
+    # every iteration so that every byte of data is hashed just once;
+    # end_pos is the place of the MAC for zero length padding so it needs
+    # to be included
+    for i in range(start_pos, end_pos + 1): # constant for given length
+        mac_ok = ct_compare_digest(data_mac.digest(),
+                                   data[i:i+mac.digest_size])
         # compare the hash for real only if it's the place where mac is
-        # supposed to be
-        mask = ct_lsb_prop_u8(ct_eq_u32(i, mac_start))
-        for j in range(0, mac.digest_size): # digest_size is public
-            result |= (data[i+j] ^ mac_compare[j]) & mask
+        # supposed to be, if i == mac_start: mask = -1; else: mask = 0
+        mask = ((i ^ mac_start) - 1) >> 31
+        result |= (mac_ok ^ 1) & mask
+        data_mac.update(compatHMAC(data[i:i+1]))
 
     # return python boolean
     return result == 0
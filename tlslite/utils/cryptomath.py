@@ -183,6 +183,22 @@ def numBytes(n):
     bits = numBits(n)
     return (bits + 7) // 8
 
+def zeroizeBytes(data):
+    """
+    Overwrite a secret held in a bytearray with zeros, in place.
+
+    Immutable objects (bytes, str, integers) can't be overwritten, they are
+    left as they are.
+
+    @type data: bytearray
+    @rtype: int
+    @return: number of overwritten bytes
+    """
+    if not isinstance(data, bytearray):
+        return 0
+    data[:] = bytearray(len(data))
+    return len(data)
+
 # **************************************************************************
 # Big Number Math
 # **************************************************************************
@@ -241,6 +257,66 @@ else:
         else:
             return pow(base, power, modulus)
 
+# Size in bits of the windows used by powModFixedBase
+_FIXED_BASE_WINDOW = 4
+
+# Precomputed powers, indexed by (base, modulus)
+_fixedBaseTables = {}
+
+def _makeFixedBaseTable(base, modulus, windows, table=None):
+    """
+    Return table of powers of base for the fixed base exponentiation
+
+    Row i of the table holds base**(j * 2**(i*w)) % modulus for j in
+    range(2**w), where w is the window size.
+
+    @param table: already calculated rows, they will be extended to the
+    size of windows
+    """
+    if table:
+        table = list(table)
+        rowBase = table[-1][-1] * table[-1][1] % modulus
+    else:
+        table = []
+        rowBase = base % modulus
+    while len(table) < windows:
+        row = [1, rowBase]
+        for _ in range(2, 2 ** _FIXED_BASE_WINDOW):
+            row.append(row[-1] * rowBase % modulus)
+        table.append(row)
+        rowBase = row[-1] * rowBase % modulus
+    return table
+
+def powModFixedBase(base, power, modulus):
+    """
+    Calculate base**power % modulus for a base that is used repeatedly
+
+    Powers of the base are precomputed and kept for the lifetime of the
+    process, so after the first call the exponentiation needs only one
+    modular multiplication per window of the exponent and no squarings.
+    Use it only for a small set of static bases, like group generators.
+    """
+    if power < 0:
+        return powMod(base, power, modulus)
+
+    key = (base, modulus)
+    table = _fixedBaseTables.get(key)
+    windows = (numBits(power) + _FIXED_BASE_WINDOW - 1) // _FIXED_BASE_WINDOW
+    if table is None or len(table) < windows:
+        table = _makeFixedBaseTable(base, modulus, windows, table)
+        _fixedBaseTables[key] = table
+
+    mask = 2 ** _FIXED_BASE_WINDOW - 1
+    result = 1
+    for row in table:
+        if not power:
+            break
+        digit = power & mask
+        if digit:
+            result = result * row[digit] % modulus
+        power >>= _FIXED_BASE_WINDOW
+    return result % modulus
+
 #Pre-calculate a sieve of the ~100 primes < 1000:
 def makeSieve(n):
     sieve = list(range(n))
@@ -281,50 +357,76 @@ def isPrime(n, iterations=5, display=False, sieve=makeSieve(1000)):
         a = getRandomNumber(2, n)
     return True
 
+# Odd primes used for sieving windows of prime candidates, bigger tables
+# reject more candidates but the sieving then costs more than the
+# Rabin-Miller tests it saves
+_windowSievePrimes = makeSieve(2**12)[1:]
+
+def _sieveWindow(start, size, safe=False):
+    """
+    Return offsets of candidates that survived sieving
+
+    Candidates are the odd numbers start + 2*i for i in range(size),
+    start must be odd. Candidates divisible by any of the small primes
+    are rejected, with safe set, also the ones for which 2*candidate + 1
+    is divisible by one of them.
+    """
+    window = bytearray(b'\x01') * size
+    zeros = bytearray(size)
+    for prime in _windowSievePrimes:
+        if prime >= start:
+            break
+        rem = start % prime
+        # inverse of 2 modulo prime
+        half = (prime + 1) // 2
+        # start + 2*i == 0 (mod prime)
+        first = (prime - rem) * half % prime
+        if first < size:
+            window[first::prime] = zeros[:(size - 1 - first) // prime + 1]
+        if safe:
+            # 2*(start + 2*i) + 1 == 0 (mod prime)
+            first = (prime - (2 * rem + 1) % prime) * half * half % prime
+            if first < size:
+                window[first::prime] = \
+                        zeros[:(size - 1 - first) // prime + 1]
+    return [i for i in range(size) if window[i]]
+
+def _getRandomWindowPrime(low, high, safe, display):
+    """Find a random prime in [low, high) by sieving windows of candidates"""
+    # a window should contain a few primes, they are about 0.35 * bits
+    # odd candidates apart, safe primes are much more sparse
+    size = numBits(high) * (16 if safe else 4)
+    size = max(1, min(size, (high - low) // 4))
+    while 1:
+        start = getRandomNumber(low, high - 2 * size) | 1
+        for i in _sieveWindow(start, size, safe):
+            candidate = start + 2 * i
+            if display: print(".", end=' ')
+            if not safe:
+                if isPrime(candidate, display=display, sieve=()):
+                    return candidate
+            #Ideas from Tom Wu's SRP code
+            #Check q with a single round before the expensive tests on p
+            elif isPrime(candidate, 1, display=display, sieve=()):
+                p = (2 * candidate) + 1
+                if isPrime(p, display=display, sieve=()):
+                    if isPrime(candidate, display=display, sieve=()):
+                        return p
+
 def getRandomPrime(bits, display=False):
     if bits < 10:
         raise AssertionError()
     #The 1.5 ensures the 2 MSBs are set
     #Thus, when used for p,q in RSA, n will have its MSB set
-    #
-    #Since 30 is lcm(2,3,5), we'll set our test numbers to
-    #29 % 30 and keep them there
     low = ((2 ** (bits-1)) * 3) // 2
-    high = 2 ** bits - 30
-    p = getRandomNumber(low, high)
-    p += 29 - (p % 30)
-    while 1:
-        if display: print(".", end=' ')
-        p += 30
-        if p >= high:
-            p = getRandomNumber(low, high)
-            p += 29 - (p % 30)
-        if isPrime(p, display=display):
-            return p
-
-#Unused at the moment...
+    high = 2 ** bits
+    return _getRandomWindowPrime(low, high, False, display)
+
 def getRandomSafePrime(bits, display=False):
     if bits < 10:
         raise AssertionError()
     #The 1.5 ensures the 2 MSBs are set
     #Thus, when used for p,q in RSA, n will have its MSB set
-    #
-    #Since 30 is lcm(2,3,5), we'll set our test numbers to
-    #29 % 30 and keep them there
     low = (2 ** (bits-2)) * 3//2
-    high = (2 ** (bits-1)) - 30
-    q = getRandomNumber(low, high)
-    q += 29 - (q % 30)
-    while 1:
-        if display: print(".", end=' ')
-        q += 30
-        if (q >= high):
-            q = getRandomNumber(low, high)
-            q += 29 - (q % 30)
-        #Ideas from Tom Wu's SRP code
-        #Do trial division on p and q before Rabin-Miller
-        if isPrime(q, 0, display=display):
-            p = (2 * q) + 1
-            if isPrime(p, display=display):
-                if isPrime(q, display=display):
-                    return p
+    high = 2 ** (bits-1)
+    return _getRandomWindowPrime(low, high, True, display)
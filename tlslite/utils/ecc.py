@@ -4,7 +4,8 @@
 """Methods for dealing with ECC points"""
 
 from .codec import Parser, Writer
-from .cryptomath import bytesToNumber, numberToByteArray, numBytes
+from .cryptomath import bytesToNumber, numberToByteArray, numBytes, numBits, \
+        invMod
 from .compat import ecdsaAllCurves
 import ecdsa
 
@@ -58,3 +59,180 @@ def getPointByteSize(point):
         else:
             return curveMap[point.curve]
     raise ValueError("Parameter must be a curve or point on curve")
+
+# Points in Jacobian coordinates are kept as (X, Y, Z) tuples of integers,
+# they represent the affine point (X/Z^2, Y/Z^3); Z == 0 is the point at
+# infinity
+_JACOBIAN_INFINITY = (0, 1, 0)
+
+def _jacobianDouble(point, prime, coeffA):
+    """Double a point in Jacobian coordinates"""
+    xCoord, yCoord, zCoord = point
+    if not yCoord or not zCoord:
+        return _JACOBIAN_INFINITY
+    xx = xCoord * xCoord % prime
+    yy = yCoord * yCoord % prime
+    zz = zCoord * zCoord % prime
+    s = 4 * xCoord * yy % prime
+    m = (3 * xx + coeffA * zz * zz) % prime
+    xNew = (m * m - 2 * s) % prime
+    yNew = (m * (s - xNew) - 8 * yy * yy) % prime
+    zNew = 2 * yCoord * zCoord % prime
+    return xNew, yNew, zNew
+
+def _jacobianAdd(point1, point2, prime, coeffA):
+    """
+    Add two points in Jacobian coordinates
+
+    Uses the cheaper mixed addition when the second point is affine (Z == 1).
+    """
+    x1, y1, z1 = point1
+    x2, y2, z2 = point2
+    if not z1:
+        return point2
+    if not z2:
+        return point1
+    z1z1 = z1 * z1 % prime
+    if z2 == 1:
+        u1 = x1
+        s1 = y1
+    else:
+        z2z2 = z2 * z2 % prime
+        u1 = x1 * z2z2 % prime
+        s1 = y1 * z2 * z2z2 % prime
+    u2 = x2 * z1z1 % prime
+    s2 = y2 * z1 * z1z1 % prime
+    h = (u2 - u1) % prime
+    r = (s2 - s1) % prime
+    if not h:
+        if not r:
+            return _jacobianDouble(point1, prime, coeffA)
+        return _JACOBIAN_INFINITY
+    hh = h * h % prime
+    hhh = h * hh % prime
+    v = u1 * hh % prime
+    xNew = (r * r - hhh - 2 * v) % prime
+    yNew = (r * (v - xNew) - s1 * hhh) % prime
+    zNew = z1 * z2 * h % prime
+    return xNew, yNew, zNew
+
+def _jacobianToAffine(point, prime):
+    """Return the (x, y) affine coordinates of a non-infinity point"""
+    xCoord, yCoord, zCoord = point
+    zInv = invMod(zCoord, prime)
+    zInv2 = zInv * zInv % prime
+    return xCoord * zInv2 % prime, yCoord * zInv2 * zInv % prime
+
+def _jacobianToPoint(point, curve, order=None):
+    """Convert point in Jacobian coordinates to ecdsa Point object"""
+    if not point[2]:
+        return ecdsa.ellipticcurve.INFINITY
+    xCoord, yCoord = _jacobianToAffine(point, curve.p())
+    return ecdsa.ellipticcurve.Point(curve, xCoord, yCoord, order)
+
+# size of the window (in bits) used for scalar multiplication
+_WINDOW_BITS = 4
+
+# lazily computed tables of generator multiples, keyed by curve parameters
+_generatorTables = {}
+
+def _makeGeneratorTable(generator):
+    """
+    Precompute the table of multiples of a curve generator
+
+    The table has one row for every window of the scalar, row i contains
+    the affine points j * 2^(i * _WINDOW_BITS) * G for j in 1..2^w-1, so
+    a multiplication needs only mixed additions and no doublings.
+    """
+    curve = generator.curve()
+    prime = curve.p()
+    coeffA = curve.a()
+    windows = (numBits(generator.order()) + _WINDOW_BITS - 1) // _WINDOW_BITS
+    base = (generator.x(), generator.y(), 1)
+    table = []
+    for _ in range(windows):
+        row = [base]
+        for _ in range(2 ** _WINDOW_BITS - 2):
+            row.append(_jacobianAdd(row[-1], base, prime, coeffA))
+        table.append([_jacobianToAffine(point, prime) + (1,)
+                      for point in row])
+        # next base is the last multiple in the row plus the base itself
+        base = _jacobianAdd(row[-1], base, prime, coeffA)
+        base = _jacobianToAffine(base, prime) + (1,)
+    return table
+
+def _getGeneratorTable(generator):
+    """Return cached table of generator multiples, compute it if missing"""
+    curve = generator.curve()
+    key = (curve.p(), curve.a(), curve.b(), generator.x(), generator.y())
+    table = _generatorTables.get(key)
+    if table is None:
+        table = _makeGeneratorTable(generator)
+        _generatorTables[key] = table
+    return table
+
+def multiplyGenerator(curve, scalar):
+    """
+    Multiply the generator of the curve by scalar
+
+    Uses a precomputed fixed-base table, built on first use for a given curve
+    and cached for the lifetime of the process.
+
+    @type curve: ecdsa.curves.Curve
+    @param curve: curve as returned by L{getCurveByName}
+    @type scalar: int
+    @param scalar: the multiplier
+    @rtype: ecdsa.ellipticcurve.Point
+    """
+    generator = curve.generator
+    order = generator.order()
+    ecCurve = generator.curve()
+    prime = ecCurve.p()
+    coeffA = ecCurve.a()
+    table = _getGeneratorTable(generator)
+    scalar %= order
+
+    mask = 2 ** _WINDOW_BITS - 1
+    result = _JACOBIAN_INFINITY
+    for row in table:
+        digit = scalar & mask
+        if digit:
+            result = _jacobianAdd(result, row[digit - 1], prime, coeffA)
+        scalar >>= _WINDOW_BITS
+    return _jacobianToPoint(result, ecCurve, order)
+
+def multiplyPoint(point, scalar):
+    """
+    Multiply an arbitrary point on curve by scalar
+
+    Uses Jacobian coordinates with a fixed window, so only a single modular
+    inversion is necessary.
+
+    @type point: ecdsa.ellipticcurve.Point
+    @type scalar: int
+    @rtype: ecdsa.ellipticcurve.Point
+    """
+    ecCurve = point.curve()
+    prime = ecCurve.p()
+    coeffA = ecCurve.a()
+    order = point.order()
+    if order:
+        scalar %= order
+    if not scalar or point == ecdsa.ellipticcurve.INFINITY:
+        return ecdsa.ellipticcurve.INFINITY
+
+    base = (point.x(), point.y(), 1)
+    multiples = [base]
+    for _ in range(2 ** _WINDOW_BITS - 2):
+        multiples.append(_jacobianAdd(multiples[-1], base, prime, coeffA))
+
+    windows = (numBits(scalar) + _WINDOW_BITS - 1) // _WINDOW_BITS
+    mask = 2 ** _WINDOW_BITS - 1
+    result = _JACOBIAN_INFINITY
+    for i in range(windows - 1, -1, -1):
+        for _ in range(_WINDOW_BITS):
+            result = _jacobianDouble(result, prime, coeffA)
+        digit = (scalar >> (i * _WINDOW_BITS)) & mask
+        if digit:
+            result = _jacobianAdd(result, multiples[digit - 1], prime, coeffA)
+    return _jacobianToPoint(result, ecCurve, order)
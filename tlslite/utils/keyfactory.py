@@ -21,12 +21,18 @@ if cryptomath.pycryptoLoaded:
 # Factory Functions for RSA Keys
 # **************************************************************************
 
-def generateRSAKey(bits, implementations=["openssl", "python"]):
+def generateRSAKey(bits, implementations=["openssl", "python"],
+                   parallel=False):
     """Generate an RSA key with the specified bit length.
 
     @type bits: int
     @param bits: Desired bit length of the new key's modulus.
 
+    @type parallel: bool
+    @param parallel: Search for the two primes in separate processes when
+    the key is generated by the "python" implementation. Ignored by other
+    implementations.
+
     @rtype: L{tlslite.utils.rsakey.RSAKey}
     @return: A new RSA private key.
     """
@@ -34,7 +40,7 @@ def generateRSAKey(bits, implementations=["openssl", "python"]):
         if implementation == "openssl" and cryptomath.m2cryptoLoaded:
             return OpenSSL_RSAKey.generate(bits)
         elif implementation == "python":
-            return Python_RSAKey.generate(bits)
+            return Python_RSAKey.generate(bits, parallel)
     raise ValueError("No acceptable implementations")
 
 #Parse as an OpenSSL or Python key
@@ -3,7 +3,10 @@
 
 """Pure-Python RSA implementation."""
 
+import threading
+import multiprocessing
 from .cryptomath import *
+from . import cryptomath
 from .asn1parser import ASN1Parser
 from .rsakey import *
 from .pem import *
@@ -22,29 +25,50 @@ class Python_RSAKey(RSAKey):
         self.qInv = qInv
         self.blinder = 0
         self.unblinder = 0
+        self._blindingLock = threading.Lock()
 
     def hasPrivateKey(self):
         return self.d != 0
 
+    def _getBlindingValues(self):
+        """
+        Return blinding values for a single private key operation
+
+        The key is usually shared by all connections of a server, so the
+        values are handed out and advanced while holding a lock, that way
+        handshakes running in parallel threads neither reuse them nor get
+        a blinder and unblinder from different generations. Only the cheap
+        update happens under the lock, the exponentiation does not.
+        """
+        self._blindingLock.acquire()
+        try:
+            #Create blinding values, on the first pass:
+            if not self.blinder:
+                self.unblinder = getRandomNumber(2, self.n)
+                self.blinder = powMod(invMod(self.unblinder, self.n), self.e,
+                                      self.n)
+
+            blinder = self.blinder
+            unblinder = self.unblinder
+
+            #Update blinding values
+            self.blinder = (self.blinder * self.blinder) % self.n
+            self.unblinder = (self.unblinder * self.unblinder) % self.n
+        finally:
+            self._blindingLock.release()
+        return blinder, unblinder
+
     def _rawPrivateKeyOp(self, m):
-        #Create blinding values, on the first pass:
-        if not self.blinder:
-            self.unblinder = getRandomNumber(2, self.n)
-            self.blinder = powMod(invMod(self.unblinder, self.n), self.e,
-                                  self.n)
+        blinder, unblinder = self._getBlindingValues()
 
         #Blind the input
-        m = (m * self.blinder) % self.n
+        m = (m * blinder) % self.n
 
         #Perform the RSA operation
         c = self._rawPrivateKeyOpHelper(m)
 
         #Unblind the output
-        c = (c * self.unblinder) % self.n
-
-        #Update blinding values
-        self.blinder = (self.blinder * self.blinder) % self.n
-        self.unblinder = (self.unblinder * self.unblinder) % self.n
+        c = (c * unblinder) % self.n
 
         #Return the output
         return c
@@ -67,10 +91,29 @@ class Python_RSAKey(RSAKey):
 
     def acceptsPassword(self): return False
 
-    def generate(bits):
+    def generate(bits, parallel=False):
+        """Generate a new private key with a modulus of given size
+
+        @type bits: int
+        @param bits: size of the modulus in bits
+        @type parallel: bool
+        @param parallel: search for p and q at the same time in two worker
+        processes
+        """
         key = Python_RSAKey()
-        p = getRandomPrime(bits//2, False)
-        q = getRandomPrime(bits//2, False)
+        if parallel:
+            pool = multiprocessing.Pool(2)
+            try:
+                # the function is sent to workers by name, so use the one
+                # currently in the module
+                p, q = pool.map(cryptomath.getRandomPrime,
+                                [bits//2, bits//2])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            p = getRandomPrime(bits//2, False)
+            q = getRandomPrime(bits//2, False)
         t = lcm(p-1, q-1)
         key.n = p * q
         key.e = 65537
@@ -0,0 +1,100 @@
+# See the LICENSE file for legal information regarding use of this file.
+"""Implementation of the X25519 Diffie-Hellman function from RFC 7748"""
+
+# 2^255 - 19
+X25519_P = 2**255 - 19
+
+# (486662 - 2) / 4, see RFC 7748 Section 5
+X25519_A24 = 121665
+
+# size of scalars and encoded u-coordinates, in bytes
+X25519_ORDER_SIZE = 32
+
+# u-coordinate of the base point
+X25519_G = bytearray([9] + [0] * 31)
+
+def _leBytesToNum(data):
+    """Convert a number from little endian byte format"""
+    ret = 0
+    for i in range(len(data) - 1, -1, -1):
+        ret <<= 8
+        ret += data[i]
+    return ret
+
+def _numToLeBytes(num, length):
+    """Convert a number to little endian byte format of given length"""
+    ret = bytearray(length)
+    for i in range(length):
+        ret[i] = num & 0xff
+        num >>= 8
+    return ret
+
+def decodeUCoordinate(data):
+    """Decode a u-coordinate, masking the most significant bit"""
+    if len(data) != X25519_ORDER_SIZE:
+        raise ValueError("Invalid length of u-coordinate")
+    data = bytearray(data)
+    data[-1] &= 0x7f
+    return _leBytesToNum(data)
+
+def decodeScalar25519(data):
+    """Decode and clamp a scalar"""
+    if len(data) != X25519_ORDER_SIZE:
+        raise ValueError("Invalid length of scalar")
+    data = bytearray(data)
+    data[0] &= 248
+    data[31] &= 127
+    data[31] |= 64
+    return _leBytesToNum(data)
+
+def _cswap(swap, val1, val2):
+    """Swap val1 with val2 if swap is 1, without branching on swap"""
+    mask = -swap
+    dummy = mask & (val1 ^ val2)
+    return val1 ^ dummy, val2 ^ dummy
+
+def x25519(scalar, uCoordinate):
+    """
+    Calculate the X25519 function using the Montgomery ladder
+
+    @type scalar: bytearray
+    @param scalar: 32 byte private key
+    @type uCoordinate: bytearray
+    @param uCoordinate: 32 byte encoding of the peer public key, or
+    L{X25519_G} to calculate our own public key
+    @rtype: bytearray
+    @return: 32 byte encoding of the resulting u-coordinate
+    """
+    k = decodeScalar25519(scalar)
+    u = decodeUCoordinate(uCoordinate)
+    prime = X25519_P
+
+    x_1 = u
+    x_2, z_2 = 1, 0
+    x_3, z_3 = u, 1
+    swap = 0
+    for t in range(254, -1, -1):
+        k_t = (k >> t) & 1
+        swap ^= k_t
+        x_2, x_3 = _cswap(swap, x_2, x_3)
+        z_2, z_3 = _cswap(swap, z_2, z_3)
+        swap = k_t
+
+        a = x_2 + z_2
+        aa = a * a % prime
+        b = x_2 - z_2
+        bb = b * b % prime
+        e = aa - bb
+        c = x_3 + z_3
+        d = x_3 - z_3
+        da = d * a % prime
+        cb = c * b % prime
+        x_3 = (da + cb) * (da + cb) % prime
+        z_3 = x_1 * (da - cb) * (da - cb) % prime
+        x_2 = aa * bb % prime
+        z_2 = e * (aa + X25519_A24 * e) % prime
+
+    x_2, x_3 = _cswap(swap, x_2, x_3)
+    z_2, z_3 = _cswap(swap, z_2, z_3)
+    ret = x_2 * pow(z_2, prime - 2, prime) % prime
+    return _numToLeBytes(ret, X25519_ORDER_SIZE)
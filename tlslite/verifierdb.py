@@ -66,7 +66,7 @@ class VerifierDB(BaseDB):
     def _checkItem(self, value, username, param):
         (N, g, salt, verifier) = value
         x = mathtls.makeX(salt, username, param)
-        v = powMod(g, x, N)
+        v = mathtls.powModGenerator(g, x, N)
         return (verifier == v)
 
 
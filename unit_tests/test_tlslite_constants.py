@@ -11,7 +11,7 @@ except ImportError:
 
 from tlslite.constants import CipherSuite, HashAlgorithm, SignatureAlgorithm, \
         ContentType, AlertDescription, AlertLevel, HandshakeType, GroupName, \
-        TLSEnum
+        TLSEnum, CipherSuiteDescriptor
 
 class TestTLSEnumSubClassing(unittest.TestCase):
 
@@ -126,3 +126,70 @@ class TestCipherSuite(unittest.TestCase):
                          [CipherSuite.TLS_RSA_WITH_3DES_EDE_CBC_SHA,
                           CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA,
                           CipherSuite.TLS_RSA_WITH_RC4_128_MD5])
+
+    def test_getDescriptor_with_AES_GCM(self):
+        desc = CipherSuite.getDescriptor(
+            CipherSuite.TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384)
+
+        self.assertIsInstance(desc, CipherSuiteDescriptor)
+        self.assertEqual(desc.cipherName, "aes256gcm")
+        self.assertEqual(desc.keyLength, 32)
+        self.assertEqual(desc.ivLength, 4)
+        self.assertEqual(desc.macName, "aead")
+        self.assertEqual(desc.macLength, 0)
+        self.assertEqual(desc.prfHash, "sha384")
+        self.assertEqual(desc.keyExchange, "ecdhe_rsa")
+        self.assertTrue(desc.aead)
+
+    def test_getDescriptor_with_CBC_cipher(self):
+        desc = CipherSuite.getDescriptor(
+            CipherSuite.TLS_SRP_SHA_RSA_WITH_3DES_EDE_CBC_SHA)
+
+        self.assertEqual(desc.cipherName, "3des")
+        self.assertEqual(desc.keyLength, 24)
+        self.assertEqual(desc.ivLength, 8)
+        self.assertEqual(desc.macName, "sha")
+        self.assertEqual(desc.macLength, 20)
+        self.assertEqual(desc.prfHash, "sha256")
+        self.assertEqual(desc.keyExchange, "srp_sha_rsa")
+        self.assertFalse(desc.aead)
+
+    def test_getDescriptor_with_SCSV(self):
+        self.assertIsNone(CipherSuite.getDescriptor(
+            CipherSuite.TLS_EMPTY_RENEGOTIATION_INFO_SCSV))
+
+    def test_descriptors_are_immutable(self):
+        desc = CipherSuite.getDescriptor(
+            CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA)
+
+        with self.assertRaises(AttributeError):
+            desc.keyLength = 32
+
+    def test_descriptors_match_canonical_names(self):
+        for suite, desc in CipherSuite.descriptors.items():
+            self.assertEqual(desc.cipherSuite, suite)
+            if desc.cipherName != "speck192gcm":
+                self.assertEqual(desc.cipherName,
+                                 CipherSuite.canonicalCipherName(suite))
+            if not desc.aead:
+                self.assertEqual(desc.macName,
+                                 CipherSuite.canonicalMacName(suite))
+
+    def test_selectPreferred(self):
+        ranks = CipherSuite.rankSuites(
+            [CipherSuite.TLS_RSA_WITH_AES_256_CBC_SHA,
+             CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA,
+             CipherSuite.TLS_RSA_WITH_3DES_EDE_CBC_SHA])
+
+        self.assertEqual(CipherSuite.selectPreferred(
+            ranks, [CipherSuite.TLS_RSA_WITH_3DES_EDE_CBC_SHA,
+                    CipherSuite.TLS_RSA_WITH_RC4_128_MD5,
+                    CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA]),
+                         CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA)
+
+    def test_selectPreferred_with_no_common_suites(self):
+        ranks = CipherSuite.rankSuites(
+            [CipherSuite.TLS_RSA_WITH_AES_256_CBC_SHA])
+
+        self.assertIsNone(CipherSuite.selectPreferred(
+            ranks, [CipherSuite.TLS_RSA_WITH_RC4_128_MD5]))
@@ -254,3 +254,146 @@ class TestDefragmenter(unittest.TestCase):
         d.clearBuffers()
 
         self.assertIsNone(d.getMessage())
+
+    def test_clearBuffers_with_partial_dynamic_message(self):
+        d = Defragmenter()
+
+        d.addDynamicSize(10, 0, 2)
+
+        d.addData(10, bytearray(b'\x00\x05\x01'))
+
+        self.assertIsNone(d.getMessage())
+
+        d.clearBuffers()
+        d.addData(10, bytearray(b'\x00\x01\x02'))
+
+        msgType, data = d.getMessage()
+        self.assertEqual(10, msgType)
+        self.assertEqual(bytearray(b'\x00\x01\x02'), data)
+
+    def test_addDynamicSize_with_message_spread_over_many_fragments(self):
+        d = Defragmenter()
+
+        d.addDynamicSize(22, 1, 3)
+
+        message = bytearray(b'\x0b\x00\x10\x00') + bytearray(range(256)) * 16
+        for i in range(0, len(message) - 1, 7):
+            d.addData(22, message[i:min(i+7, len(message) - 1)])
+            self.assertIsNone(d.getMessage())
+        d.addData(22, message[-1:] + bytearray(b'\x0e\x00\x00\x00'))
+
+        msgType, data = d.getMessage()
+        self.assertEqual(22, msgType)
+        self.assertEqual(message, data)
+        self.assertIsInstance(data, bytearray)
+
+        msgType, data = d.getMessage()
+        self.assertEqual(22, msgType)
+        self.assertEqual(bytearray(b'\x0e\x00\x00\x00'), data)
+        self.assertIsNone(d.getMessage())
+
+    def test_addDynamicSize_with_many_messages_in_one_fragment(self):
+        d = Defragmenter()
+
+        d.addDynamicSize(22, 1, 3)
+
+        d.addData(22, bytearray(b'\x01\x00\x00\x01\xaa'
+                                b'\x02\x00\x00\x00'
+                                b'\x03\x00\x00\x02\xbb'))
+        d.addData(22, bytearray(b'\xcc'))
+
+        self.assertEqual((22, bytearray(b'\x01\x00\x00\x01\xaa')),
+                         d.getMessage())
+        self.assertEqual((22, bytearray(b'\x02\x00\x00\x00')),
+                         d.getMessage())
+        self.assertEqual((22, bytearray(b'\x03\x00\x00\x02\xbb\xcc')),
+                         d.getMessage())
+        self.assertIsNone(d.getMessage())
+
+    def test_addDynamicSize_with_large_size_field(self):
+        d = Defragmenter()
+
+        d.addDynamicSize(10, 0, 5)
+
+        d.addData(10, bytearray(b'\x00\x00\x00'))
+        d.addData(10, bytearray(b'\x00\x02\xff'))
+
+        self.assertIsNone(d.getMessage())
+
+        d.addData(10, bytearray(b'\xfe'))
+
+        self.assertEqual((10, bytearray(b'\x00\x00\x00\x00\x02\xff\xfe')),
+                         d.getMessage())
+
+    def test_getMessage_releases_empty_buffers(self):
+        d = Defragmenter()
+
+        d.addStaticSize(21, 2)
+        d.addDynamicSize(22, 1, 3)
+
+        self.assertIsNone(d._queues[22].chunks)
+
+        d.addData(22, bytearray(b'\x0e\x00'))
+        d.addData(22, bytearray(b'\x00\x00\x0e'))
+
+        self.assertIsNotNone(d._queues[22].chunks)
+        self.assertEqual((22, bytearray(b'\x0e\x00\x00\x00')),
+                         d.getMessage())
+        self.assertIsNotNone(d._queues[22].chunks)
+
+        d.addData(22, bytearray(b'\x00\x00\x00'))
+
+        self.assertEqual((22, bytearray(b'\x0e\x00\x00\x00')),
+                         d.getMessage())
+        self.assertIsNone(d._queues[22].chunks)
+        self.assertIsNone(d._queues[21].chunks)
+
+    def test_buffers(self):
+        d = Defragmenter()
+
+        d.addStaticSize(21, 2)
+        d.addDynamicSize(22, 1, 3)
+
+        d.addData(22, bytearray(b'\x0e\x00'))
+        d.addData(22, bytearray(b'\x00\x05'))
+
+        self.assertEqual({21: bytearray(0),
+                          22: bytearray(b'\x0e\x00\x00\x05')}, d.buffers)
+        self.assertIsInstance(d.buffers[22], bytearray)
+
+    def test_decoders_with_bytearray(self):
+        d = Defragmenter()
+
+        d.addStaticSize(21, 2)
+        d.addDynamicSize(22, 1, 3)
+
+        self.assertIsNone(d.decoders[21](bytearray(b'\x01')))
+        self.assertEqual(2, d.decoders[21](bytearray(b'\x01\x02\x03')))
+        self.assertIsNone(d.decoders[22](bytearray(b'\x0e\x00\x00')))
+        self.assertIsNone(d.decoders[22](bytearray(b'\x0e\x00\x00\x02\x00')))
+        self.assertEqual(6, d.decoders[22](
+            bytearray(b'\x0e\x00\x00\x02\x00\x00\x01')))
+
+    def test_getMessage_with_user_decoder(self):
+        d = Defragmenter()
+
+        d.addStaticSize(21, 2)
+        received = []
+        def decoder(data):
+            received.append(data)
+            if len(data) < 3:
+                return None
+            return 3
+        d.decoders[21] = decoder
+
+        d.addData(21, bytearray(b'\x01\x02'))
+
+        self.assertIsNone(d.getMessage())
+
+        d.addData(21, bytearray(b'\x03\x04'))
+
+        self.assertEqual((21, bytearray(b'\x01\x02\x03')), d.getMessage())
+        self.assertEqual([bytearray(b'\x01\x02'),
+                          bytearray(b'\x01\x02\x03\x04')], received)
+        self.assertIsInstance(received[0], bytearray)
+        self.assertEqual({21: bytearray(b'\x04')}, d.buffers)
@@ -11,7 +11,8 @@ except ImportError:
 from tlslite.extensions import TLSExtension, SNIExtension, NPNExtension,\
         SRPExtension, ClientCertTypeExtension, ServerCertTypeExtension,\
         TACKExtension, SupportedGroupsExtension, ECPointFormatsExtension,\
-        SignatureAlgorithmsExtension, PaddingExtension, VarListExtension
+        SignatureAlgorithmsExtension, PaddingExtension, VarListExtension,\
+        RecordSizeLimitExtension
 from tlslite.utils.codec import Parser
 from tlslite.constants import NameType, ExtensionType, GroupName,\
         ECPointFormat, HashAlgorithm, SignatureAlgorithm
@@ -1424,5 +1425,62 @@ class TestPaddingExtension(unittest.TestCase):
 
         self.assertEqual(bytearray(b'\x00\x00\x00\x00'), ext.paddingData)
 
+class TestRecordSizeLimitExtension(unittest.TestCase):
+    def test__init__(self):
+        ext = RecordSizeLimitExtension()
+
+        self.assertIsNotNone(ext)
+        self.assertEqual(ext.extType, 28)
+        self.assertIsNone(ext.recordSizeLimit)
+        self.assertEqual(ext.extData, bytearray(0))
+
+    def test_create(self):
+        ext = RecordSizeLimitExtension().create(512)
+
+        self.assertEqual(ext.recordSizeLimit, 512)
+
+    def test_write(self):
+        ext = RecordSizeLimitExtension().create(2**14)
+
+        self.assertEqual(bytearray(
+            b'\x00\x1c' +           # type of extension
+            b'\x00\x02' +           # overall length of extension
+            b'\x40\x00'             # record size limit
+            ), ext.write())
+
+    def test_parse(self):
+        parser = Parser(bytearray(b'\x02\x00'))
+
+        ext = RecordSizeLimitExtension().parse(parser)
+
+        self.assertEqual(ext.recordSizeLimit, 512)
+
+    def test_parse_with_empty_data(self):
+        parser = Parser(bytearray(0))
+
+        ext = RecordSizeLimitExtension()
+
+        with self.assertRaises(SyntaxError):
+            ext.parse(parser)
+
+    def test_parse_with_extra_data_at_end(self):
+        parser = Parser(bytearray(b'\x02\x00\x00'))
+
+        ext = RecordSizeLimitExtension()
+
+        with self.assertRaises(SyntaxError):
+            ext.parse(parser)
+
+    def test_parse_from_TLSExtension(self):
+        parser = Parser(bytearray(
+            b'\x00\x1c' +           # type of extension
+            b'\x00\x02' +           # overall length of extension
+            b'\x00\x40'))           # record size limit
+
+        ext = TLSExtension().parse(parser)
+
+        self.assertIsInstance(ext, RecordSizeLimitExtension)
+        self.assertEqual(ext.recordSizeLimit, 64)
+
 if __name__ == '__main__':
     unittest.main()
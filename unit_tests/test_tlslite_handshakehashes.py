@@ -8,6 +8,7 @@ try:
     import unittest2 as unittest
 except ImportError:
     import unittest
+import sys
 
 from tlslite.handshakehashes import HandshakeHashes
 
@@ -114,3 +115,66 @@ class TestHandshakeHashes(unittest.TestCase):
         hh.update(b'ext')
 
         self.assertEqual(hh.digest('sha256'), hh.digest('sha256'))
+
+    def test_selectDigests(self):
+        hh = HandshakeHashes()
+        hh.update(b'te')
+
+        hh.selectDigests(['sha256'])
+        hh.update(b'xt')
+
+        hh2 = HandshakeHashes()
+        hh2.update(b'text')
+
+        self.assertEqual(hh.digest('sha256'), hh2.digest('sha256'))
+
+    def test_digest_with_not_selected_hash(self):
+        hh = HandshakeHashes()
+        hh.selectDigests(['sha384'])
+
+        with self.assertRaises(ValueError):
+            hh.digest('sha256')
+
+    def test_digest_TLS1_0_after_selectDigests(self):
+        hh = HandshakeHashes()
+        hh.update(b'text')
+        hh2 = hh.copy()
+
+        hh.selectDigests(['md5', 'sha1'])
+
+        self.assertEqual(hh.digest(), hh2.digest())
+        self.assertEqual(hh.digestSSL(bytearray(48), b''),
+                         hh2.digestSSL(bytearray(48), b''))
+
+    def test_copy_after_selectDigests(self):
+        hh = HandshakeHashes()
+        hh.update(b'text')
+        hh.selectDigests(['sha1'])
+
+        hh2 = hh.copy()
+        hh2.update(b'ext')
+
+        self.assertNotEqual(hh.digest('sha1'), hh2.digest('sha1'))
+        with self.assertRaises(ValueError):
+            hh2.digest('sha256')
+
+    def test___sizeof__(self):
+        hh = HandshakeHashes()
+        empty = sys.getsizeof(hh)
+        hh.update(b'text' * 100)
+
+        self.assertGreater(sys.getsizeof(hh), empty + 400)
+
+        hh.selectDigests(['sha1'])
+
+        self.assertLess(sys.getsizeof(hh), empty + 400)
+
+    def test_update_with_reused_buffer(self):
+        hh = HandshakeHashes()
+        data = bytearray(b'text')
+        hh.update(data)
+        data[0] = ord('n')
+
+        self.assertEqual(hh.digest('sha1'),
+                         b'7.\xa0\x8c\xab3\xe7\x1c\x02\xc6'
+                         b'Q\xdb\xc8:GM2\xc6v\xea')
@@ -8,7 +8,10 @@ try:
 except ImportError:
     import unittest
 
-from tlslite.handshakesettings import HandshakeSettings
+from tlslite.handshakesettings import HandshakeSettings, \
+        CompiledHandshakeSettings
+from tlslite.constants import CipherSuite, GroupName, HashAlgorithm, \
+        SignatureAlgorithm
 
 class TestHandshakeSettings(unittest.TestCase):
     def test___init__(self):
@@ -163,6 +166,64 @@ class TestHandshakeSettings(unittest.TestCase):
 
         self.assertFalse(n_hs.useEncryptThenMAC)
 
+    def test_tcpNoDelay_and_tcpCork(self):
+        hs = HandshakeSettings()
+        self.assertFalse(hs.tcpNoDelay)
+        self.assertFalse(hs.tcpCork)
+
+        hs.tcpNoDelay = True
+        hs.tcpCork = True
+
+        n_hs = hs.validate()
+
+        self.assertTrue(n_hs.tcpNoDelay)
+        self.assertTrue(n_hs.tcpCork)
+
+    def test_tcpNoDelay_with_wrong_value(self):
+        hs = HandshakeSettings()
+        hs.tcpNoDelay = "yes"
+
+        with self.assertRaises(ValueError):
+            hs.validate()
+
+    def test_tcpCork_with_wrong_value(self):
+        hs = HandshakeSettings()
+        hs.tcpCork = None
+
+        with self.assertRaises(ValueError):
+            hs.validate()
+
+    def test_recordSizeLimit(self):
+        hs = HandshakeSettings()
+        self.assertIsNone(hs.recordSizeLimit)
+
+        hs.recordSizeLimit = 512
+
+        n_hs = hs.validate()
+
+        self.assertEqual(n_hs.recordSizeLimit, 512)
+
+    def test_recordSizeLimit_too_small(self):
+        hs = HandshakeSettings()
+        hs.recordSizeLimit = 63
+
+        with self.assertRaises(ValueError):
+            hs.validate()
+
+    def test_recordSizeLimit_too_big(self):
+        hs = HandshakeSettings()
+        hs.recordSizeLimit = 2**14 + 1
+
+        with self.assertRaises(ValueError):
+            hs.validate()
+
+    def test_recordSizeLimit_with_wrong_type(self):
+        hs = HandshakeSettings()
+        hs.recordSizeLimit = "512"
+
+        with self.assertRaises(ValueError):
+            hs.validate()
+
     def test_useEncryptThenMAC_with_wrong_value(self):
         hs = HandshakeSettings()
         hs.useEncryptThenMAC = None
@@ -218,5 +279,92 @@ class TestHandshakeSettings(unittest.TestCase):
         with self.assertRaises(ValueError):
             hs.validate()
 
+    def test_getCipherSuites(self):
+        hs = HandshakeSettings()
+        hs.cipherNames = ["aes128"]
+        hs.macNames = ["sha", "sha256"]
+
+        self.assertEqual([CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA256,
+                          CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA],
+                         hs.getCipherSuites("rsa", (3, 3)))
+        self.assertEqual([CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA],
+                         hs.getCipherSuites("rsa", (3, 1)))
+
+    def test_getEccCurveIDs(self):
+        hs = HandshakeSettings()
+        hs.eccCurves = ["secp256r1", "x25519"]
+
+        self.assertEqual([GroupName.secp256r1, GroupName.x25519],
+                         hs.getEccCurveIDs())
+
+    def test_getRsaSigAlgs(self):
+        hs = HandshakeSettings()
+        hs.rsaSigHashes = ["sha256", "sha1"]
+
+        self.assertEqual([(HashAlgorithm.sha256, SignatureAlgorithm.rsa),
+                          (HashAlgorithm.sha1, SignatureAlgorithm.rsa)],
+                         hs.getRsaSigAlgs())
+
+class TestCompiledHandshakeSettings(unittest.TestCase):
+    def test_compile(self):
+        hs = HandshakeSettings()
+        hs.useExperimentalTackExtension = True
+
+        compiled = hs.compile()
+
+        self.assertIsInstance(compiled, CompiledHandshakeSettings)
+        self.assertIs(compiled, compiled.validate())
+        self.assertIs(compiled, compiled.compile())
+        self.assertEqual(tuple(hs.validate().cipherNames),
+                         compiled.cipherNames)
+        self.assertEqual(hs.maxVersion, compiled.maxVersion)
+        self.assertTrue(compiled.useExperimentalTackExtension)
+
+    def test_compile_with_invalid_settings(self):
+        hs = HandshakeSettings()
+        hs.cipherNames = []
+
+        with self.assertRaises(ValueError):
+            hs.compile()
+
+    def test_read_only(self):
+        compiled = HandshakeSettings().compile()
+
+        with self.assertRaises(AttributeError):
+            compiled.maxVersion = (3, 1)
+        with self.assertRaises(AttributeError):
+            compiled.cipherNames.append("rc4")
+
+    def test_getCipherSuites(self):
+        hs = HandshakeSettings()
+        hs.minVersion = (3, 0)
+        hs.cipherNames += ["rc4"]
+        compiled = hs.compile()
+        validated = hs.validate()
+
+        for version in ((3, 0), (3, 1), (3, 2), (3, 3)):
+            for keyExchange in ("rsa", "dhe_rsa", "ecdhe_rsa", "srp_sha",
+                                "srp_sha_rsa", "ecdh_anon", "dh_anon"):
+                self.assertEqual(
+                    validated.getCipherSuites(keyExchange, version),
+                    compiled.getCipherSuites(keyExchange, version))
+
+    def test_getCipherSuites_returns_copy(self):
+        compiled = HandshakeSettings().compile()
+
+        suites = compiled.getCipherSuites("rsa", (3, 3))
+        suites.pop()
+
+        self.assertEqual(len(suites) + 1,
+                         len(compiled.getCipherSuites("rsa", (3, 3))))
+
+    def test_getEccCurveIDs_and_getRsaSigAlgs(self):
+        hs = HandshakeSettings()
+
+        compiled = hs.compile()
+
+        self.assertEqual(hs.getEccCurveIDs(), compiled.getEccCurveIDs())
+        self.assertEqual(hs.getRsaSigAlgs(), compiled.getRsaSigAlgs())
+
 if __name__ == '__main__':
     unittest.main()
@@ -29,6 +29,7 @@ from tlslite import VerifierDB
 from tlslite.extensions import SupportedGroupsExtension, SNIExtension
 from tlslite.utils.ecc import getCurveByName, decodeX962Point, encodeX962Point,\
         getPointByteSize
+from tlslite.utils.x25519 import x25519, X25519_G
 import ecdsa
 
 from tlslite.keyexchange import KeyExchange, RSAKeyExchange, \
@@ -858,3 +859,82 @@ class TestECDHE_RSAKeyExchange(unittest.TestCase):
         with self.assertRaises(TLSIllegalParameterException):
             client_keyExchange.processServerKeyExchange(None, srv_key_ex)
 
+
+class TestECDHE_RSAKeyExchangeWithX25519(unittest.TestCase):
+    def setUp(self):
+        self.srv_private_key = parsePEMKey(srv_raw_key, private=True)
+        srv_chain = X509CertChain([X509().parse(srv_raw_certificate)])
+        self.srv_pub_key = srv_chain.getEndEntityPublicKey()
+        self.cipher_suite = CipherSuite.TLS_ECDHE_RSA_WITH_AES_128_CBC_SHA
+        ext = [SupportedGroupsExtension().create([GroupName.x25519,
+                                                  GroupName.secp256r1])]
+        self.client_hello = ClientHello().create((3, 3),
+                                                 bytearray(32),
+                                                 bytearray(0),
+                                                 [],
+                                                 extensions=ext)
+        self.server_hello = ServerHello().create((3, 3),
+                                                 bytearray(32),
+                                                 bytearray(0),
+                                                 self.cipher_suite)
+
+        self.keyExchange = ECDHE_RSAKeyExchange(self.cipher_suite,
+                                                self.client_hello,
+                                                self.server_hello,
+                                                self.srv_private_key,
+                                                [GroupName.secp256r1,
+                                                 GroupName.x25519])
+
+    def test_ECDHE_key_exchange(self):
+        srv_key_ex = self.keyExchange.makeServerKeyExchange('sha1')
+
+        self.assertEqual(srv_key_ex.named_curve, GroupName.x25519)
+        self.assertEqual(len(srv_key_ex.ecdh_Ys), 32)
+
+        cln_Xc = getRandomBytes(32)
+        cln_key_ex = ClientKeyExchange(self.cipher_suite, (3, 3))
+        cln_key_ex.createECDH(x25519(cln_Xc, X25519_G))
+
+        cln_premaster = x25519(cln_Xc, srv_key_ex.ecdh_Ys)
+
+        srv_premaster = self.keyExchange.processClientKeyExchange(cln_key_ex)
+
+        self.assertEqual(cln_premaster, srv_premaster)
+        # ephemeral private key is overwritten after use
+        self.assertEqual(self.keyExchange.ecdhXs, bytearray(32))
+
+    def test_ECDHE_key_exchange_with_small_order_client_share(self):
+        self.keyExchange.makeServerKeyExchange('sha1')
+
+        cln_key_ex = ClientKeyExchange(self.cipher_suite, (3, 3))
+        cln_key_ex.createECDH(bytearray(32))
+
+        with self.assertRaises(TLSIllegalParameterException):
+            self.keyExchange.processClientKeyExchange(cln_key_ex)
+
+    def test_ECDHE_key_exchange_with_wrong_size_client_share(self):
+        self.keyExchange.makeServerKeyExchange('sha1')
+
+        cln_key_ex = ClientKeyExchange(self.cipher_suite, (3, 3))
+        cln_key_ex.createECDH(bytearray(b'\x04' + b'\x01' * 64))
+
+        with self.assertRaises(TLSIllegalParameterException):
+            self.keyExchange.processClientKeyExchange(cln_key_ex)
+
+    def test_client_ECDHE_key_exchange(self):
+        srv_key_ex = self.keyExchange.makeServerKeyExchange('sha1')
+
+        client_keyExchange = ECDHE_RSAKeyExchange(self.cipher_suite,
+                                                  self.client_hello,
+                                                  self.server_hello,
+                                                  None,
+                                                  [GroupName.x25519])
+        client_premaster = client_keyExchange.processServerKeyExchange(\
+                None,
+                srv_key_ex)
+        clientKeyExchange = client_keyExchange.makeClientKeyExchange()
+
+        server_premaster = self.keyExchange.processClientKeyExchange(\
+                clientKeyExchange)
+
+        self.assertEqual(client_premaster, server_premaster)
@@ -9,7 +9,11 @@ try:
 except ImportError:
         import unittest
 
-from tlslite.mathtls import PRF_1_2, calcMasterSecret, calcFinished
+from tlslite.mathtls import PRF_1_2, calcMasterSecret, calcFinished, \
+        powModGenerator, goodGroupParameters, PRF, PRF_1_2_SHA384, P_hash, \
+        P_hashDigest
+from tlslite.utils.cryptomath import HMAC_SHA256, HMAC_MD5
+import tlslite.utils.tlshashlib as hashlib
 from tlslite.handshakehashes import HandshakeHashes
 from tlslite.constants import CipherSuite
 
@@ -25,6 +29,20 @@ class TestCalcMasterSecret(unittest.TestCase):
             ), ret)
         self.assertEqual(48, len(ret))
 
+class TestPHash(unittest.TestCase):
+    def test_with_HMAC_function(self):
+        ret = P_hash(HMAC_SHA256, bytearray(48), b"key expansion" +
+                     bytearray(64), 16)
+
+        self.assertEqual(bytearray(b'S\xb5\xdb\xc8T }u)BxuB\xe4\xeb\xeb'), ret)
+
+    def test_P_hashDigest_matches_P_hash(self):
+        for length in (1, 16, 20, 70):
+            self.assertEqual(P_hash(HMAC_MD5, bytearray(24), bytearray(10),
+                                    length),
+                             P_hashDigest(hashlib.md5, bytearray(24),
+                                          bytearray(10), length))
+
 class TestPRF1_2(unittest.TestCase):
     def test_with_bogus_values(self):
         ret = PRF_1_2(bytearray(1), b"key expansion", bytearray(1), 10)
@@ -36,6 +54,80 @@ class TestPRF1_2(unittest.TestCase):
 
         self.assertEqual(bytearray(b'S\xb5\xdb\xc8T }u)BxuB\xe4\xeb\xeb'), ret)
 
+    def test_with_output_spanning_multiple_blocks(self):
+        ret = PRF_1_2(bytearray(48), b"key expansion", bytearray(64), 70)
+
+        self.assertEqual(bytearray(
+            b'S\xb5\xdb\xc8T }u)BxuB\xe4\xeb\xeb\xf5\xfa>\xfd\x1a\xd6'
+            b'\xfam]\xc1\x04H\x1d\xae\xa5\t\xa9\xfc\x88\x1dM;\xc1J\xe9'
+            b'\xcdO\xfb\xaf\x8b\xb0\x835\x01\xc6s\xce\x90\x8fcF{\xfb\x1b|'
+            b'\x90\xd0iy\x1b\x00\xf6\x11I'), ret)
+
+    def test_with_keyCache(self):
+        keyCache = {}
+
+        ret = PRF_1_2(bytearray(48), b"key expansion", bytearray(64), 16,
+                      keyCache)
+        ret2 = PRF_1_2(bytearray(48), b"key expansion", bytearray(64), 16,
+                       keyCache)
+
+        self.assertEqual(bytearray(b'S\xb5\xdb\xc8T }u)BxuB\xe4\xeb\xeb'), ret)
+        self.assertEqual(ret, ret2)
+        self.assertEqual(len(keyCache), 1)
+
+    def test_keyCache_does_not_keep_secret(self):
+        keyCache = {}
+        secret = bytearray(b'\x5a' * 48)
+
+        PRF_1_2(secret, b"key expansion", bytearray(64), 16, keyCache)
+
+        self.assertEqual(list(keyCache.keys()), [hashlib.sha256])
+
+class TestPRF1_2_SHA384(unittest.TestCase):
+    def test_with_realistic_values(self):
+        ret = PRF_1_2_SHA384(bytearray(48), b"key expansion", bytearray(64),
+                             16)
+
+        self.assertEqual(bytearray(
+            b"\'\x3apW\xb0\xc3\xa28\x9e\xe6\xbb\x87\xd2I\xb0m"), ret)
+
+class TestPRF(unittest.TestCase):
+    def test_with_realistic_values(self):
+        ret = PRF(bytearray(48), b"key expansion", bytearray(64), 16)
+
+        self.assertEqual(bytearray(
+            b'\xd0\x9d\xda\xec\x01\x9a6g\xf9\xc3\xaf\x02\xe2\xd0Q{'), ret)
+
+    def test_with_keyCache(self):
+        keyCache = {}
+
+        ret = PRF(bytearray(48), b"key expansion", bytearray(64), 16,
+                  keyCache)
+
+        self.assertEqual(bytearray(
+            b'\xd0\x9d\xda\xec\x01\x9a6g\xf9\xc3\xaf\x02\xe2\xd0Q{'), ret)
+        self.assertEqual(len(keyCache), 2)
+
+    def test_with_odd_secret_length(self):
+        ret = PRF(bytearray(range(47)), b"key expansion", bytearray(64), 60)
+
+        self.assertEqual(bytearray(
+            b'\xce\xba\x15\xd4\xe5\xe7\xe6\xde\xa9\x1bL\x86q\xc3\xc8>5\xaa'
+            b'\xe1\xdcY\x8a\r\xe6\x03pB>c\xa4\xf0\xc7\xdd\xb7\xbc\to\x9e'
+            b'\xe3\\\x03\x92>m\xa8\xe8V\x0e\xd9p\xe6\xdf\xbcd~\xdb\xf4'
+            b'\xc3\x96\xc3'), ret)
+
+class TestPowModGenerator(unittest.TestCase):
+    def test_with_known_group(self):
+        g, N = goodGroupParameters[2]
+        power = (1 << 320) - 12345
+
+        self.assertEqual(pow(g, power, N), powModGenerator(g, power, N))
+
+    def test_with_unknown_group(self):
+        self.assertEqual(pow(3, 1234567, 65537),
+                         powModGenerator(3, 1234567, 65537))
+
 class TestCalcFinished(unittest.TestCase):
     def setUp(self):
         self.hhashes = HandshakeHashes()
@@ -9,14 +9,17 @@ except ImportError:
     import unittest
 from tlslite.messages import ClientHello, ServerHello, RecordHeader3, Alert, \
         RecordHeader2, Message, ClientKeyExchange, ServerKeyExchange, \
-        CertificateRequest, CertificateVerify, ServerHelloDone
+        CertificateRequest, CertificateVerify, ServerHelloDone, Certificate, \
+        ApplicationData
 from tlslite.utils.codec import Parser
 from tlslite.constants import CipherSuite, CertificateType, ContentType, \
         AlertLevel, AlertDescription, ExtensionType, ClientCertificateType, \
         HashAlgorithm, SignatureAlgorithm, ECCurveType, GroupName
 from tlslite.extensions import SNIExtension, ClientCertTypeExtension, \
     SRPExtension, TLSExtension
-from tlslite.errors import TLSInternalError
+from tlslite.errors import TLSInternalError, TLSDecodeError
+from tlslite.x509 import X509
+from tlslite.x509certchain import X509CertChain
 
 class TestMessage(unittest.TestCase):
     def test___init__(self):
@@ -24,6 +27,13 @@ class TestMessage(unittest.TestCase):
 
         self.assertEqual(ContentType.application_data, msg.contentType)
         self.assertEqual(bytearray(0), msg.data)
+        self.assertFalse(hasattr(msg, '__dict__'))
+
+    def test___init___without_instance_attributes(self):
+        msg = Message(ContentType.application_data, bytearray(0))
+
+        with self.assertRaises(AttributeError):
+            msg.appState = 1
 
     def test_write(self):
         msg = Message(0, bytearray(10))
@@ -274,6 +284,98 @@ class TestClientHello(unittest.TestCase):
         tack = TLSExtension().create(62208, bytearray(0))
         self.assertEqual([tack], client_hello.extensions)
 
+    @staticmethod
+    def _lazy_parse_data():
+        return bytearray(
+            # we don't include the type of message as it is handled by the
+            # hello protocol parser
+            #b'x01' +             # type of message - client_hello
+            b'\x00'*2 + b'\x40' + # length - 64 bytes
+            b'\x01\x01' +         # protocol version - arbitrary (invalid)
+            b'\x00'*32 +          # client random
+            b'\x00' +             # session ID length
+            b'\x00'*2 +           # cipher suites length
+            b'\x00' +             # compression methods length
+            b'\x00\x18' +         # extensions length - 24 bytes
+            b'\xf3\x00' +         # extension type - TACK (62208)
+            b'\x00\x00' +         # extension length - 0 bytes
+            b'\x00\x00' +         # extension type - SNI (0)
+            b'\x00\x10' +         # extension length - 16 bytes
+            b'\x00\x0e' +         # length of array - 14 bytes
+            b'\x00' +             # type of entry - host_name (0)
+            b'\x00\x0b' +         # length of name - 11 bytes
+            # UTF-8 encoding of example.com
+            b'\x65\x78\x61\x6d\x70\x6c\x65\x2e\x63\x6f\x6d')
+
+    def test_parse_lazy(self):
+        p = Parser(self._lazy_parse_data())
+        client_hello = ClientHello().parse(p, lazy=True)
+
+        self.assertEqual((1,1), client_hello.client_version)
+        self.assertEqual({}, client_hello._decodedExtensions)
+
+        sni = client_hello.getExtension(ExtensionType.server_name)
+        self.assertEqual(SNIExtension().create(bytearray(b'example.com')),
+                         sni)
+        self.assertIs(sni, client_hello.getExtension(ExtensionType.server_name))
+        self.assertEqual([1], list(client_hello._decodedExtensions.keys()))
+        self.assertIsNone(client_hello.getExtension(ExtensionType.srp))
+
+        tack = TLSExtension().create(62208, bytearray(0))
+        self.assertEqual([tack, sni], client_hello.extensions)
+        self.assertIs(sni, client_hello.extensions[1])
+
+    def test_parse_lazy_and_write(self):
+        data = self._lazy_parse_data()
+        client_hello = ClientHello().parse(Parser(data), lazy=True)
+
+        self.assertEqual(bytearray(b'\x01') + data, client_hello.write())
+
+        client_hello.server_name = bytearray(b'example.org')
+
+        self.assertEqual(bytearray(b'\x01') + data[:-3] + bytearray(b'org'),
+                         client_hello.write())
+
+    def test_parse_lazy_with_truncated_extension(self):
+        data = self._lazy_parse_data()
+        data[2] -= 1
+        data = data[:-1]
+
+        with self.assertRaises(SyntaxError):
+            ClientHello().parse(Parser(data), lazy=True)
+
+    def test_parse_lazy_with_malformed_extension(self):
+        data = self._lazy_parse_data()
+        # length of array in SNI extension
+        data[-15] = 0x0f
+
+        client_hello = ClientHello().parse(Parser(data), lazy=True)
+
+        self.assertTrue(client_hello.tack)
+        with self.assertRaises(TLSDecodeError):
+            client_hello.getExtension(ExtensionType.server_name)
+
+    def test_parse_lazy_with_malformed_extension_and_extensions(self):
+        data = self._lazy_parse_data()
+        # length of array in SNI extension
+        data[-15] = 0x0f
+
+        client_hello = ClientHello().parse(Parser(data), lazy=True)
+
+        with self.assertRaises(TLSDecodeError):
+            client_hello.extensions
+
+    def test_parse_lazy_with_duplicated_extension(self):
+        data = self._lazy_parse_data()
+        data[2] += 4
+        data[42] += 4
+        data += bytearray(b'\xf3\x00\x00\x00')
+
+        client_hello = ClientHello().parse(Parser(data), lazy=True)
+
+        with self.assertRaises(TLSInternalError):
+            client_hello.getExtension(ExtensionType.tack)
+
     def test_write(self):
         # client_hello = ClientHello(ssl2)
         client_hello = ClientHello()
@@ -977,6 +1079,12 @@ class TestRecordHeader3(unittest.TestCase):
         self.assertEqual(0, rh.length)
         self.assertFalse(rh.ssl2)
 
+    def test___init___without_instance_attributes(self):
+        rh = RecordHeader3()
+
+        with self.assertRaises(AttributeError):
+            rh.appState = 1
+
     def test_create(self):
         rh = RecordHeader3()
 
@@ -1710,6 +1818,55 @@ class TestServerKeyExchange(unittest.TestCase):
        with self.assertRaises(AssertionError):
            ske.hash(bytearray(32), bytearray(32))
 
+class TestCertificate(unittest.TestCase):
+    def test_write(self):
+        cert1 = X509()
+        cert1.bytes = bytearray(b'\x01\x02')
+        cert2 = X509()
+        cert2.bytes = bytearray(b'\x03')
+        chain = X509CertChain([cert1, cert2])
+
+        msg = Certificate(CertificateType.x509).create(chain)
+
+        expected = bytearray(
+            b'\x0b' +             # type - certificate
+            b'\x00\x00\x0c' +     # length
+            b'\x00\x00\x09' +     # length of certificate_list
+            b'\x00\x00\x02\x01\x02' +
+            b'\x00\x00\x01\x03')
+        self.assertEqual(expected, msg.write())
+        # second write uses the cached encoding
+        self.assertEqual(expected, msg.write())
+
+    def test_write_after_chain_change(self):
+        cert1 = X509()
+        cert1.bytes = bytearray(b'\x01\x02')
+        cert2 = X509()
+        cert2.bytes = bytearray(b'\x03')
+        chain = X509CertChain([cert1])
+
+        msg = Certificate(CertificateType.x509).create(chain)
+        msg.write()
+
+        chain.x509List.append(cert2)
+
+        self.assertEqual(bytearray(
+            b'\x0b' +             # type - certificate
+            b'\x00\x00\x0c' +     # length
+            b'\x00\x00\x09' +     # length of certificate_list
+            b'\x00\x00\x02\x01\x02' +
+            b'\x00\x00\x01\x03'), msg.write())
+
+        cert2.bytes = bytearray(b'\x04')
+
+        self.assertEqual(bytearray(b'\x04'), msg.write()[-1:])
+
+    def test_write_without_chain(self):
+        msg = Certificate(CertificateType.x509).create(None)
+
+        self.assertEqual(bytearray(b'\x0b\x00\x00\x03\x00\x00\x00'),
+                         msg.write())
+
 class TestCertificateRequest(unittest.TestCase):
     def test___init__(self):
         cr = CertificateRequest((3, 0))
@@ -1890,5 +2047,18 @@ class TestServerHelloDone(unittest.TestCase):
 
         self.assertEqual("ServerHelloDone()", repr(shd))
 
+class TestApplicationData(unittest.TestCase):
+    def test___init__(self):
+        app_data = ApplicationData()
+
+        self.assertEqual(ContentType.application_data, app_data.contentType)
+        self.assertEqual(bytearray(0), app_data.bytes)
+
+    def test___init___without_instance_attributes(self):
+        app_data = ApplicationData()
+
+        with self.assertRaises(AttributeError):
+            app_data.appState = 1
+
 if __name__ == '__main__':
     unittest.main()
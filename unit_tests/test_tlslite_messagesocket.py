@@ -442,3 +442,40 @@ class TestMessageSocket(unittest.TestCase):
             b'\x03\x03' +
             b'\x00\x03' +
             b'\xaa'*3), sock.sent[0])
+
+    def test_flushBlocking_with_messages_spanning_records(self):
+        sock = MockSocket(bytearray())
+
+        msgSock = MessageSocket(sock, None)
+        msgSock.version = (3, 3)
+        msgSock.recordSize = 4
+
+        msgSock.queueMessageBlocking(Message(ContentType.handshake,
+                                             bytearray(b'\xaa'*3)))
+        msgSock.queueMessageBlocking(Message(ContentType.handshake,
+                                             bytearray(b'\xbb'*6)))
+        msgSock.queueMessageBlocking(Message(ContentType.handshake,
+                                             bytearray(b'\xcc'*1)))
+        msgSock.queueMessageBlocking(Message(ContentType.handshake,
+                                             bytearray(b'\xdd'*2)))
+
+        self.assertEqual(len(sock.sent), 0)
+
+        msgSock.flushBlocking()
+
+        self.assertEqual([bytearray(b'\x16\x03\x03\x00\x04' +
+                                    b'\xaa'*3 + b'\xbb'),
+                          bytearray(b'\x16\x03\x03\x00\x04' + b'\xbb'*4),
+                          bytearray(b'\x16\x03\x03\x00\x04' +
+                                    b'\xbb' + b'\xcc' + b'\xdd'*2)],
+                         sock.sent)
+
+        msgSock.queueMessageBlocking(Message(ContentType.handshake,
+                                             bytearray(b'\xee'*5)))
+        msgSock.flushBlocking()
+
+        self.assertEqual(5, len(sock.sent))
+        self.assertEqual(bytearray(b'\x16\x03\x03\x00\x04' + b'\xee'*4),
+                         sock.sent[3])
+        self.assertEqual(bytearray(b'\x16\x03\x03\x00\x01' + b'\xee'),
+                         sock.sent[4])
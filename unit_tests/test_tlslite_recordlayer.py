@@ -18,14 +18,18 @@ except ImportError:
 import os
 import socket
 import errno
+import hmac
+import hashlib
 
 import tlslite.utils.cryptomath as cryptomath
 from tlslite.messages import Message, ApplicationData, RecordHeader3
 from tlslite.recordlayer import RecordSocket, ConnectionState, RecordLayer
 from tlslite.constants import ContentType, CipherSuite
+from tlslite.utils.compat import compatHMAC
 from unit_tests.mocksock import MockSocket
 from tlslite.errors import TLSRecordOverflow, TLSIllegalParameterException,\
-        TLSAbruptCloseError, TLSDecryptionFailed, TLSBadRecordMAC
+        TLSAbruptCloseError, TLSDecryptionFailed, TLSBadRecordMAC, \
+        TLSSequenceNumberOverflow
 
 class TestRecordSocket(unittest.TestCase):
     def test___init__(self):
@@ -35,6 +39,12 @@ class TestRecordSocket(unittest.TestCase):
         self.assertEqual(sock.sock, -42)
         self.assertEqual(sock.version, (0, 0))
 
+    def test___init___without_instance_attributes(self):
+        sock = RecordSocket(-42)
+
+        with self.assertRaises(AttributeError):
+            sock.appState = 1
+
     def test_send(self):
         mockSock = MockSocket(bytearray(0))
         sock = RecordSocket(mockSock)
@@ -55,6 +65,99 @@ class TestRecordSocket(unittest.TestCase):
             b'\x00'*10          # payload
             ), mockSock.sent[0])
 
+    def test_sendFramed(self):
+        mockSock = MockSocket(bytearray(0))
+        sock = RecordSocket(mockSock)
+        sock.version = (3, 3)
+
+        record = bytearray(b'\x17\x03\x03\x00\x02ab')
+
+        for result in sock.sendFramed(record):
+            if result in (0, 1):
+                self.assertTrue(False, "Blocking socket")
+            else: break
+
+        self.assertEqual(len(mockSock.sent), 1)
+        self.assertEqual(record, mockSock.sent[0])
+
+    def test_sendFramed_with_bufferWrites(self):
+        mockSock = MockSocket(bytearray(0))
+        sock = RecordSocket(mockSock)
+        sock.version = (3, 3)
+        sock.bufferWrites = True
+
+        for result in sock.sendFramed(bytearray(b'\x17\x03\x03\x00\x01a')):
+            self.assertTrue(False, "Blocking socket")
+        for result in sock.send(Message(ContentType.alert,
+                                        bytearray(b'\x02\x28'))):
+            self.assertTrue(False, "Blocking socket")
+
+        self.assertEqual(len(mockSock.sent), 0)
+
+        for result in sock.flush():
+            self.assertTrue(False, "Blocking socket")
+
+        self.assertEqual([bytearray(b'\x17\x03\x03\x00\x01a'
+                                    b'\x15\x03\x03\x00\x02\x02\x28')],
+                         mockSock.sent)
+
+        for result in sock.flush():
+            self.assertTrue(False, "Blocking socket")
+
+        self.assertEqual(len(mockSock.sent), 1)
+
+    def test_sendFramed_after_bufferWrites_reset(self):
+        mockSock = MockSocket(bytearray(0))
+        sock = RecordSocket(mockSock)
+        sock.version = (3, 3)
+        sock.bufferWrites = True
+
+        for result in sock.sendFramed(bytearray(b'\x16\x03\x03\x00\x01a')):
+            self.assertTrue(False, "Blocking socket")
+
+        sock.bufferWrites = False
+
+        for result in sock.sendFramed(bytearray(b'\x17\x03\x03\x00\x01b')):
+            if result in (0, 1):
+                self.assertTrue(False, "Blocking socket")
+
+        self.assertEqual([bytearray(b'\x16\x03\x03\x00\x01a'
+                                    b'\x17\x03\x03\x00\x01b')],
+                         mockSock.sent)
+
+    def test_send_updates_ioTime(self):
+        mockSock = MockSocket(bytearray(0))
+        sock = RecordSocket(mockSock)
+        sock.timeIO = True
+        self.assertEqual(sock.ioTime, 0.0)
+
+        msg = Message(ContentType.handshake, bytearray(10))
+
+        with mock.patch('tlslite.recordlayer.time.time') as mockTime:
+            mockTime.side_effect = [10.0, 10.5]
+            for result in sock.send(msg):
+                if result in (0, 1):
+                    self.assertTrue(False, "Blocking socket")
+                else: break
+
+        self.assertEqual(sock.ioTime, 0.5)
+
+    def test_send_without_timeIO(self):
+        mockSock = MockSocket(bytearray(0))
+        sock = RecordSocket(mockSock)
+
+        msg = Message(ContentType.handshake, bytearray(10))
+
+        with mock.patch('tlslite.recordlayer.time.time') as mockTime:
+            for result in sock.send(msg):
+                if result in (0, 1):
+                    self.assertTrue(False, "Blocking socket")
+                else: break
+
+        self.assertFalse(mockTime.called)
+        self.assertEqual(sock.ioTime, 0.0)
+        self.assertEqual(len(mockSock.sent), 1)
+
     def test_send_with_very_slow_socket(self):
         mockSock = MockSocket(bytearray(0), maxWrite=1, blockEveryOther=True)
         sock = RecordSocket(mockSock)
@@ -229,6 +332,21 @@ class TestRecordSocket(unittest.TestCase):
         with self.assertRaises(TLSRecordOverflow):
             next(gen)
 
+    def test_recv_with_record_over_lowered_limit(self):
+        mockSock = MockSocket(bytearray(
+            b'\x17' +           # type - application data
+            b'\x03\x03' +       # TLSv1.2
+            b'\x09\x01' +       # length - 2**11+2**8+1
+            b'\x00'*2305))
+
+        sock = RecordSocket(mockSock)
+        sock.recordSizeLimit = 256
+
+        gen = sock.recv()
+
+        with self.assertRaises(TLSRecordOverflow):
+            next(gen)
+
 
     def test_recv_with_empty_data(self):
         mockSock = MockSocket(bytearray(
@@ -320,6 +438,49 @@ class TestConnectionState(unittest.TestCase):
         self.assertEqual(bytearray(b'\x00'*7 + b'\x03'),
                          connState.getSeqNumBytes())
         self.assertEqual(4, connState.seqnum)
+    def test_getSeqNumBytes_with_overflow(self):
+        connState = ConnectionState()
+        connState.seqnum = 2**64 - 1
+
+        self.assertEqual(bytearray(b'\xff'*8), connState.getSeqNumBytes())
+        with self.assertRaises(TLSSequenceNumberOverflow):
+            connState.getSeqNumBytes()
+
+    def test_getAEADParameters(self):
+        connState = ConnectionState()
+        connState.fixedNonce = bytearray(b'\xaa'*4)
+        connState.seqnum = 0x0102
+
+        seqnumBytes, nonce, authData = connState.getAEADParameters(
+            ContentType.application_data, (3, 3), 300)
+
+        self.assertEqual(bytearray(b'\x00'*6 + b'\x01\x02'), seqnumBytes)
+        self.assertEqual(bytearray(b'\xaa'*4 + b'\x00'*6 + b'\x01\x02'),
+                         nonce)
+        self.assertEqual(bytearray(b'\x00'*6 + b'\x01\x02' +
+                                   b'\x17' +       # application data
+                                   b'\x03\x03' +   # TLSv1.2
+                                   b'\x01\x2c'),   # length
+                         authData)
+        self.assertEqual(0x0103, connState.seqnum)
+
+        seqnumBytes, nonce, authData = connState.getAEADParameters(
+            ContentType.handshake, (3, 3), 0)
+
+        self.assertEqual(bytearray(b'\xaa'*4 + b'\x00'*6 + b'\x01\x03'),
+                         nonce)
+        self.assertEqual(bytearray(b'\x00'*6 + b'\x01\x03' +
+                                   b'\x16\x03\x03\x00\x00'),
+                         authData)
+
+    def test_getAEADParameters_with_overflow(self):
+        connState = ConnectionState()
+        connState.fixedNonce = bytearray(4)
+        connState.seqnum = 2**64
+
+        with self.assertRaises(TLSSequenceNumberOverflow):
+            connState.getAEADParameters(ContentType.application_data,
+                                        (3, 3), 0)
 
 class TestRecordLayer(unittest.TestCase):
     def test___init__(self):
@@ -331,6 +492,12 @@ class TestRecordLayer(unittest.TestCase):
         self.assertIsNone(recordLayer.getCipherImplementation())
         self.assertFalse(recordLayer.isCBCMode())
 
+    def test___init___keeps_state_in_slots(self):
+        recordLayer = RecordLayer(None)
+
+        # __dict__ is only for per-instance hooks, like addPadding
+        self.assertEqual(recordLayer.__dict__, {})
+
     def test_sendRecord(self):
         sock = MockSocket(bytearray(0))
         recordLayer = RecordLayer(sock)
@@ -383,6 +550,42 @@ class TestRecordLayer(unittest.TestCase):
 
         self.assertEqual(16, recordLayer.blockSize)
 
+    def test_calculateMAC(self):
+        recordLayer = RecordLayer(None)
+        recordLayer.version = (3, 3)
+
+        mac = hmac.new(compatHMAC(bytearray(20)), digestmod=hashlib.sha1)
+        ref = mac.copy()
+
+        seqnumBytes = bytearray(b'\x00'*7 + b'\x01')
+        macBytes = recordLayer.calculateMAC(mac, seqnumBytes,
+                                            ContentType.application_data,
+                                            bytearray(b'test'))
+
+        ref.update(compatHMAC(seqnumBytes +
+                              bytearray(b'\x17' +      # app data
+                                        b'\x03\x03' +  # TLS 1.2
+                                        b'\x00\x04' +  # length
+                                        b'test')))
+        self.assertEqual(bytearray(ref.digest()), macBytes)
+
+    def test_calculateMAC_in_SSLv3(self):
+        recordLayer = RecordLayer(None)
+        recordLayer.version = (3, 0)
+
+        mac = hmac.new(compatHMAC(bytearray(20)), digestmod=hashlib.sha1)
+        ref = mac.copy()
+
+        macBytes = recordLayer.calculateMAC(mac, bytearray(8),
+                                            ContentType.handshake,
+                                            bytearray(300))
+
+        ref.update(compatHMAC(bytearray(8) +
+                              bytearray(b'\x16' +      # handshake
+                                        b'\x01\x2c') + # length
+                              bytearray(300)))
+        self.assertEqual(bytearray(ref.digest()), macBytes)
+
     @unittest.skipUnless(cryptomath.m2cryptoLoaded, "requires M2Crypto")
     def test_blockSize_with_3DES(self):
         sock = MockSocket(bytearray(0))
@@ -713,6 +916,37 @@ class TestRecordLayer(unittest.TestCase):
             b'\x00\x00\x00\x00\x00\x00\x00\x00Fy\xc0\x91' +
             b'A\x85\x82\xffk\x95\x8a51\x1e\xfb\x93e\xdd\xc1\xc7'))
 
+    def test_sendRecord_with_ChaCha20(self):
+        sock = MockSocket(bytearray(0))
+
+        recordLayer = RecordLayer(sock)
+        recordLayer.version = (3, 3)
+
+        recordLayer.calcPendingStates(
+            CipherSuite.TLS_ECDHE_RSA_WITH_CHACHA20_POLY1305,
+            bytearray(48), # master secret
+            bytearray(32), # client random
+            bytearray(32), # server random
+            None)
+        recordLayer.changeWriteState()
+
+        app_data = ApplicationData().create(bytearray(b'test'))
+
+        for result in recordLayer.sendRecord(app_data):
+            if result in (0, 1):
+                self.assertTrue(False, "blocking socket")
+            else: break
+
+        self.assertEqual(len(sock.sent), 1)
+        # ChaCha20 records don't have an explicit nonce, only the data
+        # and the tag
+        self.assertEqual(sock.sent[0][:5], bytearray(
+            b'\x17' +           # application data
+            b'\x03\x03' +       # TLSv1.2
+            b'\x00\x14'         # length
+            ))
+        self.assertEqual(len(sock.sent[0]), 5 + 4 + 16)
+
     def test_recvRecord_with_AES128GCM(self):
         sock = MockSocket(bytearray(
             b'\x17' +
@@ -744,6 +978,71 @@ class TestRecordLayer(unittest.TestCase):
         self.assertEqual(head.type, ContentType.application_data)
         self.assertEqual(bytearray(b'test'), parser.bytes)
 
+    def test_recvRecord_with_ChaCha20(self):
+        sendSock = MockSocket(bytearray(0))
+        sendingLayer = RecordLayer(sendSock)
+        sendingLayer.version = (3, 3)
+        sendingLayer.calcPendingStates(
+            CipherSuite.TLS_ECDHE_RSA_WITH_CHACHA20_POLY1305,
+            bytearray(48), # master secret
+            bytearray(32), # client random
+            bytearray(32), # server random
+            None)
+        sendingLayer.changeWriteState()
+
+        for result in sendingLayer.sendRecord(
+                ApplicationData().create(bytearray(b'test'))):
+            if result in (0, 1):
+                self.assertTrue(False, "blocking socket")
+            else: break
+
+        sock = MockSocket(sendSock.sent[0])
+
+        recordLayer = RecordLayer(sock)
+        recordLayer.version = (3, 3)
+        recordLayer.client = False
+
+        recordLayer.calcPendingStates(
+            CipherSuite.TLS_ECDHE_RSA_WITH_CHACHA20_POLY1305,
+            bytearray(48), # master secret
+            bytearray(32), # client random
+            bytearray(32), # server random
+            None)
+        recordLayer.changeReadState()
+
+        for result in recordLayer.recvRecord():
+            if result in (0, 1):
+                self.assertTrue(False, "blocking socket")
+            else:
+                break
+
+        head, parser = result
+
+        self.assertEqual(head.type, ContentType.application_data)
+        self.assertEqual(bytearray(b'test'), parser.bytes)
+
+    def test__decryptAndUnseal_with_AES128GCM_keeps_input(self):
+        buf = bytearray(b'\x00\x00\x00\x00\x00\x00\x00\x00Fy\xc0\x91' +
+                        b'A\x85\x82\xffk\x95\x8a51\x1e\xfb\x93e\xdd\xc1\xc7')
+        copy = bytearray(buf)
+
+        recordLayer = RecordLayer(None)
+        recordLayer.version = (3, 3)
+        recordLayer.client = False
+
+        recordLayer.calcPendingStates(CipherSuite.TLS_RSA_WITH_AES_128_GCM_SHA256,
+                                      bytearray(48), # master secret
+                                      bytearray(32), # client random
+                                      bytearray(32), # server random
+                                      None)
+        recordLayer.changeReadState()
+
+        data = recordLayer._decryptAndUnseal(ContentType.application_data,
+                                             buf)
+
+        self.assertEqual(bytearray(b'test'), data)
+        self.assertEqual(copy, buf)
+
     def test_recvRecord_with_AES128GCM_too_short_data(self):
         sock = MockSocket(bytearray(
             b'\x17' +
@@ -1140,6 +1439,23 @@ class TestRecordLayer(unittest.TestCase):
         self.assertEqual((3, 3), header.version)
         self.assertEqual(bytearray(b'\x0e' + b'\x00'*3), parser.bytes)
 
+    def test_recvRecord_with_data_over_recvRecordLimit(self):
+        sock = MockSocket(bytearray(
+            b'\x17' +           # application data
+            b'\x03\x03' +       # TLSv1.2
+            b'\x00\x41' +       # length
+            b'\x00'*65))
+        recordLayer = RecordLayer(sock)
+        self.assertEqual(recordLayer.recvRecordLimit, 2**14)
+        recordLayer.recvRecordLimit = 64
+
+        with self.assertRaises(TLSRecordOverflow):
+            for result in recordLayer.recvRecord():
+                if result in (0, 1):
+                    self.assertTrue(False, "Blocking read")
+                else:
+                    break
+
     def test_recvRecord_with_slow_socket(self):
         sock = MockSocket(bytearray(
             b'\x16' +           # handshake
@@ -0,0 +1,36 @@
+# Copyright (c) 2016, Hubert Kario
+#
+# See the LICENSE file for legal information regarding use of this file.
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tlslite.session import Session
+
+class TestSession(unittest.TestCase):
+    def test___init__(self):
+        session = Session()
+
+        self.assertEqual(bytearray(0), session.masterSecret)
+        self.assertFalse(session.resumable)
+
+    def test___init___keeps_state_in_slots(self):
+        session = Session()
+
+        # __dict__ is only for attributes set by the application
+        self.assertEqual(session.__dict__, {})
+
+    def test_create_keeps_state_in_slots(self):
+        session = Session()
+        session.create(bytearray(48), bytearray(32), 0x002f, "", None, None,
+                       None, False, "example.com")
+
+        self.assertTrue(session.resumable)
+        self.assertEqual(session.__dict__, {})
+
+if __name__ == '__main__':
+    unittest.main()
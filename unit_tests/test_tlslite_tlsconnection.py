@@ -11,13 +11,15 @@ except ImportError:
 
 from tlslite.recordlayer import RecordLayer
 from tlslite.messages import ServerHello, ClientHello, Alert, RecordHeader3
-from tlslite.constants import CipherSuite, AlertDescription, ContentType
+from tlslite.constants import CipherSuite, AlertDescription, ContentType, \
+        ExtensionType, Fault
 from tlslite.tlsconnection import TLSConnection
 from tlslite.errors import TLSLocalAlert, TLSRemoteAlert
 from tlslite.x509 import X509
 from tlslite.x509certchain import X509CertChain
 from tlslite.utils.keyfactory import parsePEMKey
 from tlslite.handshakesettings import HandshakeSettings
+from tlslite.extensions import RecordSizeLimitExtension, TLSExtension
 
 from unit_tests.mocksock import MockSocket
 
@@ -57,6 +59,12 @@ srv_raw_certificate = str(
 
 class TestTLSConnection(unittest.TestCase):
 
+    def test___init___keeps_state_in_slots(self):
+        conn = TLSConnection(None)
+
+        # __dict__ is only for attributes set by the application
+        self.assertEqual(conn.__dict__, {})
+
     def test_client_with_server_responing_with_SHA256_on_TLSv1_1(self):
         # socket to generate the faux response
         gen_sock = MockSocket(bytearray(0))
@@ -90,6 +98,172 @@ class TestTLSConnection(unittest.TestCase):
         self.assertEqual(err.exception.description,
                          AlertDescription.illegal_parameter)
 
+    def test_client_with_server_responding_with_unrequested_record_size_limit(
+            self):
+        gen_sock = MockSocket(bytearray(0))
+
+        gen_record_layer = RecordLayer(gen_sock)
+        gen_record_layer.version = (3, 3)
+
+        server_hello = ServerHello().create(
+                version=(3, 3),
+                random=bytearray(32),
+                session_id=bytearray(0),
+                cipher_suite=CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA,
+                certificate_type=None,
+                tackExt=None,
+                next_protos_advertised=None,
+                extensions=[RecordSizeLimitExtension().create(256)])
+
+        for res in gen_record_layer.sendRecord(server_hello):
+            if res in (0, 1):
+                self.assertTrue(False, "Blocking socket")
+            else:
+                break
+
+        sock = MockSocket(gen_sock.sent[0])
+
+        conn = TLSConnection(sock)
+
+        with self.assertRaises(TLSLocalAlert) as err:
+            conn.handshakeClientCert()
+
+        self.assertEqual(err.exception.description,
+                         AlertDescription.illegal_parameter)
+
+    def test_server_with_client_sending_too_small_record_size_limit(self):
+        gen_sock = MockSocket(bytearray(0))
+
+        gen_record_layer = RecordLayer(gen_sock)
+        gen_record_layer.version = (3, 0)
+
+        ciphers = [CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA,
+                   CipherSuite.TLS_EMPTY_RENEGOTIATION_INFO_SCSV]
+
+        client_hello = ClientHello().create(
+                version=(3, 3),
+                random=bytearray(32),
+                session_id=bytearray(0),
+                cipher_suites=ciphers,
+                extensions=[RecordSizeLimitExtension().create(63)])
+
+        for res in gen_record_layer.sendRecord(client_hello):
+            if res in (0, 1):
+                self.assertTrue(False, "Blocking socket")
+            else:
+                break
+
+        sock = MockSocket(gen_sock.sent[0])
+
+        conn = TLSConnection(sock)
+
+        srv_private_key = parsePEMKey(srv_raw_key, private=True)
+        srv_cert_chain = X509CertChain([X509().parse(srv_raw_certificate)])
+        with self.assertRaises(TLSLocalAlert) as err:
+            conn.handshakeServer(certChain=srv_cert_chain,
+                                 privateKey=srv_private_key)
+
+        self.assertEqual(err.exception.description,
+                         AlertDescription.illegal_parameter)
+
+    def test_server_with_client_sending_malformed_extension(self):
+        gen_sock = MockSocket(bytearray(0))
+
+        gen_record_layer = RecordLayer(gen_sock)
+        gen_record_layer.version = (3, 0)
+
+        ciphers = [CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA,
+                   CipherSuite.TLS_EMPTY_RENEGOTIATION_INFO_SCSV]
+
+        # record_size_limit extension needs to have a two byte payload
+        ext = TLSExtension().create(ExtensionType.record_size_limit,
+                                    bytearray(b'\x01'))
+        client_hello = ClientHello().create(
+                version=(3, 3),
+                random=bytearray(32),
+                session_id=bytearray(0),
+                cipher_suites=ciphers,
+                extensions=[ext])
+
+        for res in gen_record_layer.sendRecord(client_hello):
+            if res in (0, 1):
+                self.assertTrue(False, "Blocking socket")
+            else:
+                break
+
+        sock = MockSocket(gen_sock.sent[0])
+
+        conn = TLSConnection(sock)
+
+        srv_private_key = parsePEMKey(srv_raw_key, private=True)
+        srv_cert_chain = X509CertChain([X509().parse(srv_raw_certificate)])
+        with self.assertRaises(TLSLocalAlert) as err:
+            conn.handshakeServer(certChain=srv_cert_chain,
+                                 privateKey=srv_private_key)
+
+        self.assertEqual(err.exception.description,
+                         AlertDescription.decode_error)
+
+    def test__handshakeWrapperAsync_with_internal_SyntaxError(self):
+        conn = TLSConnection(MockSocket(bytearray(0)))
+
+        def handshaker():
+            raise SyntaxError("internal bug")
+            yield
+
+        with self.assertRaises(SyntaxError) as err:
+            for result in conn._handshakeWrapperAsync(handshaker(), None):
+                pass
+
+        self.assertNotIsInstance(err.exception, TLSLocalAlert)
+        self.assertEqual(len(conn.sock.sent), 0)
+
+    def test__handshakeWrapperAsync_with_fault_resets_bufferWrites(self):
+        conn = TLSConnection(MockSocket(bytearray(0)))
+        conn.fault = Fault.badFinished
+
+        def handshaker():
+            conn._recordLayer.bufferWrites = True
+            raise TLSRemoteAlert(Alert().create(
+                AlertDescription.decrypt_error))
+            yield
+
+        for result in conn._handshakeWrapperAsync(handshaker(), None):
+            self.assertTrue(False, "Blocking socket")
+
+        self.assertFalse(conn._recordLayer.bufferWrites)
+
+    def test__serverRecordSizeLimit(self):
+        conn = TLSConnection(MockSocket(bytearray(0)))
+        settings = HandshakeSettings()
+        settings.recordSizeLimit = 1024
+        client_hello = ClientHello().create(
+                version=(3, 3),
+                random=bytearray(32),
+                session_id=bytearray(0),
+                cipher_suites=[CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA],
+                extensions=[RecordSizeLimitExtension().create(512)])
+
+        ext = conn._serverRecordSizeLimit(settings, client_hello)
+
+        self.assertEqual(ext.recordSizeLimit, 1024)
+        self.assertEqual(conn._recordSizeLimit, 1024)
+        self.assertEqual(conn._peerRecordSizeLimit, 512)
+
+    def test__serverRecordSizeLimit_without_client_extension(self):
+        conn = TLSConnection(MockSocket(bytearray(0)))
+        settings = HandshakeSettings()
+        settings.recordSizeLimit = 1024
+        client_hello = ClientHello().create(
+                version=(3, 3),
+                random=bytearray(32),
+                session_id=bytearray(0),
+                cipher_suites=[CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA])
+
+        self.assertIsNone(conn._serverRecordSizeLimit(settings,
+                                                      client_hello))
+        self.assertIsNone(conn._peerRecordSizeLimit)
+
     def test_server_with_client_proposing_SHA256_on_TLSv1_1(self):
         gen_sock = MockSocket(bytearray(0))
 
@@ -161,5 +335,49 @@ class TestTLSConnection(unittest.TestCase):
         # 5 bytes is record layer header, 4 bytes is handshake protocol header
         self.assertEqual(len(sock.sent[0]) - 5 - 4, 512)
 
+    def test__clientHelloParameters(self):
+        settings = HandshakeSettings()
+
+        suites, wireSuites, exts = TLSConnection._clientHelloParameters(
+                settings, None, True, None)
+        suites2, wireSuites2, exts2 = TLSConnection._clientHelloParameters(
+                settings, None, True, None)
+
+        self.assertEqual(suites, suites2)
+        self.assertIsNot(suites, suites2)
+        self.assertEqual(wireSuites, wireSuites2)
+        self.assertIsNot(wireSuites, wireSuites2)
+        self.assertEqual(exts, exts2)
+        self.assertIsNot(exts, exts2)
+        self.assertIs(exts[0], exts2[0])
+
+    def test__clientHelloParameters_with_changed_settings(self):
+        settings = HandshakeSettings()
+
+        suites, _, exts = TLSConnection._clientHelloParameters(
+                settings, None, True, None)
+
+        settings.cipherNames = ["aes128"]
+        settings.useEncryptThenMAC = False
+
+        suites2, _, exts2 = TLSConnection._clientHelloParameters(
+                settings, None, True, None)
+
+        self.assertNotEqual(suites, suites2)
+        self.assertIn(CipherSuite.TLS_RSA_WITH_AES_128_CBC_SHA, suites2)
+        self.assertNotIn(CipherSuite.TLS_RSA_WITH_AES_256_CBC_SHA, suites2)
+        self.assertEqual(len(exts) - 1, len(exts2))
+
+    def test__clientHelloParameters_with_recordSizeLimit(self):
+        settings = HandshakeSettings()
+        settings.recordSizeLimit = 2**10
+
+        _, _, exts = TLSConnection._clientHelloParameters(
+                settings, None, True, None)
+
+        ext = [i for i in exts if isinstance(i, RecordSizeLimitExtension)]
+        self.assertEqual(len(ext), 1)
+        self.assertEqual(ext[0].recordSizeLimit, 2**10)
+
 if __name__ == '__main__':
     unittest.main()
@@ -40,6 +40,67 @@ class TestTLSRecordLayer(unittest.TestCase):
         self.assertIsNotNone(record_layer)
         self.assertIsInstance(record_layer, TLSRecordLayer)
 
+    def test___init___with_application_attributes(self):
+        record_layer = TLSRecordLayer(None)
+
+        self.assertEqual(record_layer.__dict__, {})
+
+        record_layer.appState = 1
+
+        self.assertEqual(record_layer.appState, 1)
+
+    def test__handshakeDone_releases_handshake_hashes(self):
+        record_layer = TLSRecordLayer(MockSocket(bytearray(0)))
+        record_layer._handshakeStart(client=True)
+        record_layer._handshake_hash.update(bytearray(b'\x00'))
+
+        record_layer._handshakeDone(resumed=False)
+
+        self.assertIsNone(record_layer._handshake_hash)
+        self.assertFalse(record_layer.closed)
+        self.assertGreater(record_layer.handshakeReclaimedSize, 0)
+
+    def test__handshakeStart_and_Done_toggle_timeIO(self):
+        record_layer = TLSRecordLayer(MockSocket(bytearray(0)))
+        self.assertFalse(record_layer._recordLayer.timeIO)
+
+        record_layer._handshakeStart(client=True)
+
+        self.assertTrue(record_layer._recordLayer.timeIO)
+
+        record_layer._handshakeDone(resumed=False)
+
+        self.assertFalse(record_layer._recordLayer.timeIO)
+
+    def test__shutdown_stops_timeIO(self):
+        record_layer = TLSRecordLayer(MockSocket(bytearray(0)))
+        record_layer._handshakeStart(client=True)
+
+        record_layer._shutdown(False)
+
+        self.assertFalse(record_layer._recordLayer.timeIO)
+
+    def test__handshakeDone_overwrites_handshake_secrets(self):
+        record_layer = TLSRecordLayer(MockSocket(bytearray(0)))
+        record_layer._handshakeStart(client=True)
+        secret = bytearray(b'\xff' * 48)
+        record_layer._addHandshakeSecret(secret)
+
+        record_layer._handshakeDone(resumed=False)
+
+        self.assertEqual(secret, bytearray(48))
+        self.assertEqual(record_layer._handshakeSecrets, [])
+
+    def test__shutdown_overwrites_handshake_secrets(self):
+        record_layer = TLSRecordLayer(MockSocket(bytearray(0)))
+        record_layer._handshakeStart(client=True)
+        secret = bytearray(b'\xff' * 48)
+        record_layer._addHandshakeSecret(secret)
+
+        record_layer._shutdown(False)
+
+        self.assertEqual(secret, bytearray(48))
+
     def test__getNextRecord(self):
         mockSock = MockSocket(bytearray(
             b'\x16' +           # type - handshake
@@ -325,6 +386,50 @@ class TestTLSRecordLayer(unittest.TestCase):
             b'\x00'*10          # payload
             ), mockSock.sent[0])
 
+    def test__sendMsgs_with_buffered_flight(self):
+        mockSock = MockSocket(bytearray(0))
+        sock = TLSRecordLayer(mockSock)
+        sock.version = (3, 3)
+        sock._recordLayer.bufferWrites = True
+
+        msgs = [Message(ContentType.handshake, bytearray(b'\x01'*3)),
+                Message(ContentType.handshake, bytearray(b'\x02'*2)),
+                Message(ContentType.change_cipher_spec, bytearray(b'\x01')),
+                Message(ContentType.handshake, bytearray(b'\x03'))]
+
+        # XXX using private methods
+        for result in sock._sendMsgs(msgs):
+            self.assertTrue(False, "Blocking socket")
+
+        self.assertEqual(len(mockSock.sent), 0)
+
+        for result in sock._flushFlight():
+            self.assertTrue(False, "Blocking socket")
+
+        self.assertEqual([bytearray(b'\x16\x03\x03\x00\x05' +
+                                    b'\x01'*3 + b'\x02'*2 +
+                                    b'\x14\x03\x03\x00\x01\x01' +
+                                    b'\x16\x03\x03\x00\x01\x03')],
+                         mockSock.sent)
+
+    def test__getNextRecordFromSocket_without_buffered_flight(self):
+        mockSock = MockSocket(bytearray(
+            b'\x17' +           # application data
+            b'\x03\x03' +       # TLSv1.2
+            b'\x00\x01' +       # length
+            b'\x00'))
+        sock = TLSRecordLayer(mockSock)
+        sock.version = (3, 3)
+
+        with mock.patch.object(sock, '_flushFlight') as flushFlight:
+            for result in sock._getNextRecordFromSocket():
+                if result in (0, 1):
+                    self.assertTrue(False, "Blocking socket")
+                else:
+                    break
+
+        self.assertFalse(flushFlight.called)
+
     def test__sendMsg_with_very_slow_socket(self):
         mockSock = MockSocket(bytearray(0), maxWrite=1, blockEveryOther=True)
         sock = TLSRecordLayer(mockSock)
@@ -382,6 +487,135 @@ class TestTLSRecordLayer(unittest.TestCase):
         for msg in mock_sock.sent:
             self.assertTrue(len(msg) <= 2**14 + 5)
 
+    def test_write_with_data_larger_than_record_size(self):
+        mock_sock = MockSocket(bytearray(0))
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer.version = (3, 3)
+        record_layer.closed = False
+
+        data = bytearray(range(256)) * (2**7 + 1)
+
+        record_layer.write(data)
+
+        self.assertEqual(len(mock_sock.sent), 3)
+        self.assertEqual([2**14, 2**14, 2**8],
+                         [len(msg) - 5 for msg in mock_sock.sent])
+        self.assertEqual(data,
+                         bytearray().join(msg[5:] for msg in mock_sock.sent))
+
+    def test_write_with_dynamicRecordSizing(self):
+        mock_sock = MockSocket(bytearray(0))
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer.version = (3, 3)
+        record_layer.closed = False
+        record_layer.dynamicRecordSizing = True
+        record_layer.dynamicRecordThreshold = 2000
+
+        record_layer.write(bytearray(1500))
+        record_layer.write(bytearray(2**14 + 100))
+
+        self.assertEqual([1369, 131, 1369, 2**14 + 100 - 1369],
+                         [len(msg) - 5 for msg in mock_sock.sent])
+
+    def test_write_without_dynamicRecordSizing(self):
+        mock_sock = MockSocket(bytearray(0))
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer.version = (3, 3)
+        record_layer.closed = False
+
+        record_layer.write(bytearray(1500))
+
+        self.assertEqual(record_layer._dynamicBytesSent, 0)
+
+        # sizing starts with small records when enabled later
+        record_layer.dynamicRecordSizing = True
+        record_layer.write(bytearray(1500))
+
+        self.assertEqual([1500, 1369, 131],
+                         [len(msg) - 5 for msg in mock_sock.sent])
+        self.assertEqual(record_layer._dynamicBytesSent, 1500)
+
+    def test_write_with_peer_record_size_limit(self):
+        mock_sock = MockSocket(bytearray(0))
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer.version = (3, 3)
+        record_layer.closed = False
+        record_layer._peerRecordSizeLimit = 1000
+        record_layer._recordSizeLimit = 512
+
+        # limit is applied only to protected records
+        record_layer.write(bytearray(1500))
+        record_layer._changeWriteState()
+        record_layer._changeReadState()
+        record_layer.write(bytearray(1500))
+
+        self.assertEqual([1500, 1000, 500],
+                         [len(msg) - 5 for msg in mock_sock.sent])
+        self.assertEqual(record_layer._recordLayer.recvRecordLimit, 512)
+
+    def test_write_with_dynamicRecordSizing_after_idle(self):
+        mock_sock = MockSocket(bytearray(0))
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer.version = (3, 3)
+        record_layer.closed = False
+        record_layer.dynamicRecordSizing = True
+        record_layer.dynamicRecordThreshold = 1000
+
+        with mock.patch('tlslite.tlsrecordlayer.time.time') as mock_time:
+            mock_time.return_value = 100.0
+            record_layer.write(bytearray(1400))
+            record_layer.write(bytearray(1400))
+            mock_time.return_value = 102.0
+            record_layer.write(bytearray(1400))
+
+        self.assertEqual([1369, 31, 1400, 1369, 31],
+                         [len(msg) - 5 for msg in mock_sock.sent])
+
+    def test_write_with_tcpCork(self):
+        mock_sock = MockSocket(bytearray(0))
+        mock_sock.setsockopt = mock.MagicMock()
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer.version = (3, 3)
+        record_layer.closed = False
+        record_layer._tcpCork = True
+
+        record_layer.write(bytearray(10))
+
+        self.assertFalse(mock_sock.setsockopt.called)
+
+        record_layer.write(bytearray(2**14 + 1))
+
+        self.assertEqual(len(mock_sock.sent), 3)
+        if hasattr(socket, "TCP_CORK"):
+            self.assertEqual(
+                mock_sock.setsockopt.call_args_list,
+                [call(socket.IPPROTO_TCP, socket.TCP_CORK, 1),
+                 call(socket.IPPROTO_TCP, socket.TCP_CORK, 0)])
+        else:
+            self.assertFalse(mock_sock.setsockopt.called)
+
+    def test_write_with_tcpCork_and_not_TCP_socket(self):
+        mock_sock = MockSocket(bytearray(0))
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer.version = (3, 3)
+        record_layer.closed = False
+        record_layer._tcpCork = True
+
+        record_layer.write(bytearray(2**14 + 1))
+
+        self.assertEqual(len(mock_sock.sent), 2)
+
+    def test__handshakeDone_with_tcpNoDelay(self):
+        mock_sock = MockSocket(bytearray(0))
+        mock_sock.setsockopt = mock.MagicMock()
+        record_layer = TLSRecordLayer(mock_sock)
+        record_layer._tcpNoDelay = True
+
+        record_layer._handshakeDone(resumed=False)
+
+        mock_sock.setsockopt.assert_called_once_with(socket.IPPROTO_TCP,
+                                                     socket.TCP_NODELAY, 1)
+
     def test_write_with_BEAST_record_splitting(self):
         mock_sock = MockSocket(bytearray(0))
         record_layer = TLSRecordLayer(mock_sock)
@@ -567,9 +801,8 @@ class TestTLSRecordLayer(unittest.TestCase):
         gen = record_layer._getMsg(ContentType.handshake,
                 HandshakeType.server_hello)
 
-        # XXX decoder handles messages over the 2**14 limit!
-        #with self.assertRaises(TLSLocalAlert):
-        message = next(gen)
+        with self.assertRaises(TLSLocalAlert):
+            message = next(gen)
 
     #
     # Temporary tests below
@@ -8,6 +8,13 @@ try:
     import unittest2 as unittest
 except ImportError:
     import unittest
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+import tlslite.utils.codec as codec
 from tlslite.utils.codec import Parser, Writer
 
 class TestParser(unittest.TestCase):
@@ -16,6 +23,13 @@ class TestParser(unittest.TestCase):
 
         self.assertEqual(bytearray(0), p.bytes)
         self.assertEqual(0, p.index)
+        self.assertFalse(hasattr(p, '__dict__'))
+
+    def test___init___without_instance_attributes(self):
+        p = Parser(bytearray(0))
+
+        with self.assertRaises(AttributeError):
+            p.appState = 1
 
     def test_get(self):
         p = Parser(bytearray(b'\x02\x01\x00'))
@@ -24,6 +38,16 @@ class TestParser(unittest.TestCase):
         self.assertEqual(256, p.get(2))
         self.assertEqual(3, p.index)
 
+    def test_get_with_odd_sized_fields(self):
+        p = Parser(bytearray(b'\x01\x02\x03' +
+                             b'\x00\x00\x00\x01\x00' +
+                             b'\xff'*8))
+
+        self.assertEqual(0x010203, p.get(3))
+        self.assertEqual(0x0100, p.get(5))
+        self.assertEqual(2**64 - 1, p.get(8))
+        self.assertEqual(16, p.index)
+
     def test_get_with_too_few_bytes_left(self):
         p = Parser(bytearray(b'\x02\x01'))
 
@@ -53,6 +77,12 @@ class TestParser(unittest.TestCase):
         self.assertEqual([1,2,3], p.getFixList(2, 3))
         self.assertEqual(6, p.index)
 
+    def test_getFixList_with_too_few_bytes_left(self):
+        p = Parser(bytearray(b'\x00\x01\x00'))
+
+        with self.assertRaises(SyntaxError):
+            p.getFixList(2, 2)
+
     def test_getVarList(self):
         p = Parser(bytearray(
             b'\x06' +
@@ -204,6 +234,12 @@ class TestWriter(unittest.TestCase):
 
         self.assertEqual(bytearray(0), w.bytes)
 
+    def test___init___without_instance_attributes(self):
+        w = Writer()
+
+        with self.assertRaises(AttributeError):
+            w.appState = 1
+
     def test_add(self):
         w = Writer()
         w.add(255, 1)
@@ -228,12 +264,93 @@ class TestWriter(unittest.TestCase):
         with self.assertRaises(ValueError):
             w.add(256, 1)
 
+    def test_add_with_odd_sized_fields(self):
+        w = Writer()
+        w.add(0x010203, 3)
+        w.add(0x0100, 5)
+        w.add(2**64 - 1, 8)
+
+        self.assertEqual(bytearray(b'\x01\x02\x03' +
+                                   b'\x00\x00\x00\x01\x00' +
+                                   b'\xff'*8), w.bytes)
+
+    def test_add_with_overflowing_data_in_three_byte_field(self):
+        w = Writer()
+
+        with self.assertRaises(ValueError):
+            w.add(2**24, 3)
+
+    def test_add_with_negative_data(self):
+        w = Writer()
+
+        with self.assertRaises(ValueError):
+            w.add(-1, 2)
+
+    def test_add_with_overflowing_data_without_struct_range_checks(self):
+        w = Writer()
+
+        with mock.patch.object(codec, '_packChecksRange', False):
+            with self.assertRaises(ValueError):
+                w.add(2**16, 2)
+            with self.assertRaises(ValueError):
+                w.add(-1, 4)
+
+        self.assertEqual(bytearray(0), w.bytes)
+
     def test_addFixSeq(self):
         w = Writer()
         w.addFixSeq([16,17,18], 2)
 
         self.assertEqual(bytearray(b'\x00\x10\x00\x11\x00\x12'), w.bytes)
 
+    def test_addFixSeq_with_overflowing_data(self):
+        w = Writer()
+
+        with self.assertRaises(ValueError):
+            w.addFixSeq([1, 2**16], 2)
+
+        with self.assertRaises(ValueError):
+            w.addFixSeq([1, 256], 1)
+
+    def test_addFixSeq_with_overflowing_data_without_struct_range_checks(self):
+        w = Writer()
+
+        with mock.patch.object(codec, '_packChecksRange', False):
+            with self.assertRaises(ValueError):
+                w.addFixSeq([1, 2**16], 2)
+            with self.assertRaises(ValueError):
+                w.addFixSeq([-1, 2], 2)
+            w.addFixSeq([], 2)
+            w.addFixSeq([0, 2**16 - 1], 2)
+
+        self.assertEqual(bytearray(b'\x00\x00\xff\xff'), w.bytes)
+
+    def test_addFixSeq_with_integer(self):
+        w = Writer()
+
+        for length in (1, 2, 3):
+            with self.assertRaises(TypeError):
+                w.addFixSeq(5, length)
+
+        self.assertEqual(bytearray(0), w.bytes)
+
+    def test_addFixSeq_with_tuple_and_bytearray(self):
+        w = Writer()
+        w.addFixSeq((1, 2), 1)
+        w.addFixSeq(bytearray(b'\x03\x04'), 1)
+
+        self.assertEqual(bytearray(b'\x01\x02\x03\x04'), w.bytes)
+
+    def test_addFixSeq_with_generator(self):
+        w = Writer()
+        w.addFixSeq((i for i in [16, 17, 18]), 2)
+        w.addFixSeq((i for i in [1, 2]), 1)
+        w.addFixSeq((i for i in [3]), 3)
+
+        self.assertEqual(bytearray(b'\x00\x10\x00\x11\x00\x12' +
+                                   b'\x01\x02' +
+                                   b'\x00\x00\x03'), w.bytes)
+
     def test_addVarSeq(self):
         w = Writer()
         w.addVarSeq([16, 17, 18], 2, 2)
@@ -412,6 +412,223 @@ class TestContanttimeCBCCheck(unittest.TestCase):
         self.assertTrue(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
                                                  content_type, version))
 
+    def test_with_invalid_hash_and_minimum_pad(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x17
+        version = (3, 1)
+        mac = hashlib.sha1
+
+        for data_len in (0, 1, 5, 20, 100, 300):
+            application_data = bytearray(b'\x01'*data_len)
+            data = self.data_prepare(application_data, seqnum_bytes,
+                                     content_type, version, mac, key)
+            data[-1] ^= 0x01
+
+            data += bytearray(b'\x00')
+
+            h = hmac.new(key, digestmod=mac)
+            h.block_size = mac().block_size # python2 workaround
+            self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                      content_type, version),
+                             "Failed for data length {0}".format(data_len))
+
+    def test_with_valid_hash_and_minimum_pad(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x17
+        version = (3, 1)
+        mac = hashlib.sha1
+
+        for data_len in (0, 1, 5, 20, 100, 300):
+            application_data = bytearray(b'\x01'*data_len)
+            data = self.data_prepare(application_data, seqnum_bytes,
+                                     content_type, version, mac, key)
+
+            data += bytearray(b'\x00')
+
+            h = hmac.new(key, digestmod=mac)
+            h.block_size = mac().block_size # python2 workaround
+            self.assertTrue(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                     content_type, version),
+                            "Failed for data length {0}".format(data_len))
+
+    def test_with_invalid_hash_in_first_byte_and_minimum_pad(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x17
+        version = (3, 3)
+        application_data = bytearray(b'\x01'*32)
+        mac = hashlib.sha1
+
+        data = self.data_prepare(application_data, seqnum_bytes, content_type,
+                                 version, mac, key)
+        data[-mac().digest_size] ^= 0x80
+
+        data += bytearray(b'\x00')
+
+        h = hmac.new(key, digestmod=mac)
+        h.block_size = mac().block_size # python2 workaround
+        self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                  content_type, version))
+
+    def test_with_invalid_hash_and_empty_data_and_maximum_pad(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x14
+        version = (3, 1)
+        application_data = bytearray(0)
+        mac = hashlib.sha1
+
+        data = self.data_prepare(application_data, seqnum_bytes, content_type,
+                                 version, mac, key)
+        data[0] ^= 0xff
+
+        padding = bytearray(b'\xff'*256)
+        data += padding
+
+        h = hmac.new(key, digestmod=mac)
+        h.block_size = mac().block_size # python2 workaround
+        self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                  content_type, version))
+
+    def test_with_invalid_pad_byte_in_the_middle(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x14
+        version = (3, 2)
+        application_data = bytearray(b'\x01'*32)
+        mac = hashlib.sha1
+
+        data = self.data_prepare(application_data, seqnum_bytes, content_type,
+                                 version, mac, key)
+
+        padding = bytearray(b'\x0f'*8 + b'\x0e' + b'\x0f'*7)
+        data += padding
+
+        h = hmac.new(key, digestmod=mac)
+        h.block_size = mac().block_size # python2 workaround
+        self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                  content_type, version))
+
+    def test_with_invalid_pad_byte_at_the_start(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x14
+        version = (3, 3)
+        application_data = bytearray(b'\x01'*32)
+        mac = hashlib.sha1
+
+        data = self.data_prepare(application_data, seqnum_bytes, content_type,
+                                 version, mac, key)
+
+        padding = bytearray(b'\x00' + b'\x04'*4)
+        data += padding
+
+        h = hmac.new(key, digestmod=mac)
+        h.block_size = mac().block_size # python2 workaround
+        self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                  content_type, version))
+
+    def test_with_SSLv3(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x17
+        version = (3, 0)
+        application_data = bytearray(b'\x01'*32)
+        mac = hashlib.sha1
+
+        data = self.data_prepare(application_data, seqnum_bytes, content_type,
+                                 version, mac, key)
+
+        # SSLv3 padding bytes are arbitrary
+        padding = bytearray(b'\xaa'*7 + b'\x07')
+        data += padding
+
+        h = hmac.new(key, digestmod=mac)
+        h.block_size = mac().block_size # python2 workaround
+        self.assertTrue(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                 content_type, version))
+
+    def test_with_invalid_hash_in_SSLv3(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x17
+        version = (3, 0)
+        application_data = bytearray(b'\x01'*32)
+        mac = hashlib.sha1
+
+        data = self.data_prepare(application_data, seqnum_bytes, content_type,
+                                 version, mac, key)
+        data[-1] ^= 0x01
+
+        padding = bytearray(b'\x00')
+        data += padding
+
+        h = hmac.new(key, digestmod=mac)
+        h.block_size = mac().block_size # python2 workaround
+        self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                  content_type, version))
+
+    def test_with_invalid_SHA256(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x14
+        version = (3, 3)
+        mac = hashlib.sha256
+
+        for padding in (bytearray(b'\x00'), bytearray(b'\x0a'*11),
+                        bytearray(b'\xff'*256)):
+            application_data = bytearray(b'\x01'*10)
+            data = self.data_prepare(application_data, seqnum_bytes,
+                                     content_type, version, mac, key)
+            data[-1] ^= 0x01
+            data += padding
+
+            h = hmac.new(key, digestmod=mac)
+            h.block_size = mac().block_size # python2 workaround
+            self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                      content_type, version))
+
+    def test_with_invalid_SHA384(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x14
+        version = (3, 3)
+        mac = hashlib.sha384
+
+        for padding in (bytearray(b'\x00'), bytearray(b'\x0a'*11),
+                        bytearray(b'\xff'*256)):
+            application_data = bytearray(b'\x01'*10)
+            data = self.data_prepare(application_data, seqnum_bytes,
+                                     content_type, version, mac, key)
+            data[-1] ^= 0x01
+            data += padding
+
+            h = hmac.new(key, digestmod=mac)
+            h.block_size = mac().block_size # python2 workaround
+            self.assertFalse(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                      content_type, version))
+
+    def test_with_SHA384_and_minimum_pad(self):
+        key = compatHMAC(bytearray(20))
+        seqnum_bytes = bytearray(16)
+        content_type = 0x14
+        version = (3, 3)
+        application_data = bytearray(b'\x01'*10)
+        mac = hashlib.sha384
+
+        data = self.data_prepare(application_data, seqnum_bytes, content_type,
+                                 version, mac, key)
+
+        padding = bytearray(b'\x00')
+        data += padding
+
+        h = hmac.new(key, digestmod=mac)
+        h.block_size = mac().block_size # python2 workaround
+        self.assertTrue(ct_check_cbc_mac_and_pad(data, h, seqnum_bytes,
+                                                 content_type, version))
+
 class TestCompareDigest(unittest.TestCase):
     def test_with_equal_length(self):
         self.assertTrue(ct_compare_digest(bytearray(10), bytearray(10)))
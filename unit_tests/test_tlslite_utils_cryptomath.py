@@ -13,7 +13,8 @@ from hypothesis.strategies import integers
 import math
 
 from tlslite.utils.cryptomath import isPrime, numBits, numBytes, \
-        numberToByteArray, MD5, SHA1, secureHash
+        numberToByteArray, MD5, SHA1, secureHash, powModFixedBase, \
+        getRandomPrime, getRandomSafePrime, zeroizeBytes
 
 class TestIsPrime(unittest.TestCase):
     def test_with_small_primes(self):
@@ -64,6 +65,39 @@ class TestIsPrime(unittest.TestCase):
         # NextPrime[NextPrime[2^512]]*NextPrime[2^512]
         self.assertFalse(isPrime(179769313486231590772930519078902473361797697894230657273430081157732675805500963132708477322407536021120113879871393357658789768814416622492847430639477074095512480796227391561801824887394139579933613278628104952355769470429079061808809522886423955917442317693387325171135071792698344550223571732405562649211))
 
+class TestGetRandomPrime(unittest.TestCase):
+    def test_with_small_size(self):
+        for _ in range(100):
+            p = getRandomPrime(10)
+            self.assertTrue(768 <= p < 1024)
+            self.assertTrue(isPrime(p))
+
+    def test_with_typical_size(self):
+        p = getRandomPrime(256)
+
+        self.assertEqual(numBits(p), 256)
+        self.assertTrue(p >> 254 == 3)
+        self.assertTrue(isPrime(p, 20))
+
+    def test_with_too_small_size(self):
+        with self.assertRaises(AssertionError):
+            getRandomPrime(9)
+
+class TestGetRandomSafePrime(unittest.TestCase):
+    def test_with_small_size(self):
+        for _ in range(100):
+            p = getRandomSafePrime(12)
+            self.assertEqual(numBits(p), 12)
+            self.assertTrue(isPrime(p))
+            self.assertTrue(isPrime((p - 1) // 2))
+
+    def test_with_typical_size(self):
+        p = getRandomSafePrime(128)
+
+        self.assertEqual(numBits(p), 128)
+        self.assertTrue(isPrime(p, 20))
+        self.assertTrue(isPrime((p - 1) // 2, 20))
+
 class TestNumberToBytesFunctions(unittest.TestCase):
     def test_numberToByteArray(self):
         self.assertEqual(numberToByteArray(0x00000000000001),
@@ -117,6 +151,49 @@ class TestNumBits(unittest.TestCase):
     def test_numBytes(self, number):
         self.assertEqual(numBytes(number), self.num_bytes(number))
 
+class TestZeroizeBytes(unittest.TestCase):
+    def test_zeroizeBytes(self):
+        secret = bytearray(b'\x01\x02\x03')
+        alias = secret
+
+        self.assertEqual(zeroizeBytes(secret), 3)
+        self.assertEqual(alias, bytearray(3))
+
+    def test_zeroizeBytes_with_immutable_data(self):
+        self.assertEqual(zeroizeBytes(b'\x01\x02'), 0)
+        self.assertEqual(zeroizeBytes(None), 0)
+
+class TestPowModFixedBase(unittest.TestCase):
+    # 1024 bit SRP group from RFC 5054
+    prime = int("EEAF0AB9ADB38DD69C33F80AFA8FC5E86072618775FF3C0B9EA2314C9C256"
+                "576D674DF7496EA81D3383B4813D692C6E0E0D5D8E250B98BE48E495C1D60"
+                "89DAD15DC7D7B46154D6B6CE8EF4AD69B15D4982559B297BCF1885C529F56"
+                "6660E57EC68EDBC3C05726CC02FD4CBF4976EAA9AFD5138FE8376435B9FC6"
+                "1D2FC0EB06E3", 16)
+
+    @given(integers(min_value=0, max_value=1<<2048))
+    @example(0)
+    @example(1)
+    @example(15)
+    @example(16)
+    @example((1<<256)-1)
+    def test_powModFixedBase(self, power):
+        self.assertEqual(powModFixedBase(2, power, self.prime),
+                         pow(2, power, self.prime))
+
+    def test_powModFixedBase_with_base_larger_than_modulus(self):
+        self.assertEqual(powModFixedBase(1000, 345, 997),
+                         pow(1000, 345, 997))
+
+    def test_powModFixedBase_with_growing_exponents(self):
+        for bits in (8, 64, 16, 320):
+            power = (1 << bits) - 3
+            self.assertEqual(powModFixedBase(5, power, self.prime),
+                             pow(5, power, self.prime))
+
+    def test_powModFixedBase_with_modulus_one(self):
+        self.assertEqual(powModFixedBase(3, 0, 1), 0)
+
 class TestHashMethods(unittest.TestCase):
     def test_MD5(self):
         self.assertEqual(MD5(b"message digest"),
@@ -11,6 +11,7 @@ except ImportError:
     import unittest
 
 from tlslite.utils.ecc import decodeX962Point, encodeX962Point, getCurveByName,\
+        multiplyGenerator, multiplyPoint, \
         getPointByteSize
 import ecdsa
 
@@ -172,3 +173,57 @@ class TestGetPointByteSize(unittest.TestCase):
     def test_with_invalid_argument(self):
         with self.assertRaises(ValueError):
             getPointByteSize("P-256")
+
+class TestMultiplyGenerator(unittest.TestCase):
+    def test_with_small_scalars(self):
+        for scalar in range(1, 40):
+            point = multiplyGenerator(ecdsa.NIST256p, scalar)
+            expected = ecdsa.NIST256p.generator * scalar
+            self.assertEqual((point.x(), point.y()),
+                             (expected.x(), expected.y()))
+
+    def test_with_big_scalars(self):
+        for curve in (ecdsa.NIST256p, ecdsa.NIST384p, ecdsa.NIST521p,
+                      ecdsa.SECP256k1):
+            order = curve.generator.order()
+            for scalar in (order - 1, order // 3, 2**130 + 0xffff):
+                point = multiplyGenerator(curve, scalar)
+                expected = curve.generator * scalar
+                self.assertEqual((point.x(), point.y()),
+                                 (expected.x(), expected.y()))
+
+    def test_with_order(self):
+        point = multiplyGenerator(ecdsa.NIST256p,
+                                  ecdsa.NIST256p.generator.order())
+        self.assertEqual(point, ecdsa.ellipticcurve.INFINITY)
+
+    def test_encoding_of_result(self):
+        point = multiplyGenerator(ecdsa.NIST256p, 200)
+
+        self.assertEqual(encodeX962Point(point),
+                         encodeX962Point(ecdsa.NIST256p.generator * 200))
+
+class TestMultiplyPoint(unittest.TestCase):
+    def test_with_decoded_point(self):
+        base = ecdsa.NIST256p.generator * 0xdeadbeef
+        point = decodeX962Point(encodeX962Point(base), ecdsa.NIST256p)
+        for scalar in (1, 2, 15, 16, 17, 2**255 + 12345):
+            result = multiplyPoint(point, scalar)
+            expected = base * scalar
+            self.assertEqual((result.x(), result.y()),
+                             (expected.x(), expected.y()))
+
+    def test_with_P_521_point(self):
+        base = ecdsa.NIST521p.generator * 2**300
+        point = decodeX962Point(encodeX962Point(base), ecdsa.NIST521p)
+        scalar = ecdsa.NIST521p.generator.order() - 2
+
+        result = multiplyPoint(point, scalar)
+        expected = base * scalar
+        self.assertEqual((result.x(), result.y()),
+                         (expected.x(), expected.y()))
+
+    def test_with_zero(self):
+        point = ecdsa.NIST256p.generator * 5
+        self.assertEqual(multiplyPoint(point, 0),
+                         ecdsa.ellipticcurve.INFINITY)
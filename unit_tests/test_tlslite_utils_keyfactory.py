@@ -9,7 +9,13 @@ try:
 except ImportError:
     import unittest
 
-from tlslite.utils.keyfactory import parsePEMKey
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+from tlslite.utils.keyfactory import parsePEMKey, generateRSAKey
+from tlslite.utils.python_rsakey import Python_RSAKey
 from tlslite.utils.rsakey import RSAKey
 from tlslite.utils import cryptomath
 
@@ -210,3 +216,21 @@ class TestParsePEMKey(unittest.TestCase):
         self.assertIsInstance(key, RSAKey)
         self.assertEqual(1024, len(key))
         self.assertTrue(key.hasPrivateKey())
+
+class TestGenerateRSAKey(unittest.TestCase):
+    def test_generate_using_python(self):
+        key = generateRSAKey(512, implementations=["python"])
+
+        self.assertIsInstance(key, RSAKey)
+        self.assertEqual(512, len(key))
+        self.assertTrue(key.hasPrivateKey())
+
+    def test_generate_using_python_in_parallel(self):
+        with mock.patch.object(Python_RSAKey, 'generate') as mock_generate:
+            generateRSAKey(512, implementations=["python"], parallel=True)
+
+        mock_generate.assert_called_once_with(512, True)
+
+    def test_generate_with_no_implementations(self):
+        with self.assertRaises(ValueError):
+            generateRSAKey(512, implementations=[])
@@ -11,6 +11,7 @@ except ImportError:
 
 from tlslite.utils.rsakey import RSAKey
 from tlslite.utils.python_rsakey import Python_RSAKey
+import threading
 
 # because RSAKey is an abstract class...
 class TestRSAKey(unittest.TestCase):
@@ -58,6 +59,42 @@ class TestRSAKey(unittest.TestCase):
             b'\xae\x9a\x0b)\xb5K\xe8\x98|R\xac\xdc\xdc\n\x7f\x8b\xe7\xe6' +
             b'HQ\xc3hS\x19'), sigBytes)
 
+    def test_hashAndSign_from_multiple_threads(self):
+        rsa = Python_RSAKey(self.N, self.e, self.d, self.p, self.q, self.dP,
+                            self.dQ, self.qInv)
+        expected = rsa.hashAndSign(bytearray(b'text to sign'))
+        results = []
+
+        def sign():
+            for _ in range(20):
+                results.append(rsa.hashAndSign(bytearray(b'text to sign')))
+
+        threads = [threading.Thread(target=sign) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 80)
+        for sig in results:
+            self.assertEqual(expected, sig)
+
+    def test_generate(self):
+        rsa = Python_RSAKey.generate(512)
+
+        self.assertEqual(len(rsa), 512)
+        self.assertEqual(rsa.n, rsa.p * rsa.q)
+        sig = rsa.hashAndSign(bytearray(b'text to sign'))
+        self.assertTrue(rsa.hashAndVerify(sig, bytearray(b'text to sign')))
+
+    def test_generate_in_parallel(self):
+        rsa = Python_RSAKey.generate(512, parallel=True)
+
+        self.assertEqual(len(rsa), 512)
+        self.assertEqual(rsa.n, rsa.p * rsa.q)
+        sig = rsa.hashAndSign(bytearray(b'text to sign'))
+        self.assertTrue(rsa.hashAndVerify(sig, bytearray(b'text to sign')))
+
     def test_hashAndVerify(self):
         rsa = Python_RSAKey(self.N, self.e)
 
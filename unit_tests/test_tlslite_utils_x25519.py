@@ -0,0 +1,78 @@
+# See the LICENSE file for legal information regarding use of this file.
+
+# compatibility with Python 2.6, for that we need unittest2 package,
+# which is not available on 3.3 or 3.4
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from tlslite.utils.compat import a2b_hex
+from tlslite.utils.x25519 import x25519, X25519_G, decodeUCoordinate, \
+        decodeScalar25519
+
+class TestX25519(unittest.TestCase):
+    # test vectors from RFC 7748 Section 5.2
+    def test_vector_1(self):
+        scalar = a2b_hex("a546e36bf0527c9d3b16154b82465edd"
+                         "62144c0ac1fc5a18506a2244ba449ac4")
+        u_coord = a2b_hex("e6db6867583030db3594c1a424b15f7c"
+                          "726624ec26b3353b10a903a6d0ab1c4c")
+
+        self.assertEqual(x25519(scalar, u_coord),
+                         a2b_hex("c3da55379de9c6908e94ea4df28d084f"
+                                 "32eccf03491c71f754b4075577a28552"))
+
+    def test_vector_2(self):
+        scalar = a2b_hex("4b66e9d4d1b4673c5ad22691957d6af5"
+                         "c11b6421e0ea01d42ca4169e7918ba0d")
+        u_coord = a2b_hex("e5210f12786811d3f4b7959d0538ae2c"
+                          "31dbe7106fc03c3efc4cd549c715a493")
+
+        self.assertEqual(x25519(scalar, u_coord),
+                         a2b_hex("95cbde9476e8907d7aade45cb4b873f8"
+                                 "8b595a68799fa152e6f8f7647aac7957"))
+
+    def test_one_iteration(self):
+        self.assertEqual(x25519(X25519_G, X25519_G),
+                         a2b_hex("422c8e7a6227d7bca1350b3e2bb7279f"
+                                 "7897b87bb6854b783c60e80311ae3079"))
+
+    # test vectors from RFC 7748 Section 6.1
+    def test_key_agreement(self):
+        alice_priv = a2b_hex("77076d0a7318a57d3c16c17251b26645"
+                             "df4c2f87ebc0992ab177fba51db92c2a")
+        bob_priv = a2b_hex("5dab087e624a8a4b79e17f8b83800ee6"
+                           "6f3bb1292618b6fd1c2f8b27ff88e0eb")
+
+        alice_pub = x25519(alice_priv, X25519_G)
+        bob_pub = x25519(bob_priv, X25519_G)
+
+        self.assertEqual(alice_pub,
+                         a2b_hex("8520f0098930a754748b7ddcb43ef75a"
+                                 "0dbf3a0d26381af4eba4a98eaa9b4e6a"))
+        self.assertEqual(bob_pub,
+                         a2b_hex("de9edb7d7b7dc1b4d35b61c2ece43537"
+                                 "3f8343c85b78674dadfc7e146f882b4f"))
+
+        shared = a2b_hex("4a5d9d5ba4ce2de1728e3bf480350f25"
+                         "e07e21c947d19e3376f09b3c1e161742")
+        self.assertEqual(x25519(alice_priv, bob_pub), shared)
+        self.assertEqual(x25519(bob_priv, alice_pub), shared)
+
+    def test_with_small_order_point(self):
+        self.assertEqual(x25519(bytearray(range(32)), bytearray(32)),
+                         bytearray(32))
+
+    def test_with_wrong_size_u_coordinate(self):
+        with self.assertRaises(ValueError):
+            x25519(bytearray(32), bytearray(31))
+
+class TestDecoding(unittest.TestCase):
+    def test_decodeUCoordinate_masks_top_bit(self):
+        self.assertEqual(decodeUCoordinate(bytearray([1] + [0] * 30 + [0x80])),
+                         1)
+
+    def test_decodeScalar25519_clamps(self):
+        self.assertEqual(decodeScalar25519(bytearray([0xff] * 32)),
+                         2**255 - 8)